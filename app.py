@@ -11,6 +11,7 @@ load_dotenv()
 
 # Import db and models
 from models import db, User
+from services.engine_profiles import normalize_database_url, profile_for, engine_options, init_engine_profile
 
 # Initialize extensions
 migrate = Migrate()
@@ -29,13 +30,77 @@ def create_app():
         print("⚠️  DATABASE_URL not set, using SQLite fallback")
         db_url = 'sqlite:///payroll_system.db'
     # Normalize postgres URI and ensure psycopg3 driver
-    if db_url.startswith('postgres://'):
-        db_url = db_url.replace('postgres://', 'postgresql+psycopg://', 1)
-    elif db_url.startswith('postgresql://') and '+psycopg' not in db_url:
-        db_url = db_url.replace('postgresql://', 'postgresql+psycopg://', 1)
+    db_url = normalize_database_url(db_url)
     app.config['SQLALCHEMY_DATABASE_URI'] = db_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
+    # Engine profile: 'sqlite', 'postgres' or 'pgbouncer' (transaction pooling); defaults from the URL
+    app.config['DB_PROFILE'] = profile_for(db_url, os.environ.get('DB_PROFILE'))
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))  # Per worker process
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))  # 0 = none
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(db_url, app.config['DB_PROFILE'], app.config)
+    
+    # Read replica for reports, chart APIs and exports; they fall back to the primary when it lags or fails
+    replica_url = os.environ.get('REPLICA_DATABASE_URL')
+    if replica_url:
+        replica_url = normalize_database_url(replica_url)
+        replica_profile = profile_for(replica_url, os.environ.get('REPLICA_DB_PROFILE') or os.environ.get('DB_PROFILE'))
+        app.config['SQLALCHEMY_BINDS'] = {'replica': {'url': replica_url, **engine_options(replica_url, replica_profile, app.config)}}
+    app.config['REPLICA_MAX_LAG'] = float(os.environ.get('REPLICA_MAX_LAG', 30))  # Seconds behind the primary
+    app.config['REPLICA_CHECK_INTERVAL'] = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+    app.config['REPLICA_RETRY_AFTER'] = float(os.environ.get('REPLICA_RETRY_AFTER', 30))  # After a connection failure
+    
+    # Payroll run configuration
+    app.config['PAYROLL_RUN_WORKERS'] = int(os.environ.get('PAYROLL_RUN_WORKERS', 2))
+    app.config['PAYROLL_RUN_CHUNK_SIZE'] = int(os.environ.get('PAYROLL_RUN_CHUNK_SIZE', 500))
+    app.config['PAYROLL_RUN_LEASE'] = int(os.environ.get('PAYROLL_RUN_LEASE', 600))  # Seconds without a chunk before a run can be taken over
+    app.config['PAYROLL_SYNC_LIMIT'] = int(os.environ.get('PAYROLL_SYNC_LIMIT', 500))  # Larger batches run in the background
+    
+    # Dashboard metrics cache: 'memory' per worker, or 'redis' shared across workers
+    app.config['METRICS_CACHE_BACKEND'] = os.environ.get('METRICS_CACHE_BACKEND', 'memory')
+    app.config['METRICS_CACHE_URL'] = os.environ.get('METRICS_CACHE_URL')
+    app.config['METRICS_CACHE_TTL'] = int(os.environ.get('METRICS_CACHE_TTL', 60))
+    
+    # Office hours / attendance policy snapshots; other workers reload after this many seconds
+    app.config['POLICY_CACHE_TTL'] = int(os.environ.get('POLICY_CACHE_TTL', 300))
+    app.config['LOCATION_CACHE_TTL'] = int(os.environ.get('LOCATION_CACHE_TTL', 300))
+    
+    # Signed QR attendance tokens; the key defaults to SECRET_KEY
+    app.config['QR_SIGNING_KEY'] = os.environ.get('QR_SIGNING_KEY')
+    
+    # Kiosk QR codes rotate every QR_ROTATION_SECONDS; upcoming codes are rendered ahead
+    app.config['QR_ROTATION_SECONDS'] = int(os.environ.get('QR_ROTATION_SECONDS', 30))
+    app.config['QR_PRERENDER_SLOTS'] = int(os.environ.get('QR_PRERENDER_SLOTS', 2))
+    app.config['QR_RENDER_WORKERS'] = int(os.environ.get('QR_RENDER_WORKERS', 1))
+    app.config['QR_RESCAN_WINDOW'] = int(os.environ.get('QR_RESCAN_WINDOW', 60))  # Repeat scans this soon after clock-in are ignored
+    
+    # Clock events roll up into attendance rows: 'background' after commit, 'inline' in the same transaction, or 'manual' via the CLI;
+    # attendance chart summaries are refreshed the same way
+    app.config['CLOCK_ROLLUP_MODE'] = os.environ.get('CLOCK_ROLLUP_MODE', 'background')
+    app.config['CLOCK_ROLLUP_BATCH_SIZE'] = int(os.environ.get('CLOCK_ROLLUP_BATCH_SIZE', 1000))
+    app.config['CLOCK_INGEST_MAX_EVENTS'] = int(os.environ.get('CLOCK_INGEST_MAX_EVENTS', 10000))  # Per kiosk upload
+    
+    # Password hashing and login verification run on a process pool per worker (0 = inline);
+    # only worth it with threaded gunicorn workers (--threads), the Procfile's sync worker hashes inline
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    # Bulk imports hash their accounts on the same pool, in parallel even on a sync worker (0 = inline)
+    app.config['PASSWORD_BATCH_WORKERS'] = int(os.environ.get('PASSWORD_BATCH_WORKERS', os.cpu_count() or 1))
+    app.config['PASSWORD_VERIFY_QUEUE'] = int(os.environ.get('PASSWORD_VERIFY_QUEUE', 64))  # Logins in flight before new ones are turned away
+    app.config['PASSWORD_VERIFY_TIMEOUT'] = float(os.environ.get('PASSWORD_VERIFY_TIMEOUT', 10))
+    # Werkzeug hash method and cost; per role as 'employee=scrypt:16384:8:1,admin=scrypt:65536:8:1'
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_HASH_ROLE_METHODS'] = dict(
+        item.strip().split('=', 1) for item in os.environ.get('PASSWORD_HASH_ROLE_METHODS', '').split(',') if '=' in item
+    )
+    
+    # Logged-in user identities; other workers see role/employee changes after this many seconds
+    # (admin and HR rights are confirmed against the user row on every check)
+    app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+    
     # CSRF configuration
     app.config['WTF_CSRF_ENABLED'] = True
     app.config['WTF_CSRF_TIME_LIMIT'] = None  # No time limit for CSRF tokens
@@ -50,11 +115,31 @@ def create_app():
     
     # Initialize extensions with app
     db.init_app(app)
+    init_engine_profile(app, db)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     csrf.init_app(app)
     mail.init_app(app)
     
+    from services.metrics_cache import init_metrics_cache
+    from services.policy_cache import init_policy_cache
+    from services.location_registry import init_location_registry
+    from services.qr_rotation import init_qr_rotation
+    from services.clock_rollup import init_clock_rollup
+    from services.identity_cache import init_identity_cache, load_identity
+    from services.read_replica import init_read_replica
+    from services.summaries import init_summaries
+    from services.schema import init_schema
+    init_metrics_cache(app)
+    init_policy_cache(app)
+    init_location_registry(app)
+    init_qr_rotation(app)
+    init_clock_rollup(app)
+    init_identity_cache(app)
+    init_read_replica(app)
+    init_summaries(app)
+    init_schema(app)
+    
     # Expose csrf_token() in templates for non-FlaskForm forms
     @app.context_processor
     def inject_csrf_token():
@@ -68,10 +153,10 @@ def create_app():
     login_manager.login_message = 'Please log in to access this page.'
     login_manager.login_message_category = 'info'
     
-    # User loader for Flask-Login
+    # User loader for Flask-Login; identities come from a per-process cache
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return load_identity(int(user_id))
     
     # Health check endpoint for debugging
     @app.route('/health')
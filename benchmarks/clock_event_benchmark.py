@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Clock-event evaluation benchmark
+
+Times services.clock_events.evaluate_clock, the function every clock-in,
+clock-out, admin entry and import row goes through, against the datetime
+arithmetic the attendance and QR routes used to do inline.
+
+Usage:
+    python benchmarks/clock_event_benchmark.py [--events 200000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time as _time
+from datetime import date, datetime, time, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.clock_events import evaluate_clock
+from services.policy_cache import OfficeHoursSnapshot
+
+OFFICE_HOURS = OfficeHoursSnapshot(
+    id=1, name='Standard', description=None, official_clock_in=time(9, 0), official_clock_out=time(17, 0),
+    clock_in_grace_period=15, clock_out_grace_period=15, break_duration=60, break_start_time=None,
+    working_days=(1, 2, 3, 4, 5), allow_early_clock_in=True, allow_late_clock_out=True, is_default=True
+)
+
+
+def inline_evaluation(day, check_in, check_out, office_hours):
+    """The per-route calculation evaluate_clock replaced"""
+    hours_worked = (datetime.combine(day, check_out) - datetime.combine(day, check_in)).total_seconds() / 3600
+    official = (datetime.combine(day, office_hours.official_clock_out)
+                - datetime.combine(day, office_hours.official_clock_in)).total_seconds() / 3600
+    overtime = round(hours_worked - official, 2) if hours_worked > official else 0
+    late = early = 0
+    if check_in > office_hours.late_threshold(day):
+        late = int((datetime.combine(day, check_in)
+                    - datetime.combine(day, office_hours.official_clock_in)).total_seconds() / 60)
+    if check_out < office_hours.early_threshold(day):
+        early = int((datetime.combine(day, office_hours.official_clock_out)
+                     - datetime.combine(day, check_out)).total_seconds() / 60)
+    return round(hours_worked, 2), overtime, late, early
+
+
+def generate_events(count):
+    base = datetime(2000, 1, 1)
+    return [
+        ((base + timedelta(minutes=random.randint(480, 600))).time(),
+         (base + timedelta(minutes=random.randint(960, 1140))).time())
+        for _ in range(count)
+    ]
+
+
+def measure(label, func, events, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = _time.perf_counter()
+        for check_in, check_out in events:
+            func(check_in, check_out)
+        timings.append(_time.perf_counter() - started)
+    per_event = statistics.median(timings) / len(events) * 1e6
+    print(f"{label:<28}{statistics.median(timings) * 1000:>12.1f} ms{per_event:>12.2f} us/event")
+    return per_event
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    events = generate_events(args.events)
+    day = date.today()
+    print(f"{args.events:,} check-in/check-out pairs, median of {args.repeat} runs\n")
+    inline = measure('inline datetime arithmetic', lambda i, o: inline_evaluation(day, i, o, OFFICE_HOURS),
+                     events, args.repeat)
+    service = measure('evaluate_clock', lambda i, o: evaluate_clock(i, o, OFFICE_HOURS), events, args.repeat)
+    print(f"\nspeedup: {inline / service:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Hot-path index benchmark
+
+Seeds an unindexed copy of the schema (1M attendance rows by default), times
+the dashboard, clock-in and payroll-list queries and prints their query plans,
+then adds the indexes and unique constraints declared in models.py and
+repeats the measurements.
+
+Usage:
+    python benchmarks/index_benchmark.py [--rows 1000000] [--url sqlite:///bench.db]
+
+The target database must be empty; the schema is dropped again at the end.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+
+from models import db
+
+BATCH_SIZE = 50000
+STATUSES = ['present', 'present', 'present', 'late', 'absent', 'half_day']
+
+
+def build_bare_metadata():
+    """Copy of the model schema without the hot-path indexes and constraints"""
+    bare = sa.MetaData()
+    for table in db.metadata.sorted_tables:
+        copy = table.to_metadata(bare)
+        copy.indexes.clear()
+        for constraint in list(copy.constraints):
+            if isinstance(constraint, sa.UniqueConstraint) and constraint.name:
+                copy.constraints.discard(constraint)
+    return bare
+
+
+def add_model_indexes(conn, bare):
+    """Create every index and named unique constraint the models declare"""
+    for table in db.metadata.sorted_tables:
+        target = bare.tables[table.name]
+        for index in table.indexes:
+            sa.Index(index.name, *[target.c[c.name] for c in index.columns], unique=index.unique).create(conn)
+        for constraint in table.constraints:
+            if isinstance(constraint, sa.UniqueConstraint) and constraint.name:
+                sa.Index(constraint.name, *[target.c[c.name] for c in constraint.columns], unique=True).create(conn)
+    conn.execute(sa.text('ANALYZE'))
+
+
+def _insert_batches(conn, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            conn.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+
+
+def seed(conn, bare, attendance_rows, employees, payroll_months):
+    users = bare.tables['users']
+    employee_table = bare.tables['employees']
+    payrolls = bare.tables['payrolls']
+    attendances = bare.tables['attendances']
+    now = datetime.utcnow()
+    departments = ['Engineering', 'Finance', 'Human Resources', 'Operations', 'Sales']
+
+    _insert_batches(conn, users, ({
+        'id': i, 'username': f'user{i}', 'email': f'user{i}@bench.local',
+        'password_hash': 'x', 'role': 'employee', 'is_active': True, 'created_at': now
+    } for i in range(1, employees + 1)))
+
+    _insert_batches(conn, employee_table, ({
+        'id': i, 'user_id': i, 'employee_id': f'EMP{i:06d}', 'first_name': 'Bench',
+        'last_name': str(i), 'email': f'user{i}@bench.local', 'job_title': 'Staff',
+        'department': departments[i % len(departments)], 'hire_date': date(2020, 1, 1),
+        'salary': 50000, 'is_active': i % 20 != 0, 'created_at': now, 'updated_at': now
+    } for i in range(1, employees + 1)))
+
+    period_start = date.today().replace(day=1)
+    def payroll_rows():
+        for month in range(payroll_months):
+            start = (period_start - timedelta(days=31 * month)).replace(day=1)
+            for emp_id in range(1, employees + 1):
+                yield {
+                    'employee_id': emp_id, 'pay_period_start': start,
+                    'pay_period_end': start + timedelta(days=27), 'basic_salary': 4000,
+                    'allowances': 400, 'overtime_pay': 0, 'gross_salary': 4400,
+                    'tax_deduction': 660, 'pension_deduction': 220, 'total_deductions': 880,
+                    'net_salary': 3520, 'status': 'pending' if month == 0 else 'processed',
+                    'created_at': now - timedelta(days=31 * month, seconds=emp_id)
+                }
+    _insert_batches(conn, payrolls, payroll_rows())
+
+    days = max(1, attendance_rows // employees)
+    def attendance_rows_gen():
+        # Oldest first, so today's rows sit at the end of the table as in production
+        for day in reversed(range(days)):
+            day_date = date.today() - timedelta(days=day)
+            for emp_id in range(1, employees + 1):
+                yield {
+                    'employee_id': emp_id, 'date': day_date,
+                    'check_in': datetime(2000, 1, 1, 8, random.randint(30, 59)).time(),
+                    'check_out': datetime(2000, 1, 1, 17, random.randint(0, 59)).time(),
+                    'hours_worked': 8, 'overtime_hours': 0,
+                    'status': random.choice(STATUSES), 'created_at': now
+                }
+    _insert_batches(conn, attendances, attendance_rows_gen())
+    return days * employees
+
+
+def benchmark_queries(employees):
+    today = date.today()
+    six_months_ago = today - timedelta(days=180)
+    employee = random.randint(1, employees)
+    return [
+        ('dashboard: attendance today', 'SELECT COUNT(*) FROM attendances WHERE date = :today', {'today': today}),
+        ('dashboard: present today',
+         "SELECT COUNT(*) FROM attendances WHERE date = :today AND status = 'present'", {'today': today}),
+        ('dashboard: 6-month trend',
+         "SELECT pay_period_start, COUNT(id), SUM(net_salary) FROM payrolls "
+         "WHERE status = 'processed' AND pay_period_start >= :since GROUP BY pay_period_start",
+         {'since': six_months_ago}),
+        ('clock-in: today lookup',
+         'SELECT * FROM attendances WHERE employee_id = :employee AND date = :today LIMIT 1',
+         {'employee': employee, 'today': today}),
+        ('payroll list: newest 10', 'SELECT * FROM payrolls ORDER BY created_at DESC LIMIT 10', {}),
+        ('payroll list: pending newest 10',
+         "SELECT * FROM payrolls WHERE status = 'pending' ORDER BY created_at DESC LIMIT 10", {}),
+        ('identity: employee by user', 'SELECT * FROM employees WHERE user_id = :user', {'user': employee}),
+    ]
+
+
+def explain(conn, sql, params):
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = conn.execute(sa.text(prefix + sql), params).fetchall()
+    return [str(row[-1]) for row in rows]
+
+
+def measure(conn, queries, repeat):
+    results = {}
+    for name, sql, params in queries:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(sa.text(sql), params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = (statistics.median(timings), explain(conn, sql, params))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='attendance rows to seed')
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--payroll-months', type=int, default=24)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--url', help='database URL (defaults to a temporary SQLite file)')
+    args = parser.parse_args()
+
+    url = args.url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'index_benchmark.db')
+    engine = sa.create_engine(url)
+    bare = build_bare_metadata()
+    existing = set(sa.inspect(engine).get_table_names()) & set(bare.tables)
+    if existing:
+        sys.exit(f"Refusing to run: {url} already contains {', '.join(sorted(existing))}. Use a scratch database.")
+    bare.create_all(engine)
+
+    print(f"Seeding {args.rows:,} attendance rows into {url} ...")
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        seeded = seed(conn, bare, args.rows, args.employees, args.payroll_months)
+    print(f"Seeded {seeded:,} attendance rows in {time.perf_counter() - started:.1f}s\n")
+
+    queries = benchmark_queries(args.employees)
+    with engine.connect() as conn:
+        before = measure(conn, queries, args.repeat)
+    with engine.begin() as conn:
+        add_model_indexes(conn, bare)
+    with engine.connect() as conn:
+        after = measure(conn, queries, args.repeat)
+
+    print(f"{'query':<36}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    print('-' * 70)
+    for name, _, _ in queries:
+        before_ms, after_ms = before[name][0], after[name][0]
+        speedup = before_ms / after_ms if after_ms else float('inf')
+        print(f"{name:<36}{before_ms:>12.2f}{after_ms:>12.2f}{speedup:>9.1f}x")
+
+    print('\nQuery plans')
+    for name, _, _ in queries:
+        print(f"\n{name}")
+        print('  before: ' + ' | '.join(before[name][1]))
+        print('  after:  ' + ' | '.join(after[name][1]))
+
+    bare.drop_all(engine)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,16 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from models import User, Employee, Payroll, Attendance, OfficeLocation, db
 from datetime import datetime, date, timedelta
-from sqlalchemy import func, extract
+from services.metrics_cache import cached_dashboard_metrics, cached_monthly_payroll_trends, cached_department_stats, get_metrics_cache
+from services.query_builders import payrolls_joined_employee, attendances_joined_employee
+from services.clock_events import record_attendance
+from services.location_registry import get_locations
+from services.pagination import keyset_paginate, exact_count, InvalidCursor
+from services.payroll_reports import payroll_report, report_filters
+from services.password_hashing import hashing_stats
+from services.engine_profiles import pool_stats
+from services.read_replica import replica_reads, get_replica_router, REPLICA_BIND
 import traceback
 
 admin_bp = Blueprint('admin', __name__)
@@ -11,73 +19,13 @@ admin_bp = Blueprint('admin', __name__)
 @login_required
 def dashboard():
     try:
-        # Get basic statistics
-        total_employees = Employee.query.filter_by(is_active=True).count()
-        total_users = User.query.count()
-        
-        # Get payroll statistics
-        total_payrolls = Payroll.query.count()
-        processed_payrolls = Payroll.query.filter_by(status='processed').count()
-        pending_payrolls = Payroll.query.filter_by(status='pending').count()
-        
-        # Get salary statistics
-        total_salary_payout = db.session.query(func.sum(Payroll.net_salary)).filter_by(status='processed').scalar() or 0
+        stats = cached_dashboard_metrics().to_dict()
         
         # Get recent payrolls
-        recent_payrolls = Payroll.query.join(Employee).order_by(db.desc('created_at')).limit(5).all()
-        
-        # Get department statistics
-        dept_stats = db.session.query(
-            Employee.department,
-            func.count(Employee.id).label('count'),
-            func.avg(Employee.salary).label('avg_salary')
-        ).filter_by(is_active=True).group_by(Employee.department).all()
-        
-        # Convert to list of dictionaries for JSON serialization
-        dept_stats = [{'department': dept.department, 'count': dept.count, 'avg_salary': float(dept.avg_salary)} for dept in dept_stats]
-        
-        # Get monthly payroll trends (last 6 months)
-        six_months_ago = date.today() - timedelta(days=180)
-        monthly_trends = db.session.query(
-            extract('year', Payroll.pay_period_start).label('year'),
-            extract('month', Payroll.pay_period_start).label('month'),
-            func.count(Payroll.id).label('count'),
-            func.sum(Payroll.net_salary).label('total_salary')
-        ).filter(
-            Payroll.pay_period_start >= six_months_ago,
-            Payroll.status == 'processed'
-        ).group_by(
-            extract('year', Payroll.pay_period_start),
-            extract('month', Payroll.pay_period_start)
-        ).order_by(
-            extract('year', Payroll.pay_period_start),
-            extract('month', Payroll.pay_period_start)
-        ).all()
-        
-        # Convert to list of dictionaries for JSON serialization
-        monthly_trends = [{'year': int(trend.year), 'month': int(trend.month), 'count': trend.count, 'total_salary': float(trend.total_salary)} for trend in monthly_trends]
-        
-        # Get attendance statistics for today
-        today_attendance = Attendance.query.filter_by(date=date.today()).count()
-        today_present = Attendance.query.filter_by(date=date.today(), status='present').count()
-        today_absent = Attendance.query.filter_by(date=date.today(), status='absent').count()
+        recent_payrolls = payrolls_joined_employee().order_by(Payroll.created_at.desc()).limit(5).all()
         
         # Get office locations
-        office_locations = OfficeLocation.query.filter_by(active=True).all()
-        
-        stats = {
-            'total_employees': total_employees,
-            'total_users': total_users,
-            'total_payrolls': total_payrolls,
-            'processed_payrolls': processed_payrolls,
-            'pending_payrolls': pending_payrolls,
-            'total_salary_payout': float(total_salary_payout),
-            'dept_stats': dept_stats,
-            'monthly_trends': monthly_trends,
-            'today_attendance': today_attendance,
-            'today_present': today_present,
-            'today_absent': today_absent
-        }
+        office_locations = list(get_locations().values())
     
         return render_template('admin/dashboard.html', stats=stats, recent_payrolls=recent_payrolls, office_locations=office_locations)
     except Exception as e:
@@ -170,6 +118,7 @@ def debug():
 
 @admin_bp.route('/reports')
 @login_required
+@replica_reads
 def reports():
     if current_user.role not in ['admin', 'hr']:
         flash('You do not have permission to view reports', 'error')
@@ -179,6 +128,7 @@ def reports():
     start_date = request.args.get('start_date', (date.today() - timedelta(days=30)).strftime('%Y-%m-%d'))
     end_date = request.args.get('end_date', date.today().strftime('%Y-%m-%d'))
     department = request.args.get('department', '')
+    cursor = request.args.get('cursor', '')
     
     # Convert string dates to date objects
     try:
@@ -188,37 +138,28 @@ def reports():
         start_date = date.today() - timedelta(days=30)
         end_date = date.today()
     
-    # Build query
-    query = Payroll.query.join(Employee).filter(
-        Payroll.pay_period_start >= start_date,
-        Payroll.pay_period_start <= end_date
-    )
-    
-    if department:
-        query = query.filter(Employee.department == department)
+    # Summary and rollups are aggregated in SQL
+    report = payroll_report(start_date, end_date, department)
     
-    payrolls = query.order_by(db.desc('created_at')).all()
+    # Detail table, one page at a time
+    query = payrolls_joined_employee().filter(*report_filters(start_date, end_date, department))
+    try:
+        payrolls = keyset_paginate(
+            query, [Payroll.created_at, Payroll.id], lambda p: (p.created_at, p.id),
+            50, cursor=cursor, total=report.totals.payrolls
+        )
+    except InvalidCursor:
+        flash('That page link is no longer valid', 'error')
+        return redirect(url_for('admin.reports', start_date=start_date.strftime('%Y-%m-%d'),
+                                end_date=end_date.strftime('%Y-%m-%d'), department=department))
     
     # Get departments for filter
     departments = db.session.query(Employee.department).distinct().all()
     departments = [dept[0] for dept in departments if dept[0]]
     
-    # Calculate summary statistics
-    total_payrolls = len(payrolls)
-    total_gross = sum(float(p.gross_salary) for p in payrolls)
-    total_deductions = sum(float(p.total_deductions) for p in payrolls)
-    total_net = sum(float(p.net_salary) for p in payrolls)
-    
-    summary = {
-        'total_payrolls': total_payrolls,
-        'total_gross': total_gross,
-        'total_deductions': total_deductions,
-        'total_net': total_net
-    }
-    
     return render_template('admin/reports.html', 
                          payrolls=payrolls,
-                         summary=summary,
+                         report=report,
                          start_date=start_date.strftime('%Y-%m-%d'),
                          end_date=end_date.strftime('%Y-%m-%d'),
                          department=department,
@@ -231,7 +172,7 @@ def attendance():
         flash('You do not have permission to view attendance', 'error')
         return redirect(url_for('admin.dashboard'))
     
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', '', type=str)
     date_filter = request.args.get('date', date.today().strftime('%Y-%m-%d'))
     employee_id = request.args.get('employee_id', '', type=str)
     
@@ -240,14 +181,19 @@ def attendance():
     except ValueError:
         date_filter = date.today()
     
-    query = Attendance.query.filter_by(date=date_filter)
+    query = attendances_joined_employee().filter(Attendance.date == date_filter)
     
     if employee_id:
-        query = query.filter_by(employee_id=employee_id)
+        query = query.filter(Attendance.employee_id == employee_id)
     
-    attendances = query.join(Employee).order_by(Employee.first_name).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    try:
+        attendances = keyset_paginate(
+            query, [Employee.first_name, Attendance.id], lambda a: (a.employee.first_name, a.id),
+            20, cursor=cursor, descending=False, total=exact_count(query)
+        )
+    except InvalidCursor:
+        flash('That page link is no longer valid', 'error')
+        return redirect(url_for('admin.attendance', date=date_filter.strftime('%Y-%m-%d'), employee_id=employee_id))
     
     # Get employees for filter
     employees = Employee.query.filter_by(is_active=True).all()
@@ -267,51 +213,18 @@ def add_attendance():
     data = request.get_json()
     
     try:
-        # Check if attendance already exists
-        existing = Attendance.query.filter_by(
-            employee_id=data['employee_id'],
-            date=datetime.strptime(data['date'], '%Y-%m-%d').date()
-        ).first()
-        
-        if existing:
-            return jsonify({'success': False, 'message': 'Attendance already recorded for this date'})
+        # Parse times; hours and overtime come from the clock-event service
+        check_in = datetime.strptime(data['check_in'], '%H:%M').time() if data.get('check_in') else None
+        check_out = datetime.strptime(data['check_out'], '%H:%M').time() if data.get('check_out') else None
         
-        # Parse times
-        check_in = None
-        check_out = None
-        hours_worked = 0
-        
-        if data.get('check_in'):
-            check_in = datetime.strptime(data['check_in'], '%H:%M').time()
-        if data.get('check_out'):
-            check_out = datetime.strptime(data['check_out'], '%H:%M').time()
-        
-        # Calculate hours worked
-        if check_in and check_out:
-            check_in_dt = datetime.combine(datetime.strptime(data['date'], '%Y-%m-%d').date(), check_in)
-            check_out_dt = datetime.combine(datetime.strptime(data['date'], '%Y-%m-%d').date(), check_out)
-            hours_worked = (check_out_dt - check_in_dt).total_seconds() / 3600
-            
-            # Calculate overtime (assuming 8 hours is normal)
-            if hours_worked > 8:
-                overtime_hours = hours_worked - 8
-            else:
-                overtime_hours = 0
-        else:
-            overtime_hours = 0
-        
-        attendance = Attendance(
-            employee_id=data['employee_id'],
-            date=datetime.strptime(data['date'], '%Y-%m-%d').date(),
+        record_attendance(
+            int(data['employee_id']),
+            datetime.strptime(data['date'], '%Y-%m-%d').date(),
             check_in=check_in,
             check_out=check_out,
-            hours_worked=hours_worked,
-            overtime_hours=overtime_hours,
             status=data['status'],
             notes=data.get('notes', '')
         )
-        
-        db.session.add(attendance)
         db.session.commit()
         
         return jsonify({'success': True, 'message': 'Attendance recorded successfully'})
@@ -320,6 +233,47 @@ def add_attendance():
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)})
 
+@admin_bp.route('/attendance/import', methods=['GET', 'POST'])
+@login_required
+def import_attendance():
+    """Upload a CSV/XLSX timesheet; preview and error report first, then import"""
+    if current_user.role not in ['admin', 'hr']:
+        flash('You do not have permission to import attendance', 'error')
+        return redirect(url_for('admin.dashboard'))
+    
+    if request.method == 'GET':
+        return render_template('admin/attendance_import.html', plan=None)
+    
+    # pandas is heavy; load it only when a timesheet is uploaded
+    from services.attendance_import import read_timesheet, plan_attendance_import, apply_attendance_import
+    from services.spreadsheets import SpreadsheetError
+    
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Choose a CSV or Excel file to import', 'error')
+        return redirect(url_for('admin.import_attendance'))
+    
+    try:
+        plan = plan_attendance_import(read_timesheet(upload.stream, upload.filename))
+    except SpreadsheetError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('admin.import_attendance'))
+    
+    dry_run = request.form.get('dry_run') == '1'
+    if dry_run or not plan.rows:
+        return render_template('admin/attendance_import.html', plan=plan, dry_run=True, filename=upload.filename)
+    
+    try:
+        imported = apply_attendance_import(plan)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Import failed: {str(e)}', 'error')
+        return redirect(url_for('admin.import_attendance'))
+    
+    flash(f'Imported {imported} attendance records' + (f', skipped {len(plan.errors)} rows' if plan.errors else ''), 'success')
+    return render_template('admin/attendance_import.html', plan=plan, dry_run=False, filename=upload.filename)
+
 @admin_bp.route('/users')
 @login_required
 def users():
@@ -460,29 +414,43 @@ def delete_all_users():
 @admin_bp.route('/api/stats')
 @login_required
 def api_stats():
-    # Get monthly payroll data for charts
-    monthly_data = db.session.query(
-        extract('year', Payroll.pay_period_start).label('year'),
-        extract('month', Payroll.pay_period_start).label('month'),
-        func.count(Payroll.id).label('count'),
-        func.sum(Payroll.net_salary).label('total_salary')
-    ).filter(
-        Payroll.status == 'processed'
-    ).group_by(
-        extract('year', Payroll.pay_period_start),
-        extract('month', Payroll.pay_period_start)
-    ).order_by(
-        extract('year', Payroll.pay_period_start),
-        extract('month', Payroll.pay_period_start)
-    ).all()
-    
-    # Get department distribution
-    dept_data = db.session.query(
-        Employee.department,
-        func.count(Employee.id).label('count')
-    ).filter_by(is_active=True).group_by(Employee.department).all()
+    # All-time monthly payroll data and department distribution for charts; cached, so
+    # computed on the primary rather than the replica (see services.metrics_cache)
+    monthly_data = cached_monthly_payroll_trends()
+    dept_data = cached_department_stats()
     
     return jsonify({
-        'monthly_payrolls': [{'month': f"{int(m.year)}-{int(m.month):02d}", 'count': m.count, 'total': float(m.total_salary)} for m in monthly_data],
+        'monthly_payrolls': [{'month': m.label, 'count': m.count, 'total': m.total_salary} for m in monthly_data],
         'department_distribution': [{'department': d.department, 'count': d.count} for d in dept_data]
     })
+
+@admin_bp.route('/api/metrics-cache')
+@login_required
+def metrics_cache_stats():
+    """Hit/miss counters for the dashboard metrics cache in this worker"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    return jsonify(get_metrics_cache().stats())
+
+@admin_bp.route('/api/password-hashing')
+@login_required
+def password_hashing_stats():
+    """Hash settings and p50/p99 hash/verify timings in this worker"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    return jsonify(hashing_stats())
+
+@admin_bp.route('/api/db-pool')
+@login_required
+def db_pool_stats():
+    """Checked-out and overflow connections and checkout waits of this worker's pools, and replica routing"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    stats = pool_stats(db.engine, current_app.config['DB_PROFILE'])
+    router = get_replica_router()
+    if router is not None:
+        stats['replica'] = {**pool_stats(db.engines[REPLICA_BIND]), 'routing': router.stats()}
+    return jsonify(stats)
@@ -1,7 +1,14 @@
-from flask import Blueprint, jsonify, request
+import csv
+import io
+import json
+from flask import Blueprint, current_app, jsonify, request
 from flask_login import login_required, current_user
-from models import Employee, Payroll, User, db
+from models import Employee, Payroll, PayrollRun, User, db
 from datetime import datetime, date
+from services.metrics_cache import cached_dashboard_metrics
+from services.query_builders import payrolls_with_employee
+from services.pagination import keyset_paginate, clamp_page_size, exact_count, estimated_count, InvalidCursor
+from services.clock_ingest import ingest_events, DEFAULT_MAX_EVENTS
 
 api_bp = Blueprint('api', __name__)
 
@@ -64,19 +71,19 @@ def get_employee(employee_id):
 @api_bp.route('/payrolls')
 @login_required
 def get_payrolls():
-    """Get payrolls (filtered by role)"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+    """Get payrolls (filtered by role), newest first, one cursor page at a time"""
+    cursor = request.args.get('cursor', '')
+    per_page = clamp_page_size(request.args.get('per_page', 10, type=int), default=10)
+    count = request.args.get('count', '')
     status = request.args.get('status', '')
     employee_id = request.args.get('employee_id', type=int)
     
-    query = Payroll.query
+    query = payrolls_with_employee()
     
     if current_user.role == 'employee':
-        employee = Employee.query.filter_by(user_id=current_user.id).first()
-        if not employee:
+        if not current_user.employee_id:
             return jsonify({'error': 'Employee record not found'}), 404
-        query = query.filter_by(employee_id=employee.id)
+        query = query.filter_by(employee_id=current_user.employee_id)
     
     if status:
         query = query.filter_by(status=status)
@@ -84,9 +91,19 @@ def get_payrolls():
     if employee_id and current_user.role in ['admin', 'hr']:
         query = query.filter_by(employee_id=employee_id)
     
-    payrolls = query.order_by(db.desc('created_at')).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    total = None
+    if count == 'exact':
+        total = exact_count(query)
+    elif count == 'estimate':
+        total = estimated_count(query)
+    
+    try:
+        payrolls = keyset_paginate(
+            query, [Payroll.created_at, Payroll.id], lambda p: (p.created_at, p.id),
+            per_page, cursor=cursor, total=total
+        )
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     return jsonify({
         'payrolls': [{
@@ -104,10 +121,7 @@ def get_payrolls():
             'status': p.status,
             'processed_at': p.processed_at.isoformat() if p.processed_at else None
         } for p in payrolls.items],
-        'total': payrolls.total,
-        'pages': payrolls.pages,
-        'current_page': payrolls.page,
-        'per_page': payrolls.per_page
+        **payrolls.to_dict()
     })
 
 @api_bp.route('/payrolls/<int:payroll_id>')
@@ -220,6 +234,62 @@ def create_payroll():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/payroll-runs/<int:run_id>')
+@login_required
+def get_payroll_run(run_id):
+    """Get progress of a background payroll run"""
+    if current_user.role not in ['admin', 'hr']:
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    run = PayrollRun.query.get_or_404(run_id)
+    return jsonify(run.to_dict())
+
+@api_bp.route('/attendance/events', methods=['POST'])
+@login_required
+def ingest_attendance_events():
+    """Bulk upload of clock events buffered by an offline kiosk (admin/hr only).
+    
+    The body is JSON lines, CSV with a header row, or a JSON array of
+    objects with employee_id (the employee code), ts (ISO 8601) and
+    optionally kind (in/out; omitted means a scan), location_id and source.
+    """
+    if current_user.role not in ['admin', 'hr']:
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    try:
+        records = _event_records(request)
+    except (ValueError, csv.Error) as e:
+        return jsonify({'error': f'Could not parse events: {e}'}), 400
+    
+    limit = current_app.config.get('CLOCK_INGEST_MAX_EVENTS', DEFAULT_MAX_EVENTS)
+    if len(records) > limit:
+        return jsonify({'error': f'At most {limit} events per upload'}), 413
+    
+    try:
+        result = ingest_events(records, rescan_window=current_app.config.get('QR_RESCAN_WINDOW', 60))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify(result.to_dict())
+
+def _event_records(req):
+    """Decode an upload body into a list of dicts"""
+    body = req.get_data(as_text=True)
+    if req.mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(body)))
+    if req.mimetype == 'application/json':
+        records = json.loads(body or '[]')
+        if not isinstance(records, list):
+            raise ValueError('expected a JSON array')
+    else:
+        # JSON lines (application/x-ndjson), one event per line
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+    if not all(isinstance(record, dict) for record in records):
+        raise ValueError('every event must be an object')
+    return records
+
 @api_bp.route('/stats')
 @login_required
 def get_stats():
@@ -227,19 +297,14 @@ def get_stats():
     if current_user.role not in ['admin', 'hr']:
         return jsonify({'error': 'Permission denied'}), 403
     
-    total_employees = Employee.query.filter_by(is_active=True).count()
-    total_payrolls = Payroll.query.count()
-    processed_payrolls = Payroll.query.filter_by(status='processed').count()
-    pending_payrolls = Payroll.query.filter_by(status='pending').count()
-    
-    total_salary_payout = db.session.query(db.func.sum(Payroll.net_salary)).filter_by(status='processed').scalar() or 0
+    metrics = cached_dashboard_metrics(include_trends=False)
     
     return jsonify({
-        'total_employees': total_employees,
-        'total_payrolls': total_payrolls,
-        'processed_payrolls': processed_payrolls,
-        'pending_payrolls': pending_payrolls,
-        'total_salary_payout': float(total_salary_payout)
+        'total_employees': metrics.total_employees,
+        'total_payrolls': metrics.total_payrolls,
+        'processed_payrolls': metrics.processed_payrolls,
+        'pending_payrolls': metrics.pending_payrolls,
+        'total_salary_payout': metrics.total_salary_payout
     })
 
 @api_bp.route('/departments')
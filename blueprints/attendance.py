@@ -2,7 +2,13 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from models import User, Employee, Attendance, db
 from datetime import datetime, date, time, timedelta
-from sqlalchemy import func, extract
+from services.csv_export import stream_csv
+from services.query_builders import attendances_with_employee
+from services.pagination import keyset_paginate, estimated_count, InvalidCursor
+from services import clock_events
+from services.clock_events import ClockError
+from services.read_replica import replica_reads
+from services.summaries import monthly_attendance, department_attendance
 
 attendance_bp = Blueprint('attendance', __name__)
 
@@ -11,14 +17,26 @@ def get_csrf_token():
     from flask_wtf.csrf import generate_csrf
     return generate_csrf()
 
+def attendance_filters(employee_id, date_from, date_to):
+    """Filter conditions shared by the attendance list and its CSV export"""
+    conditions = []
+    if employee_id:
+        conditions.append(Attendance.employee_id == employee_id)
+    if date_from:
+        conditions.append(Attendance.date >= datetime.strptime(date_from, '%Y-%m-%d').date())
+    if date_to:
+        conditions.append(Attendance.date <= datetime.strptime(date_to, '%Y-%m-%d').date())
+    return conditions
+
 @attendance_bp.route('/')
 @login_required
 def index():
     """View attendance - employees see their own, HR/admin see all"""
-    if current_user.role == 'employee' and current_user.employee:
+    if current_user.role == 'employee' and current_user.employee_id:
         # Employee sees only their attendance
-        employee_id = current_user.employee.id
-        today_attendance = Attendance.query.filter_by(
+        employee_id = current_user.employee_id
+        # Live from today's clock events; the rolled-up row may lag behind
+        today_attendance = clock_events.day_summary(employee_id, date.today()) or Attendance.query.filter_by(
             employee_id=employee_id,
             date=date.today()
         ).first()
@@ -33,25 +51,21 @@ def index():
                              recent=recent_attendance)
     else:
         # HR/Admin sees all attendance
-        page = request.args.get('page', 1, type=int)
+        cursor = request.args.get('cursor', '', type=str)
         employee_id = request.args.get('employee_id', '', type=str)
         date_from = request.args.get('date_from', '', type=str)
         date_to = request.args.get('date_to', '', type=str)
         
-        query = Attendance.query
-        
-        if employee_id:
-            query = query.filter(Attendance.employee_id == employee_id)
-        
-        if date_from:
-            query = query.filter(Attendance.date >= datetime.strptime(date_from, '%Y-%m-%d').date())
+        query = attendances_with_employee().filter(*attendance_filters(employee_id, date_from, date_to))
         
-        if date_to:
-            query = query.filter(Attendance.date <= datetime.strptime(date_to, '%Y-%m-%d').date())
-        
-        attendances = query.order_by(Attendance.date.desc()).paginate(
-            page=page, per_page=20, error_out=False
-        )
+        try:
+            attendances = keyset_paginate(
+                query, [Attendance.date, Attendance.id], lambda a: (a.date, a.id),
+                20, cursor=cursor, total=estimated_count(query)
+            )
+        except InvalidCursor:
+            flash('That page link is no longer valid', 'error')
+            return redirect(url_for('attendance.index', employee_id=employee_id, date_from=date_from, date_to=date_to))
         
         employees = Employee.query.filter_by(is_active=True).all()
         
@@ -83,32 +97,15 @@ def clock_in():
         except ValidationError:
             return jsonify({'success': False, 'message': 'Invalid CSRF token'}), 400
     
-    if not current_user.employee:
+    if not current_user.employee_id:
         return jsonify({'success': False, 'message': 'Employee record not found'}), 400
     
-    today = date.today()
-    
-    # Check if already clocked in today
-    existing = Attendance.query.filter_by(
-        employee_id=current_user.employee.id,
-        date=today
-    ).first()
-    
-    if existing and existing.check_in:
-        return jsonify({'success': False, 'message': 'Already clocked in today'}), 400
-    
-    # Create or update attendance record
-    if not existing:
-        attendance = Attendance(
-            employee_id=current_user.employee.id,
-            date=today,
-            check_in=datetime.now().time(),
-            status='present'
-        )
-        db.session.add(attendance)
-    else:
-        existing.check_in = datetime.now().time()
-        existing.status = 'present'
+    # Appends an 'in' ClockEvent; the day's Attendance row is rolled up from the events after commit
+    try:
+        clock_events.clock_in(current_user.employee_id, datetime.now(), 'web')
+    except ClockError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
     
     db.session.commit()
     
@@ -136,40 +133,16 @@ def clock_out():
         except ValidationError:
             return jsonify({'success': False, 'message': 'Invalid CSRF token'}), 400
     
-    if not current_user.employee:
+    if not current_user.employee_id:
         return jsonify({'success': False, 'message': 'Employee record not found'}), 400
     
-    today = date.today()
-    
-    # Get today's attendance
-    attendance = Attendance.query.filter_by(
-        employee_id=current_user.employee.id,
-        date=today
-    ).first()
-    
-    if not attendance or not attendance.check_in:
-        return jsonify({'success': False, 'message': 'Please clock in first'}), 400
-    
-    if attendance.check_out:
-        return jsonify({'success': False, 'message': 'Already clocked out today'}), 400
-    
-    # Update clock out time
-    attendance.check_out = datetime.now().time()
-    
-    # Calculate hours worked
-    check_in_dt = datetime.combine(today, attendance.check_in)
-    check_out_dt = datetime.combine(today, attendance.check_out)
-    hours_worked = (check_out_dt - check_in_dt).total_seconds() / 3600
-    
-    attendance.hours_worked = round(hours_worked, 2)
-    
-    # Calculate overtime (over 8 hours)
-    if hours_worked > 8:
-        attendance.overtime_hours = round(hours_worked - 8, 2)
-    
-    # Check if late (after 9:00 AM)
-    if attendance.check_in > time(9, 0):
-        attendance.status = 'late'
+    # Appends an 'out' ClockEvent and the rollup refolds the day into hours and overtime after commit;
+    # a day kept on an admin or pre-event row has that row's check-out filled in instead
+    try:
+        result = clock_events.clock_out(current_user.employee_id, datetime.now(), 'web')
+    except ClockError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
     
     db.session.commit()
     
@@ -177,19 +150,19 @@ def clock_out():
     return jsonify({
         'success': True,
         'time': datetime.now().strftime('%H:%M:%S'),
-        'hours_worked': float(attendance.hours_worked)
+        'hours_worked': result.evaluation.hours_worked
     })
 
 @attendance_bp.route('/status')
 @login_required
 def status():
     """Get current attendance status"""
-    if not current_user.employee:
+    if not current_user.employee_id:
         return jsonify({'error': 'No employee record'}), 400
     
     today = date.today()
-    attendance = Attendance.query.filter_by(
-        employee_id=current_user.employee.id,
+    attendance = clock_events.day_summary(current_user.employee_id, today) or Attendance.query.filter_by(
+        employee_id=current_user.employee_id,
         date=today
     ).first()
     
@@ -209,113 +182,70 @@ def status():
 
 @attendance_bp.route('/export')
 @login_required
+@replica_reads
 def export():
     """Export attendance data to CSV"""
     if current_user.role not in ['admin', 'hr']:
         flash('You do not have permission to export attendance data', 'error')
         return redirect(url_for('attendance.index'))
     
-    import csv
-    from flask import make_response
-    from io import StringIO
-    
     # Get filter parameters
     employee_id = request.args.get('employee_id', '', type=str)
     date_from = request.args.get('date_from', '', type=str)
     date_to = request.args.get('date_to', '', type=str)
     
-    query = Attendance.query.join(Employee)
-    
-    if employee_id:
-        query = query.filter(Attendance.employee_id == employee_id)
-    
-    if date_from:
-        query = query.filter(Attendance.date >= datetime.strptime(date_from, '%Y-%m-%d').date())
-    
-    if date_to:
-        query = query.filter(Attendance.date <= datetime.strptime(date_to, '%Y-%m-%d').date())
-    
-    attendances = query.order_by(Attendance.date.desc()).all()
-    
-    # Create CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        'Employee ID', 'Employee Name', 'Date', 'Check In', 'Check Out',
-        'Hours Worked', 'Overtime Hours', 'Status', 'Notes'
-    ])
-    
-    # Write data
-    for att in attendances:
-        writer.writerow([
-            att.employee.employee_id,
-            att.employee.full_name,
-            att.date.strftime('%Y-%m-%d'),
-            att.check_in.strftime('%H:%M:%S') if att.check_in else '',
-            att.check_out.strftime('%H:%M:%S') if att.check_out else '',
-            float(att.hours_worked) if att.hours_worked else 0,
-            float(att.overtime_hours) if att.overtime_hours else 0,
-            att.status,
-            att.notes or ''
-        ])
-    
-    # Create response
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename=attendance_export_{date.today().strftime("%Y%m%d")}.csv'
-    
-    return response
+    statement = db.select(
+        Employee.employee_id, Employee.first_name, Employee.last_name,
+        Attendance.date, Attendance.check_in, Attendance.check_out,
+        Attendance.hours_worked, Attendance.overtime_hours, Attendance.status, Attendance.notes
+    ).join(Employee, Attendance.employee_id == Employee.id).filter(
+        *attendance_filters(employee_id, date_from, date_to)
+    ).order_by(Attendance.date.desc(), Attendance.id.desc())
+    
+    return stream_csv(
+        statement,
+        ['Employee ID', 'Employee Name', 'Date', 'Check In', 'Check Out',
+         'Hours Worked', 'Overtime Hours', 'Status', 'Notes'],
+        lambda row: [
+            row.employee_id,
+            f"{row.first_name} {row.last_name}",
+            row.date.strftime('%Y-%m-%d'),
+            row.check_in.strftime('%H:%M:%S') if row.check_in else '',
+            row.check_out.strftime('%H:%M:%S') if row.check_out else '',
+            float(row.hours_worked) if row.hours_worked else 0,
+            float(row.overtime_hours) if row.overtime_hours else 0,
+            row.status,
+            row.notes or ''
+        ],
+        f'attendance_export_{date.today().strftime("%Y%m%d")}.csv'
+    )
 
 @attendance_bp.route('/api/stats')
 @login_required
+@replica_reads
 def api_stats():
     """Get attendance statistics for charts"""
     if current_user.role not in ['admin', 'hr']:
         return jsonify({'error': 'Access denied'}), 403
     
-    # Get monthly attendance data
-    monthly_data = db.session.query(
-        extract('year', Attendance.date).label('year'),
-        extract('month', Attendance.date).label('month'),
-        func.count(Attendance.id).label('total_days'),
-        func.avg(Attendance.hours_worked).label('avg_hours'),
-        func.sum(Attendance.overtime_hours).label('total_overtime')
-    ).filter(
-        Attendance.check_in.isnot(None)
-    ).group_by(
-        extract('year', Attendance.date),
-        extract('month', Attendance.date)
-    ).order_by(
-        extract('year', Attendance.date),
-        extract('month', Attendance.date)
-    ).all()
-    
-    # Get department attendance stats
-    dept_stats = db.session.query(
-        Employee.department,
-        func.count(Attendance.id).label('total_attendance'),
-        func.avg(Attendance.hours_worked).label('avg_hours')
-    ).join(Attendance).filter(
-        Attendance.check_in.isnot(None)
-    ).group_by(Employee.department).all()
+    # Both come from the attendance_daily_summaries table
+    monthly_data = monthly_attendance()
+    dept_stats = department_attendance()
     
     return jsonify({
         'monthly_attendance': [
             {
-                'month': f"{int(m.year)}-{int(m.month):02d}",
+                'month': m.label,
                 'total_days': m.total_days,
-                'avg_hours': float(m.avg_hours) if m.avg_hours else 0,
-                'total_overtime': float(m.total_overtime) if m.total_overtime else 0
+                'avg_hours': m.avg_hours,
+                'total_overtime': m.total_overtime
             } for m in monthly_data
         ],
         'department_stats': [
             {
                 'department': d.department,
                 'total_attendance': d.total_attendance,
-                'avg_hours': float(d.avg_hours) if d.avg_hours else 0
+                'avg_hours': d.avg_hours
             } for d in dept_stats
         ]
     })
@@ -3,6 +3,7 @@ from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash
 from models import User, Employee, db
 from forms import LoginForm, RegisterForm
+from services.password_hashing import HashingBusy
 from datetime import datetime
 import uuid
 import random
@@ -56,9 +57,18 @@ def login():
         if form.validate_on_submit():
             user = User.query.filter_by(email=form.email.data).first()
             
-            if user and user.check_password(form.password.data):
+            try:
+                valid = user is not None and user.check_password(form.password.data)
+            except HashingBusy:
+                flash('Too many sign-ins right now. Please try again in a moment.', 'error')
+                return render_template('auth/login.html', form=form), 503
+            
+            if valid:
                 login_user(user, remember=form.remember_me.data)
                 user.last_login = datetime.utcnow()
+                if user.password_needs_rehash():
+                    # Hash settings changed since this password was set
+                    user.set_password(form.password.data)
                 db.session.commit()
                 
                 next_page = request.args.get('next')
@@ -196,7 +206,11 @@ def change_password():
         return jsonify({'success': False, 'message': 'Password must be at least 6 characters long'})
     
     # Verify current password
-    if not current_user.check_password(current_password):
+    try:
+        valid = current_user.check_password(current_password)
+    except HashingBusy:
+        return jsonify({'success': False, 'message': 'Too many sign-ins right now. Please try again in a moment.'}), 503
+    if not valid:
         return jsonify({'success': False, 'message': 'Current password is incorrect'})
     
     try:
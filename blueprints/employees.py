@@ -2,6 +2,9 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from models import Employee, User, db
 from forms import EmployeeForm
+from services.csv_export import stream_csv
+from services.usernames import allocate_usernames
+from services.read_replica import replica_reads
 from datetime import datetime
 import uuid
 import secrets
@@ -9,25 +12,14 @@ import secrets
 employees_bp = Blueprint('employees', __name__)
 
 def generate_employee_username(first_name: str, last_name: str) -> str:
-    base_username = f"{(first_name or 'user').strip().lower()}.{(last_name or 'user').strip().lower()}"
-    username = base_username
-    counter = 1
-    while User.query.filter_by(username=username).first():
-        username = f"{base_username}{counter}"
-        counter += 1
-    return username
+    # One prefetch of the taken names instead of a query per candidate
+    return allocate_usernames([(first_name, last_name)])[0]
 
-@employees_bp.route('/')
-@login_required
-def index():
-    page = request.args.get('page', 1, type=int)
-    search = request.args.get('search', '', type=str)
-    department = request.args.get('department', '', type=str)
-    
-    query = Employee.query.filter_by(is_active=True)
-    
+def employee_filters(search, department):
+    """Filter conditions shared by the employee list and its CSV export"""
+    conditions = [Employee.is_active == True]
     if search:
-        query = query.filter(
+        conditions.append(
             db.or_(
                 Employee.first_name.contains(search),
                 Employee.last_name.contains(search),
@@ -35,9 +27,18 @@ def index():
                 Employee.email.contains(search)
             )
         )
-    
     if department:
-        query = query.filter(Employee.department == department)
+        conditions.append(Employee.department == department)
+    return conditions
+
+@employees_bp.route('/')
+@login_required
+def index():
+    page = request.args.get('page', 1, type=int)
+    search = request.args.get('search', '', type=str)
+    department = request.args.get('department', '', type=str)
+    
+    query = Employee.query.filter(*employee_filters(search, department))
     
     employees = query.paginate(
         page=page, per_page=10, error_out=False
@@ -112,6 +113,49 @@ def add():
     
     return render_template('employees/add.html', form=form)
 
+@employees_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def bulk_import():
+    """Onboard employees from a CSV/XLSX sheet; preview and validation report first"""
+    if current_user.role not in ['admin', 'hr']:
+        flash('You do not have permission to add employees', 'error')
+        return redirect(url_for('employees.index'))
+    
+    if request.method == 'GET':
+        return render_template('employees/import.html', plan=None)
+    
+    # pandas is heavy; load it only when a sheet is uploaded
+    from services.employee_import import read_employee_sheet, plan_employee_import, apply_employee_import
+    from services.spreadsheets import SpreadsheetError
+    
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Choose a CSV or Excel file to import', 'error')
+        return redirect(url_for('employees.bulk_import'))
+    
+    try:
+        plan = plan_employee_import(read_employee_sheet(upload.stream, upload.filename))
+    except SpreadsheetError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('employees.bulk_import'))
+    
+    dry_run = request.form.get('dry_run') == '1'
+    if dry_run or not plan.rows:
+        return render_template('employees/import.html', plan=plan, dry_run=True, filename=upload.filename)
+    
+    try:
+        credentials = apply_employee_import(plan)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Import failed: {str(e)}', 'error')
+        return redirect(url_for('employees.bulk_import'))
+    
+    flash(f'Imported {len(credentials)} employees' + (f', skipped {len(plan.errors)} rows' if plan.errors else '') +
+          '. Share the temporary passwords below; they are not shown again.', 'success')
+    return render_template('employees/import.html', plan=plan, dry_run=False, filename=upload.filename,
+                           credentials=credentials)
+
 @employees_bp.route('/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit(id):
@@ -245,19 +289,31 @@ def api_employees():
 
 @employees_bp.route('/export')
 @login_required
+@replica_reads
 def export():
     if current_user.role not in ['admin', 'hr']:
         flash('You do not have permission to export employee data', 'error')
         return redirect(url_for('employees.index'))
     
-    employees = Employee.query.filter_by(is_active=True).all()
+    search = request.args.get('search', '', type=str)
+    department = request.args.get('department', '', type=str)
     
-    # Create CSV data
-    csv_data = "Employee ID,Name,Email,Department,Job Title,Salary,Hire Date\n"
-    for emp in employees:
-        csv_data += f"{emp.employee_id},{emp.full_name},{emp.email},{emp.department},{emp.job_title},{emp.salary},{emp.hire_date}\n"
+    statement = db.select(
+        Employee.employee_id, Employee.first_name, Employee.last_name, Employee.email,
+        Employee.department, Employee.job_title, Employee.salary, Employee.hire_date
+    ).filter(*employee_filters(search, department)).order_by(Employee.id)
     
-    return csv_data, 200, {
-        'Content-Type': 'text/csv',
-        'Content-Disposition': 'attachment; filename=employees.csv'
-    }
+    return stream_csv(
+        statement,
+        ['Employee ID', 'Name', 'Email', 'Department', 'Job Title', 'Salary', 'Hire Date'],
+        lambda row: [
+            row.employee_id,
+            f"{row.first_name} {row.last_name}",
+            row.email,
+            row.department,
+            row.job_title,
+            row.salary,
+            row.hire_date
+        ],
+        'employees.csv'
+    )
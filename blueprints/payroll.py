@@ -1,9 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response
+import click
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response, current_app
 from flask_login import login_required, current_user
-from models import Payroll, Employee, db
+from models import Payroll, PayrollRun, Employee, db
 from forms import PayrollForm
+from services.csv_export import stream_csv
+from services.payroll_engine import run_bulk_payroll
+from services.payroll_runs import start_payroll_run, submit_payroll_run, resume_interrupted_runs
+from services.query_builders import payrolls_with_employee, employee_payrolls
+from services.read_replica import replica_reads
 from datetime import datetime, date
-from decimal import Decimal
+from sqlalchemy.exc import IntegrityError
 import io
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
@@ -12,6 +18,17 @@ from reportlab.lib import colors
 
 payroll_bp = Blueprint('payroll', __name__)
 
+def payroll_filters(status, employee_id, month):
+    """Filter conditions shared by the payroll list and its CSV export"""
+    conditions = []
+    if employee_id:
+        conditions.append(Payroll.employee_id == employee_id)
+    if status:
+        conditions.append(Payroll.status == status)
+    if month:
+        conditions.append(db.extract('month', Payroll.pay_period_start) == int(month))
+    return conditions
+
 @payroll_bp.route('/')
 @login_required
 def index():
@@ -20,23 +37,18 @@ def index():
     employee_id = request.args.get('employee_id', '', type=str)
     month = request.args.get('month', '', type=str)
     
-    query = Payroll.query
-    
     # If user is an employee, only show their own payrolls
     if current_user.role == 'employee':
-        query = query.join(Employee).filter(Employee.user_id == current_user.id)
+        query = employee_payrolls(current_user.id)
+        employee_filter = ''
     else:
         # For admin/hr, allow filtering by employee
-        if employee_id:
-            query = query.filter(Payroll.employee_id == employee_id)
-    
-    if status:
-        query = query.filter(Payroll.status == status)
+        query = payrolls_with_employee()
+        employee_filter = employee_id
     
-    if month:
-        query = query.filter(db.extract('month', Payroll.pay_period_start) == int(month))
+    query = query.filter(*payroll_filters(status, employee_filter, month))
     
-    payrolls = query.order_by(db.desc('created_at')).paginate(
+    payrolls = query.order_by(Payroll.created_at.desc()).paginate(
         page=page, per_page=10, error_out=False
     )
     
@@ -101,7 +113,12 @@ def process():
         )
         
         db.session.add(payroll)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash('Payroll already exists for this employee and pay period', 'error')
+            return render_template('payroll/process.html', form=form)
         
         flash('Payroll processed successfully!', 'success')
         return redirect(url_for('payroll.index'))
@@ -236,73 +253,123 @@ def bulk_process():
     pay_period_start = datetime.strptime(data.get('pay_period_start'), '%Y-%m-%d').date()
     pay_period_end = datetime.strptime(data.get('pay_period_end'), '%Y-%m-%d').date()
     
-    processed_count = 0
-    
-    for emp_id in employee_ids:
-        employee = Employee.query.get(emp_id)
-        if not employee:
-            continue
-        
-        # Check if payroll already exists for this period
-        existing_payroll = Payroll.query.filter(
-            Payroll.employee_id == emp_id,
-            Payroll.pay_period_start == pay_period_start,
-            Payroll.pay_period_end == pay_period_end
-        ).first()
-        
-        if existing_payroll:
-            continue
-        
-        # Calculate payroll (simplified calculation)
-        basic_salary = employee.salary
-        allowances = basic_salary * Decimal('0.1')  # 10% allowance
-        gross_salary = basic_salary + allowances
-        tax_deduction = gross_salary * Decimal('0.15')  # 15% tax
-        pension_deduction = gross_salary * Decimal('0.05')  # 5% pension
-        total_deductions = tax_deduction + pension_deduction
-        net_salary = gross_salary - total_deductions
-        
-        payroll = Payroll(
-            employee_id=emp_id,
-            pay_period_start=pay_period_start,
-            pay_period_end=pay_period_end,
-            basic_salary=basic_salary,
-            allowances=allowances,
-            gross_salary=gross_salary,
-            tax_deduction=tax_deduction,
-            pension_deduction=pension_deduction,
-            total_deductions=total_deductions,
-            net_salary=net_salary,
-            processed_by=current_user.id,
-            processed_at=datetime.utcnow(),
-            status='processed'
-        )
-        
-        db.session.add(payroll)
-        processed_count += 1
-    
-    db.session.commit()
+    # Large batches are handed to the background payroll run workers
+    if data.get('background') or len(employee_ids) > current_app.config['PAYROLL_SYNC_LIMIT']:
+        run = start_payroll_run(employee_ids, pay_period_start, pay_period_end, current_user.id)
+        return jsonify({
+            'success': True,
+            'message': f'Payroll run #{run.id} queued for {run.total_count} employees',
+            'run_id': run.id,
+            'status_url': url_for('payroll.run_status', id=run.id)
+        }), 202
+    
+    try:
+        result = run_bulk_payroll(employee_ids, pay_period_start, pay_period_end, current_user.id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
     
     return jsonify({
         'success': True, 
-        'message': f'Successfully processed {processed_count} payrolls'
+        'message': f"Successfully processed {result['processed']} payrolls",
+        'processed': result['processed'],
+        'skipped': result['skipped'],
+        'elapsed_ms': result['elapsed_ms']
     })
 
+@payroll_bp.route('/runs', methods=['POST'])
+@login_required
+def create_run():
+    """Queue a background payroll run for all active employees"""
+    if current_user.role not in ['admin', 'hr']:
+        return jsonify({'success': False, 'message': 'Permission denied'}), 403
+    
+    data = request.get_json() or {}
+    try:
+        pay_period_start = datetime.strptime(data.get('pay_period_start', ''), '%Y-%m-%d').date()
+        pay_period_end = datetime.strptime(data.get('pay_period_end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid pay period'}), 400
+    
+    employee_ids = data.get('employee_ids')
+    if not employee_ids:
+        employee_ids = [row.id for row in db.session.query(Employee.id)
+                        .filter_by(is_active=True).order_by(Employee.id)]
+    
+    run = start_payroll_run(employee_ids, pay_period_start, pay_period_end, current_user.id)
+    return jsonify({
+        'success': True,
+        'run_id': run.id,
+        'status_url': url_for('payroll.run_status', id=run.id)
+    }), 202
+
+@payroll_bp.route('/runs/<int:id>')
+@login_required
+def run_status(id):
+    """Progress of a payroll run, polled by the payroll page"""
+    if current_user.role not in ['admin', 'hr']:
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    run = PayrollRun.query.get_or_404(id)
+    return jsonify(run.to_dict())
+
+@payroll_bp.route('/runs/<int:id>/resume', methods=['POST'])
+@login_required
+def resume_run(id):
+    """Resume a failed or interrupted run from its last committed chunk"""
+    if current_user.role not in ['admin', 'hr']:
+        return jsonify({'success': False, 'message': 'Permission denied'}), 403
+    
+    run = PayrollRun.query.get_or_404(id)
+    if run.status == 'completed':
+        return jsonify({'success': False, 'message': 'Payroll run already completed'}), 400
+    
+    if submit_payroll_run(run.id) is None:
+        return jsonify({'success': False, 'message': 'Payroll run is already in progress'}), 409
+    
+    return jsonify({'success': True, 'run_id': run.id, 'status_url': url_for('payroll.run_status', id=run.id)})
+
+@payroll_bp.cli.command('resume-runs')
+def resume_runs_command():
+    """Finish payroll runs interrupted by a crash or restart."""
+    for run in resume_interrupted_runs():
+        click.echo(f"Payroll run #{run.id}: {run.status} ({run.processed_count}/{run.total_count} processed)")
+
 @payroll_bp.route('/export')
 @login_required
+@replica_reads
 def export():
     if current_user.role not in ['admin', 'hr']:
         flash('You do not have permission to export payroll data', 'error')
         return redirect(url_for('payroll.index'))
     
-    payrolls = Payroll.query.join(Employee).all()
-    
-    # Create CSV data
-    csv_data = "Employee ID,Name,Pay Period,Basic Salary,Allowances,Gross Salary,Total Deductions,Net Salary,Status\n"
-    for payroll in payrolls:
-        csv_data += f"{payroll.employee.employee_id},{payroll.employee.full_name},{payroll.pay_period_start} to {payroll.pay_period_end},{payroll.basic_salary},{payroll.allowances},{payroll.gross_salary},{payroll.total_deductions},{payroll.net_salary},{payroll.status}\n"
+    status = request.args.get('status', '', type=str)
+    employee_id = request.args.get('employee_id', '', type=str)
+    month = request.args.get('month', '', type=str)
     
-    return csv_data, 200, {
-        'Content-Type': 'text/csv',
-        'Content-Disposition': 'attachment; filename=payroll_export.csv'
-    }
+    statement = db.select(
+        Employee.employee_id, Employee.first_name, Employee.last_name,
+        Payroll.pay_period_start, Payroll.pay_period_end, Payroll.basic_salary,
+        Payroll.allowances, Payroll.gross_salary, Payroll.total_deductions,
+        Payroll.net_salary, Payroll.status
+    ).join(Employee, Payroll.employee_id == Employee.id).filter(
+        *payroll_filters(status, employee_id, month)
+    ).order_by(Payroll.created_at.desc(), Payroll.id.desc())
+    
+    return stream_csv(
+        statement,
+        ['Employee ID', 'Name', 'Pay Period', 'Basic Salary', 'Allowances', 'Gross Salary',
+         'Total Deductions', 'Net Salary', 'Status'],
+        lambda row: [
+            row.employee_id,
+            f"{row.first_name} {row.last_name}",
+            f"{row.pay_period_start} to {row.pay_period_end}",
+            row.basic_salary,
+            row.allowances,
+            row.gross_salary,
+            row.total_deductions,
+            row.net_salary,
+            row.status
+        ],
+        'payroll_export.csv'
+    )
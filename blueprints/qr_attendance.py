@@ -1,13 +1,12 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file, abort, current_app
 from flask_login import login_required, current_user
-from models import User, Employee, Attendance, OfficeHours, OfficeLocation, db
+from models import User, Employee, Attendance, OfficeLocation, db
 from datetime import datetime, date, time, timedelta
 from sqlalchemy import func, extract
-import qrcode
-import io
-import base64
-import secrets
-import json
+from services.location_registry import get_locations, invalidate_locations
+from services.qr_tokens import verify_token, InvalidQRToken
+from services.qr_rotation import get_rotator, slot_token, FORMATS
+from services.clock_events import scan
 
 qr_attendance_bp = Blueprint('qr_attendance', __name__)
 
@@ -29,6 +28,7 @@ def manage_locations():
             loc = OfficeLocation(name=name, address=address, radius_meters=radius)
             db.session.add(loc)
             db.session.commit()
+            invalidate_locations()
             flash('Office location added', 'success')
         except Exception as e:
             db.session.rollback()
@@ -41,82 +41,108 @@ def manage_locations():
                 raise ValueError('Location not found')
             loc.active = False
             db.session.commit()
+            invalidate_locations()
             flash('Office location deactivated', 'success')
         except Exception as e:
             db.session.rollback()
             flash(f'Failed to update location: {str(e)}', 'error')
     return redirect(url_for('qr_attendance.index'))
 
-def _load_locations_dict():
-    locations = {}
-    for loc in OfficeLocation.query.filter_by(active=True).all():
-        locations[str(loc.id)] = loc.to_brief_dict()
-    return locations
-
 @qr_attendance_bp.route('/')
 @login_required
 def index():
     """QR Code attendance interface"""
-    if current_user.role == 'employee' and current_user.employee:
+    if current_user.role == 'employee' and current_user.employee_id:
         # Employee sees QR scanner interface
-        active_locations = OfficeLocation.query.filter_by(active=True).all()
-        return render_template('qr_attendance/employee_scanner.html', office_locations=active_locations)
+        return render_template('qr_attendance/employee_scanner.html', office_locations=list(get_locations().values()))
     else:
         # Admin/HR sees QR code management
         return render_template('qr_attendance/admin_management.html', 
-                             locations=_load_locations_dict())
+                             locations=get_locations())
+
+def _rotation_state(location_id, slot):
+    """What a kiosk needs to show the code for a slot"""
+    rotator = get_rotator()
+    qr_token = slot_token(location_id, slot, rotator.rotation)
+    return {
+        'location_id': location_id,
+        'slot': slot,
+        'rotation_seconds': rotator.rotation,
+        'rotates_at': datetime.fromtimestamp(rotator.slot_ends_at(slot)).isoformat(),
+        'next_in': round(rotator.seconds_left(slot), 3),
+        'timestamp': qr_token.issued_datetime.isoformat(),
+        'expires_at': qr_token.expires_datetime.isoformat(),
+        'image_url': url_for('qr_attendance.qr_image', location_id=location_id, slot=slot, fmt='png'),
+        'svg_url': url_for('qr_attendance.qr_image', location_id=location_id, slot=slot, fmt='svg')
+    }
 
 @qr_attendance_bp.route('/generate-qr/<location_id>')
 @login_required
 def generate_qr(location_id):
-    """Generate QR code for specific office location"""
+    """Kiosk display of the rotating QR code for an office location"""
     if current_user.role not in ['admin', 'hr']:
         flash('You do not have permission to generate QR codes', 'error')
         return redirect(url_for('qr_attendance.index'))
     
-    locations = _load_locations_dict()
+    locations = get_locations()
     if location_id not in locations:
         flash('Invalid location', 'error')
         return redirect(url_for('qr_attendance.index'))
     
-    # Generate QR code data
-    qr_data = {
-        'location_id': location_id,
-        'location_name': locations[location_id]['name'],
-        'timestamp': datetime.now().isoformat(),
-        'expires_at': (datetime.now() + timedelta(hours=24)).isoformat(),
-        'token': secrets.token_urlsafe(32)
-    }
-    
-    # Create QR code
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(json.dumps(qr_data))
-    qr.make(fit=True)
-    
-    # Generate QR code image
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to base64 for embedding in HTML
-    img_buffer = io.BytesIO()
-    img.save(img_buffer, format='PNG')
-    img_buffer.seek(0)
-    img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+    # The image itself is served (and cached) by qr_image
+    qr_data = _rotation_state(location_id, get_rotator().current_slot())
+    qr_data['location_name'] = locations[location_id]['name']
     
     return render_template('qr_attendance/qr_display.html',
-                         qr_code=img_base64,
                          location=locations[location_id],
                          qr_data=qr_data)
 
+@qr_attendance_bp.route('/code/<location_id>/<int:slot>.<fmt>')
+@login_required
+def qr_image(location_id, slot, fmt):
+    """PNG/SVG bytes of one rotation slot's QR code"""
+    if current_user.role not in ['admin', 'hr']:
+        abort(403)
+    
+    rotator = get_rotator()
+    if fmt not in FORMATS or location_id not in get_locations() or not rotator.is_servable(slot):
+        abort(404)
+    
+    # A slot's image never changes, so revalidation needs no rendering
+    etag = rotator.etag(location_id, slot, fmt)
+    max_age = int(rotator.seconds_left(slot + 1))
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        code = rotator.get(location_id, slot, fmt)
+        response = current_app.response_class(code.body, mimetype=code.mimetype)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    return response
+
+@qr_attendance_bp.route('/rotation/<location_id>')
+@login_required
+def qr_rotation(location_id):
+    """Current code state; ``next_in`` tells the kiosk when to ask again"""
+    if current_user.role not in ['admin', 'hr']:
+        return jsonify({'error': 'Access denied'}), 403
+    if location_id not in get_locations():
+        return jsonify({'error': 'Invalid location'}), 404
+    
+    rotator = get_rotator()
+    after = request.args.get('after', type=int)
+    slot = rotator.current_slot()
+    
+    # Warm the background renderer for this slot and the ones after it
+    rotator.get(location_id, slot)
+    return jsonify({'success': True, 'rotated': after is None or slot > after, **_rotation_state(location_id, slot)})
+
 @qr_attendance_bp.route('/scan', methods=['POST'])
 @login_required
 def scan_qr():
     """Process QR code scan for clock in/out"""
-    if not current_user.employee:
+    if not current_user.employee_id:
         return jsonify({'success': False, 'message': 'Employee record not found'}), 400
     
     try:
@@ -125,171 +151,61 @@ def scan_qr():
         if not qr_data:
             return jsonify({'success': False, 'message': 'QR code data missing'}), 400
         
-        # Parse QR code data
-        qr_info = json.loads(qr_data)
-        
         # Validate QR code
-        if not validate_qr_code(qr_info):
-            return jsonify({'success': False, 'message': 'Invalid or expired QR code'}), 400
-        
-        # Check if employee is at correct location
-        # For locations without coordinates, we skip GPS validation
-        location_id = qr_info['location_id']
-        locations = _load_locations_dict()
-        if location_id not in locations:
-            return jsonify({'success': False, 'message': 'Invalid location'}), 400
-        
-        # Process clock in/out
-        today = date.today()
-        existing_attendance = Attendance.query.filter_by(
-            employee_id=current_user.employee.id,
-            date=today
-        ).first()
+        try:
+            qr_info = validate_qr_code(qr_data)
+        except InvalidQRToken as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        if existing_attendance and existing_attendance.check_in and not existing_attendance.check_out:
-            # Clock out
-            return process_clock_out(existing_attendance, qr_info)
-        else:
-            # Clock in
-            return process_clock_in(current_user.employee, qr_info, today)
+        # Clock in or out, whichever is due; repeat scans within the window are ignored
+        result = scan(
+            current_user.employee_id, datetime.now(), 'qr', _qr_location(qr_info),
+            rescan_window=current_app.config.get('QR_RESCAN_WINDOW', 60)
+        )
+        db.session.commit()
+        return scan_response(result, qr_info)
             
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error processing QR code: {str(e)}'}), 400
 
-def validate_qr_code(qr_info):
-    """Validate QR code data"""
-    try:
-        # Check if QR code has expired
-        expires_at = datetime.fromisoformat(qr_info['expires_at'])
-        if datetime.now() > expires_at:
-            return False
-        
-        # Check if location exists
-        locations = _load_locations_dict()
-        if qr_info['location_id'] not in locations:
-            return False
-        
-        # Additional validation can be added here
-        return True
-    except:
-        return False
-
-def process_clock_in(employee, qr_info, today):
-    """Process clock in with QR code validation"""
-    # Check if already clocked in today
-    existing = Attendance.query.filter_by(
-        employee_id=employee.id,
-        date=today
-    ).first()
-    
-    if existing and existing.check_in:
-        return jsonify({'success': False, 'message': 'Already clocked in today'}), 400
-    
-    # Get official office hours
-    office_hours = OfficeHours.query.filter_by(is_default=True, is_active=True).first()
-    current_time = datetime.now().time()
-    status = 'present'
-    notes = f"QR Clock-in at {qr_info['location_name']}"
-    
-    # Check if late arrival
-    if office_hours:
-        late_threshold = (datetime.combine(today, office_hours.official_clock_in) + 
-                         timedelta(minutes=office_hours.clock_in_grace_period)).time()
-        
-        if current_time > late_threshold:
-            status = 'late'
-            minutes_late = int((datetime.combine(today, current_time) - 
-                               datetime.combine(today, office_hours.official_clock_in)).total_seconds() / 60)
-            notes += f" (Late by {minutes_late} minutes)"
-    
-    # Create or update attendance record
-    if not existing:
-        attendance = Attendance(
-            employee_id=employee.id,
-            date=today,
-            check_in=current_time,
-            status=status,
-            notes=notes
-        )
-        db.session.add(attendance)
-    else:
-        existing.check_in = current_time
-        existing.status = status
-        existing.notes = notes
+def validate_qr_code(qr_data):
+    """Verify a scanned token and return its QR info; raises InvalidQRToken"""
+    # Signature and expiry are checked without touching the database
+    qr_token = verify_token(qr_data)
     
-    db.session.commit()
+    # Check if location exists (in-memory registry)
+    location = get_locations().get(str(qr_token.location_id))
+    if not location:
+        raise InvalidQRToken('Invalid location')
     
-    return jsonify({
+    return {
+        'location_id': location['id'],
+        'location_name': location['name'],
+        'expires_at': qr_token.expires_datetime.isoformat()
+    }
+
+def _qr_location(qr_info):
+    return {'id': qr_info['location_id'], 'name': qr_info['location_name']}
+
+def scan_response(result, qr_info):
+    """JSON answer for a clock-in or clock-out scan"""
+    summary = result.summary
+    in_event, out_event = summary.pairs[-1]
+    response = {
         'success': True,
-        'action': 'clock_in',
-        'time': current_time.strftime('%H:%M:%S'),
+        'action': result.kind,
         'location': qr_info['location_name'],
-        'status': status
-    })
-
-def process_clock_out(attendance, qr_info):
-    """Process clock out with QR code validation"""
-    if attendance.check_out:
-        return jsonify({'success': False, 'message': 'Already clocked out today'}), 400
-    
-    # Update clock out time
-    current_time = datetime.now().time()
-    attendance.check_out = current_time
-    
-    # Calculate hours worked
-    check_in_dt = datetime.combine(attendance.date, attendance.check_in)
-    check_out_dt = datetime.combine(attendance.date, current_time)
-    hours_worked = (check_out_dt - check_in_dt).total_seconds() / 3600
-    
-    attendance.hours_worked = round(hours_worked, 2)
-    
-    # Get official office hours for overtime calculation
-    office_hours = OfficeHours.query.filter_by(is_default=True, is_active=True).first()
-    
-    # Calculate overtime based on official hours
-    if office_hours:
-        official_hours = (datetime.combine(attendance.date, office_hours.official_clock_out) - 
-                         datetime.combine(attendance.date, office_hours.official_clock_in)).total_seconds() / 3600
-        
-        if hours_worked > official_hours:
-            attendance.overtime_hours = round(hours_worked - official_hours, 2)
-        
-        # Check for early departure
-        early_threshold = (datetime.combine(attendance.date, office_hours.official_clock_out) - 
-                          timedelta(minutes=office_hours.clock_out_grace_period)).time()
-        
-        if current_time < early_threshold:
-            minutes_early = int((datetime.combine(attendance.date, office_hours.official_clock_out) - 
-                                datetime.combine(attendance.date, current_time)).total_seconds() / 60)
-            if attendance.notes:
-                attendance.notes += f" | QR Clock-out at {qr_info['location_name']} (Early by {minutes_early} minutes)"
-            else:
-                attendance.notes = f"QR Clock-out at {qr_info['location_name']} (Early by {minutes_early} minutes)"
-        else:
-            if attendance.notes:
-                attendance.notes += f" | QR Clock-out at {qr_info['location_name']}"
-            else:
-                attendance.notes = f"QR Clock-out at {qr_info['location_name']}"
+        'duplicate': result.duplicate
+    }
+    if result.kind == 'clock_in':
+        response.update(time=in_event.ts.strftime('%H:%M:%S'), status=summary.status)
     else:
-        # Fallback to 8-hour calculation
-        if hours_worked > 8:
-            attendance.overtime_hours = round(hours_worked - 8, 2)
-        
-        if attendance.notes:
-            attendance.notes += f" | QR Clock-out at {qr_info['location_name']}"
-        else:
-            attendance.notes = f"QR Clock-out at {qr_info['location_name']}"
-    
-    db.session.commit()
-    
-    return jsonify({
-        'success': True,
-        'action': 'clock_out',
-        'time': current_time.strftime('%H:%M:%S'),
-        'hours_worked': float(attendance.hours_worked),
-        'overtime_hours': float(attendance.overtime_hours) if attendance.overtime_hours else 0,
-        'location': qr_info['location_name']
-    })
+        response.update(
+            time=(out_event or summary.last_event).ts.strftime('%H:%M:%S'),
+            hours_worked=summary.hours_worked,
+            overtime_hours=summary.overtime_hours
+        )
+    return jsonify(response)
 
 @qr_attendance_bp.route('/locations')
 @login_required
@@ -299,7 +215,7 @@ def locations():
         return jsonify({'error': 'Access denied'}), 403
     
     return jsonify({
-        'locations': OFFICE_LOCATIONS,
+        'locations': get_locations(),
         'success': True
     })
 
@@ -307,7 +223,7 @@ def locations():
 @login_required
 def validate_location():
     """Validate employee location (for future GPS integration)"""
-    if not current_user.employee:
+    if not current_user.employee_id:
         return jsonify({'error': 'Employee record not found'}), 400
     
     try:
@@ -320,7 +236,7 @@ def validate_location():
             return jsonify({'error': 'Missing location data'}), 400
         
         # Check if location exists
-        locations = _load_locations_dict()
+        locations = get_locations()
         if location_id not in locations:
             return jsonify({'error': 'Invalid location'}), 400
         
@@ -363,9 +279,9 @@ def validate_location():
 @login_required
 def attendance_history():
     """Get employee attendance history with QR code info"""
-    if current_user.role == 'employee' and current_user.employee:
+    if current_user.role == 'employee' and current_user.employee_id:
         # Employee sees their own history
-        employee_id = current_user.employee.id
+        employee_id = current_user.employee_id
     else:
         # Admin/HR can specify employee
         employee_id = request.args.get('employee_id', type=int)
@@ -385,7 +301,7 @@ def attendance_history():
             'hours_worked': float(att.hours_worked) if att.hours_worked else 0,
             'status': att.status,
             'notes': att.notes,
-            'is_qr_attendance': 'QR' in (att.notes or '')
+            'is_qr_attendance': att.is_qr
         })
     
     return jsonify({
@@ -3,6 +3,9 @@ from flask_login import login_required, current_user
 from models import OfficeHours, AttendancePolicy, Employee, Attendance, db
 from datetime import datetime, time, timedelta
 from sqlalchemy import func, extract
+from services.attendance_analytics import attendance_analytics
+from services.policy_cache import get_policy_config
+from services.read_replica import replica_reads
 
 time_management_bp = Blueprint('time_management', __name__)
 
@@ -14,42 +17,22 @@ def index():
         flash('You do not have permission to access time management', 'error')
         return redirect(url_for('admin.dashboard'))
     
-    # Get office hours
-    office_hours = OfficeHours.query.filter_by(is_active=True).all()
-    default_hours = OfficeHours.query.filter_by(is_default=True, is_active=True).first()
-    
-    # Get attendance policies
-    policies = AttendancePolicy.query.filter_by(is_active=True).all()
-    default_policy = AttendancePolicy.query.filter_by(is_default=True, is_active=True).first()
+    # Office hours and attendance policies come from the cached snapshot
+    config = get_policy_config()
     
     # Get today's attendance statistics
     today = datetime.now().date()
-    total_employees = Employee.query.filter_by(is_active=True).count()
-    clocked_in_today = Attendance.query.filter_by(date=today).filter(Attendance.check_in.isnot(None)).count()
-    late_arrivals = 0
-    early_departures = 0
-    
-    if default_hours:
-        # Calculate late arrivals and early departures
-        late_threshold = datetime.combine(today, default_hours.official_clock_in) + timedelta(minutes=default_hours.clock_in_grace_period)
-        early_threshold = datetime.combine(today, default_hours.official_clock_out) - timedelta(minutes=default_hours.clock_out_grace_period)
-        
-        late_arrivals = Attendance.query.filter_by(date=today)\
-            .filter(Attendance.check_in > late_threshold.time()).count()
-        
-        early_departures = Attendance.query.filter_by(date=today)\
-            .filter(Attendance.check_out < early_threshold.time())\
-            .filter(Attendance.check_out.isnot(None)).count()
+    analytics = attendance_analytics(today, today, office_hours=config.default_hours, today=today)
     
     return render_template('time_management/index.html',
-                         office_hours=office_hours,
-                         default_hours=default_hours,
-                         policies=policies,
-                         default_policy=default_policy,
-                         total_employees=total_employees,
-                         clocked_in_today=clocked_in_today,
-                         late_arrivals=late_arrivals,
-                         early_departures=early_departures)
+                         office_hours=config.office_hours,
+                         default_hours=config.default_hours,
+                         policies=config.policies,
+                         default_policy=config.default_policy,
+                         total_employees=len(analytics.by_employee),
+                         clocked_in_today=analytics.totals.attended,
+                         late_arrivals=analytics.totals.late,
+                         early_departures=analytics.totals.early)
 
 @time_management_bp.route('/office-hours')
 @login_required
@@ -59,8 +42,7 @@ def office_hours():
         flash('You do not have permission to manage office hours', 'error')
         return redirect(url_for('time_management.index'))
     
-    office_hours = OfficeHours.query.filter_by(is_active=True).all()
-    return render_template('time_management/office_hours.html', office_hours=office_hours)
+    return render_template('time_management/office_hours.html', office_hours=get_policy_config().office_hours)
 
 @time_management_bp.route('/office-hours/add', methods=['GET', 'POST'])
 @login_required
@@ -192,8 +174,7 @@ def attendance_policies():
         flash('You do not have permission to manage attendance policies', 'error')
         return redirect(url_for('time_management.index'))
     
-    policies = AttendancePolicy.query.filter_by(is_active=True).all()
-    return render_template('time_management/attendance_policies.html', policies=policies)
+    return render_template('time_management/attendance_policies.html', policies=get_policy_config().policies)
 
 @time_management_bp.route('/attendance-policies/add', methods=['GET', 'POST'])
 @login_required
@@ -264,6 +245,7 @@ def add_attendance_policy():
 
 @time_management_bp.route('/reports')
 @login_required
+@replica_reads
 def reports():
     """Attendance reports and analytics"""
     if current_user.role not in ['admin', 'hr']:
@@ -282,37 +264,21 @@ def reports():
         date_from = (datetime.now() - timedelta(days=30)).date()
         date_to = datetime.now().date()
     
-    # Get attendance data
-    attendances = Attendance.query.filter(
-        Attendance.date >= date_from,
-        Attendance.date <= date_to
-    ).all()
-    
-    # Calculate statistics
-    total_days = (date_to - date_from).days + 1
-    total_attendance_records = len(attendances)
-    
-    # Late arrivals and early departures
-    default_hours = OfficeHours.query.filter_by(is_default=True, is_active=True).first()
-    late_arrivals = 0
-    early_departures = 0
+    if date_to < date_from:
+        date_from, date_to = date_to, date_from
     
-    if default_hours:
-        for att in attendances:
-            if att.check_in and att.check_in > default_hours.official_clock_in:
-                late_arrivals += 1
-            if att.check_out and att.check_out < default_hours.official_clock_out:
-                early_departures += 1
+    # Late/early use the default office hours' grace periods, as on the dashboard
+    analytics = attendance_analytics(date_from, date_to)
     
     return render_template('time_management/reports.html',
-                         attendances=attendances,
+                         analytics=analytics,
                          date_from=date_from,
                          date_to=date_to,
-                         total_days=total_days,
-                         total_attendance_records=total_attendance_records,
-                         late_arrivals=late_arrivals,
-                         early_departures=early_departures,
-                         default_hours=default_hours)
+                         total_days=(date_to - date_from).days + 1,
+                         total_attendance_records=analytics.totals.records,
+                         late_arrivals=analytics.totals.late,
+                         early_departures=analytics.totals.early,
+                         default_hours=analytics.office_hours)
 
 @time_management_bp.route('/api/attendance-stats')
 @login_required
@@ -0,0 +1,60 @@
+"""
+Shared test fixtures
+
+``app`` is a fresh application on its own SQLite database under the test's
+temporary directory, with the tables created and CSRF checks off so tests
+can post forms directly. A module that needs more (another environment
+variable, a config value) overrides ``app_env`` or ``app`` and builds on
+these.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from app import create_app, db
+
+
+@pytest.fixture
+def app_env(tmp_path):
+    """Environment variables set while the app is created"""
+    return {'DATABASE_URL': f"sqlite:///{tmp_path / 'test.db'}"}
+
+
+@pytest.fixture
+def app(app_env):
+    saved = {name: os.environ.get(name) for name in app_env}
+    os.environ.update(app_env)
+    try:
+        app = create_app()
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(app):
+    """Returns a test client with the given user id logged in"""
+    def login(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return client
+    return login
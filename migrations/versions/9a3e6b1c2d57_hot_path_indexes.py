@@ -0,0 +1,83 @@
+"""hot path indexes and natural-key unique constraints
+
+Revision ID: 9a3e6b1c2d57
+Revises: 5f0c2a9d7e41
+Create Date: 2026-10-16 23:58:31.402117
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3e6b1c2d57'
+down_revision = '5f0c2a9d7e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    # Payroll rows are financial records: refuse to guess which duplicate is right
+    duplicate_payrolls = conn.execute(sa.text(
+        "SELECT COUNT(*) FROM (SELECT employee_id FROM payrolls "
+        "GROUP BY employee_id, pay_period_start, pay_period_end HAVING COUNT(*) > 1) d"
+    )).scalar()
+    if duplicate_payrolls:
+        raise RuntimeError(
+            f'{duplicate_payrolls} employee pay periods have more than one payroll row; '
+            'resolve them before adding uq_payrolls_employee_period'
+        )
+
+    # Duplicate attendance rows come from racing clock-ins. The routes always
+    # read and updated the first row, so keep that one and log each row removed.
+    duplicate_attendances = conn.execute(sa.text(
+        "SELECT id, employee_id, date, check_in, check_out, status FROM attendances WHERE id NOT IN "
+        "(SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM attendances GROUP BY employee_id, date) k) "
+        "ORDER BY id"
+    )).all()
+    for row in duplicate_attendances:
+        logger.warning(
+            'Removing duplicate attendance row id=%s employee_id=%s date=%s check_in=%s check_out=%s status=%s',
+            row.id, row.employee_id, row.date, row.check_in, row.check_out, row.status
+        )
+    if duplicate_attendances:
+        conn.execute(
+            sa.text("DELETE FROM attendances WHERE id IN :ids").bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': [row.id for row in duplicate_attendances]}
+        )
+        logger.warning('Removed %d duplicate attendance rows before adding uq_attendances_employee_date',
+                       len(duplicate_attendances))
+
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_attendances_employee_date', ['employee_id', 'date'])
+        batch_op.create_index('ix_attendances_date_status', ['date', 'status'], unique=False)
+
+    with op.batch_alter_table('payrolls', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_payrolls_employee_period', ['employee_id', 'pay_period_start', 'pay_period_end'])
+        batch_op.create_index('ix_payrolls_status_period_start', ['status', 'pay_period_start'], unique=False)
+        batch_op.create_index('ix_payrolls_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('employees', schema=None) as batch_op:
+        batch_op.create_index('ix_employees_user_id', ['user_id'], unique=False)
+        batch_op.create_index('ix_employees_active_department', ['is_active', 'department'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('employees', schema=None) as batch_op:
+        batch_op.drop_index('ix_employees_active_department')
+        batch_op.drop_index('ix_employees_user_id')
+
+    with op.batch_alter_table('payrolls', schema=None) as batch_op:
+        batch_op.drop_index('ix_payrolls_created_at')
+        batch_op.drop_index('ix_payrolls_status_period_start')
+        batch_op.drop_constraint('uq_payrolls_employee_period', type_='unique')
+
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        batch_op.drop_index('ix_attendances_date_status')
+        batch_op.drop_constraint('uq_attendances_employee_date', type_='unique')
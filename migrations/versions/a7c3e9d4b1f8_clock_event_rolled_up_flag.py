@@ -0,0 +1,47 @@
+"""per-event rolled_up flag replacing the clock event rollup watermark
+
+Revision ID: a7c3e9d4b1f8
+Revises: e5b7c1d9f2a4
+Create Date: 2026-10-17 19:06:44.581203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d4b1f8'
+down_revision = 'e5b7c1d9f2a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('clock_events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rolled_up', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.create_index('ix_clock_events_rolled_up_id', ['rolled_up', 'id'], unique=False)
+
+    # Events up to the old watermark count as rolled up
+    op.execute(
+        "UPDATE clock_events SET rolled_up = true WHERE id <= "
+        "COALESCE((SELECT last_id FROM rollup_watermarks WHERE name = 'clock_events'), 0)"
+    )
+    op.drop_table('rollup_watermarks')
+
+
+def downgrade():
+    op.create_table('rollup_watermarks',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # The watermark can only stand below the first event not rolled up
+    op.execute(
+        "INSERT INTO rollup_watermarks (name, last_id) SELECT 'clock_events', "
+        "COALESCE((SELECT MIN(id) - 1 FROM clock_events WHERE NOT rolled_up), (SELECT MAX(id) FROM clock_events), 0)"
+    )
+
+    with op.batch_alter_table('clock_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_clock_events_rolled_up_id')
+        batch_op.drop_column('rolled_up')
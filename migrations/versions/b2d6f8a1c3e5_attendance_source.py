@@ -0,0 +1,33 @@
+"""attendance row source, so the clock event rollup leaves manual rows alone
+
+Revision ID: b2d6f8a1c3e5
+Revises: a7c3e9d4b1f8
+Create Date: 2026-10-17 19:48:12.337905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d6f8a1c3e5'
+down_revision = 'a7c3e9d4b1f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('source', sa.String(length=20), nullable=True))
+
+    # Rows of days with clock events were written by the rollup; the rest
+    # (admin entries, imports, clock-ins from before the event log) stay NULL
+    op.execute(
+        "UPDATE attendances SET source = 'clock' WHERE EXISTS (SELECT 1 FROM clock_events e "
+        "WHERE e.employee_id = attendances.employee_id AND e.day = attendances.date)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        batch_op.drop_column('source')
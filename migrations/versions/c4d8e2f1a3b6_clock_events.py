@@ -0,0 +1,61 @@
+"""append-only clock events and the attendance QR flag
+
+Revision ID: c4d8e2f1a3b6
+Revises: 9a3e6b1c2d57
+Create Date: 2026-10-17 10:12:47.530918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8e2f1a3b6'
+down_revision = '9a3e6b1c2d57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('clock_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('ts', sa.DateTime(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('source', sa.String(length=20), nullable=False),
+    sa.Column('location_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ),
+    sa.ForeignKeyConstraint(['location_id'], ['office_locations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('clock_events', schema=None) as batch_op:
+        batch_op.create_index('ix_clock_events_employee_day', ['employee_id', 'day'], unique=False)
+
+    op.create_table('rollup_watermarks',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_qr', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.create_index('ix_attendances_is_qr_date', ['is_qr', 'date'], unique=False)
+
+    # Until now QR scans were only recorded in the notes text
+    op.execute("UPDATE attendances SET is_qr = true WHERE notes LIKE '%QR Clock-%'")
+
+
+def downgrade():
+    with op.batch_alter_table('attendances', schema=None) as batch_op:
+        batch_op.drop_index('ix_attendances_is_qr_date')
+        batch_op.drop_column('is_qr')
+
+    op.drop_table('rollup_watermarks')
+
+    with op.batch_alter_table('clock_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_clock_events_employee_day')
+
+    op.drop_table('clock_events')
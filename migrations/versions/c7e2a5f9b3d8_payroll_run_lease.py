@@ -0,0 +1,27 @@
+"""payroll run lease, so a running run is only resumed once its worker stops renewing it
+
+Revision ID: c7e2a5f9b3d8
+Revises: f8b4c6d2a9e7
+Create Date: 2026-10-17 23:12:40.551307
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2a5f9b3d8'
+down_revision = 'f8b4c6d2a9e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Runs left 'running' have no lease yet and count as stale
+    with op.batch_alter_table('payroll_runs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('payroll_runs', schema=None) as batch_op:
+        batch_op.drop_column('claimed_at')
@@ -0,0 +1,52 @@
+"""unique clock event per employee and timestamp
+
+Revision ID: d3f9a2b7e6c1
+Revises: b2d6f8a1c3e5
+Create Date: 2026-10-17 20:31:05.218846
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f9a2b7e6c1'
+down_revision = 'b2d6f8a1c3e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    # Duplicates come from kiosk uploads racing each other; the fold already
+    # treated them as one tap, so keep the first and log each event removed
+    duplicate_events = conn.execute(sa.text(
+        "SELECT id, employee_id, ts, kind, source FROM clock_events WHERE id NOT IN "
+        "(SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM clock_events GROUP BY employee_id, ts) k) "
+        "ORDER BY id"
+    )).all()
+    for row in duplicate_events:
+        logger.warning(
+            'Removing duplicate clock event id=%s employee_id=%s ts=%s kind=%s source=%s',
+            row.id, row.employee_id, row.ts, row.kind, row.source
+        )
+    if duplicate_events:
+        conn.execute(
+            sa.text("DELETE FROM clock_events WHERE id IN :ids").bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': [row.id for row in duplicate_events]}
+        )
+        logger.warning('Removed %d duplicate clock events before adding uq_clock_events_employee_ts',
+                       len(duplicate_events))
+
+    with op.batch_alter_table('clock_events', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_clock_events_employee_ts', ['employee_id', 'ts'])
+
+
+def downgrade():
+    with op.batch_alter_table('clock_events', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_clock_events_employee_ts', type_='unique')
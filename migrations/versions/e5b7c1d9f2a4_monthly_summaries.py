@@ -0,0 +1,84 @@
+"""materialized payroll and attendance summaries
+
+Revision ID: e5b7c1d9f2a4
+Revises: c4d8e2f1a3b6
+Create Date: 2026-10-17 15:41:09.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b7c1d9f2a4'
+down_revision = 'c4d8e2f1a3b6'
+branch_labels = None
+depends_on = None
+
+# First day of the pay period's month, per dialect
+MONTH_START = {
+    'postgresql': "CAST(date_trunc('month', p.pay_period_start) AS date)",
+    'sqlite': "date(p.pay_period_start, 'start of month')"
+}
+
+
+def upgrade():
+    op.create_table('payroll_monthly_summaries',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('department', sa.String(length=100), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('payroll_count', sa.Integer(), nullable=False),
+    sa.Column('gross_total', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('net_total', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('month', 'department', 'status')
+    )
+    op.create_table('attendance_daily_summaries',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('department', sa.String(length=100), nullable=False),
+    sa.Column('record_count', sa.Integer(), nullable=False),
+    sa.Column('present_count', sa.Integer(), nullable=False),
+    sa.Column('late_count', sa.Integer(), nullable=False),
+    sa.Column('absent_count', sa.Integer(), nullable=False),
+    sa.Column('half_day_count', sa.Integer(), nullable=False),
+    sa.Column('checked_in_count', sa.Integer(), nullable=False),
+    sa.Column('hours_count', sa.Integer(), nullable=False),
+    sa.Column('hours_total', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('overtime_total', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('day', 'department')
+    )
+
+    # Backfill from the existing rows; elsewhere run `flask rebuild-summaries`
+    month_start = MONTH_START.get(op.get_bind().dialect.name)
+    if month_start is None:
+        return
+    op.execute(f"""
+        INSERT INTO payroll_monthly_summaries (month, department, status, payroll_count, gross_total, net_total, updated_at)
+        SELECT {month_start}, e.department, COALESCE(p.status, 'pending'), COUNT(p.id),
+               COALESCE(SUM(p.gross_salary), 0), COALESCE(SUM(p.net_salary), 0), CURRENT_TIMESTAMP
+        FROM payrolls p JOIN employees e ON p.employee_id = e.id
+        GROUP BY {month_start}, e.department, COALESCE(p.status, 'pending')
+    """)
+    op.execute("""
+        INSERT INTO attendance_daily_summaries (day, department, record_count, present_count, late_count, absent_count,
+                                                half_day_count, checked_in_count, hours_count, hours_total,
+                                                overtime_total, updated_at)
+        SELECT a.date, e.department, COUNT(a.id),
+               SUM(CASE WHEN a.status = 'present' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN a.status = 'late' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN a.status = 'absent' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN a.status = 'half_day' THEN 1 ELSE 0 END),
+               COUNT(a.check_in),
+               SUM(CASE WHEN a.check_in IS NOT NULL AND a.hours_worked IS NOT NULL THEN 1 ELSE 0 END),
+               COALESCE(SUM(CASE WHEN a.check_in IS NOT NULL THEN a.hours_worked END), 0),
+               COALESCE(SUM(CASE WHEN a.check_in IS NOT NULL THEN a.overtime_hours END), 0),
+               CURRENT_TIMESTAMP
+        FROM attendances a JOIN employees e ON a.employee_id = e.id
+        GROUP BY a.date, e.department
+    """)
+
+
+def downgrade():
+    op.drop_table('attendance_daily_summaries')
+    op.drop_table('payroll_monthly_summaries')
@@ -0,0 +1,29 @@
+"""queue of attendance summary days refreshed after commit
+
+Revision ID: f8b4c6d2a9e7
+Revises: d3f9a2b7e6c1
+Create Date: 2026-10-17 21:12:47.905316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8b4c6d2a9e7'
+down_revision = 'd3f9a2b7e6c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pending_summary_days',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('pending_summary_days')
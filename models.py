@@ -1,10 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.password_hashing import hash_password, verify_password, needs_rehash
+from services.read_replica import RoutingSession
 from datetime import datetime
 
-# Create a separate db instance for models
-db = SQLAlchemy()
+# Create a separate db instance for models; its sessions can route reads to a replica
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -22,16 +23,33 @@ class User(UserMixin, db.Model):
     employee = db.relationship('Employee', backref='user', uselist=False, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password, self.role)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    @property
+    def employee_id(self):
+        """The linked employee's primary key, as services.identity_cache.CachedUser has it"""
+        return self.employee.id if self.employee else None
+    
+    @property
+    def display_name(self):
+        return self.employee.first_name if self.employee else self.username
+    
+    def password_needs_rehash(self):
+        """Whether the stored hash predates the current cost settings for this role"""
+        return needs_rehash(self.password_hash, self.role)
     
     def __repr__(self):
         return f'<User {self.username}>'
 
 class Employee(db.Model):
     __tablename__ = 'employees'
+    __table_args__ = (
+        db.Index('ix_employees_user_id', 'user_id'),
+        db.Index('ix_employees_active_department', 'is_active', 'department'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -65,6 +83,11 @@ class Employee(db.Model):
 
 class Payroll(db.Model):
     __tablename__ = 'payrolls'
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'pay_period_start', 'pay_period_end', name='uq_payrolls_employee_period'),
+        db.Index('ix_payrolls_status_period_start', 'status', 'pay_period_start'),
+        db.Index('ix_payrolls_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
@@ -91,8 +114,68 @@ class Payroll(db.Model):
     def __repr__(self):
         return f'<Payroll {self.employee.full_name} - {self.pay_period_start}>'
 
+class PayrollRun(db.Model):
+    __tablename__ = 'payroll_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    pay_period_start = db.Column(db.Date, nullable=False)
+    pay_period_end = db.Column(db.Date, nullable=False)
+    employee_ids = db.Column(db.JSON, nullable=False, default=list)  # Target employee ids, in processing order
+    chunk_size = db.Column(db.Integer, nullable=False, default=500)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    total_count = db.Column(db.Integer, default=0)
+    processed_count = db.Column(db.Integer, default=0)
+    skipped_count = db.Column(db.Integer, default=0)
+    chunks_completed = db.Column(db.Integer, default=0)  # Last committed chunk, used to resume
+    skipped = db.Column(db.JSON, default=list)  # [{'employee_id': ..., 'reason': ...}]
+    errors = db.Column(db.JSON, default=list)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    claimed_at = db.Column(db.DateTime)  # Lease of the worker running it, renewed with every chunk
+    
+    # Relationship
+    creator = db.relationship('User', backref='payroll_runs')
+    
+    @property
+    def total_chunks(self):
+        if not self.total_count:
+            return 0
+        return (self.total_count + self.chunk_size - 1) // self.chunk_size
+    
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'pay_period_start': self.pay_period_start.isoformat(),
+            'pay_period_end': self.pay_period_end.isoformat(),
+            'total_count': self.total_count or 0,
+            'processed_count': self.processed_count or 0,
+            'skipped_count': self.skipped_count or 0,
+            'chunks_completed': self.chunks_completed or 0,
+            'total_chunks': self.total_chunks,
+            'skipped': self.skipped or [],
+            'errors': self.errors or [],
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<PayrollRun {self.id} {self.status}>'
+
 class Attendance(db.Model):
     __tablename__ = 'attendances'
+    __table_args__ = (
+        db.UniqueConstraint('employee_id', 'date', name='uq_attendances_employee_date'),
+        db.Index('ix_attendances_date_status', 'date', 'status'),
+        db.Index('ix_attendances_is_qr_date', 'is_qr', 'date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
@@ -103,11 +186,73 @@ class Attendance(db.Model):
     overtime_hours = db.Column(db.Numeric(4, 2), default=0)
     status = db.Column(db.String(20), default='present')  # present, absent, late, half_day
     notes = db.Column(db.Text)
+    is_qr = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # Any QR scan that day
+    source = db.Column(db.String(20))  # clock (rolled up from events), admin, import; NULL for rows from before the event log
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
         return f'<Attendance {self.employee.full_name} - {self.date}>'
 
+class ClockEvent(db.Model):
+    """Append-only clock-in/clock-out log; attendances are rolled up from it"""
+    __tablename__ = 'clock_events'
+    __table_args__ = (
+        db.Index('ix_clock_events_employee_day', 'employee_id', 'day'),
+        db.Index('ix_clock_events_rolled_up_id', 'rolled_up', 'id'),
+        db.UniqueConstraint('employee_id', 'ts', name='uq_clock_events_employee_ts'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # ts.date(), the attendance row it rolls up into
+    ts = db.Column(db.DateTime, nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # in, out
+    source = db.Column(db.String(20), nullable=False)  # web, qr
+    location_id = db.Column(db.Integer, db.ForeignKey('office_locations.id'))
+    rolled_up = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # Its day's attendance row includes it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ClockEvent {self.employee_id} {self.kind} {self.ts}>'
+
+class PayrollMonthlySummary(db.Model):
+    """Payroll totals per pay-period month, department and status, kept current by services.summaries"""
+    __tablename__ = 'payroll_monthly_summaries'
+    
+    month = db.Column(db.Date, primary_key=True)  # First day of the month pay_period_start falls in
+    department = db.Column(db.String(100), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    payroll_count = db.Column(db.Integer, nullable=False, default=0)
+    gross_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    net_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AttendanceDailySummary(db.Model):
+    """Attendance counts and hours per day and department, kept current by services.summaries"""
+    __tablename__ = 'attendance_daily_summaries'
+    
+    day = db.Column(db.Date, primary_key=True)
+    department = db.Column(db.String(100), primary_key=True)
+    record_count = db.Column(db.Integer, nullable=False, default=0)  # Every attendance row
+    present_count = db.Column(db.Integer, nullable=False, default=0)
+    late_count = db.Column(db.Integer, nullable=False, default=0)
+    absent_count = db.Column(db.Integer, nullable=False, default=0)
+    half_day_count = db.Column(db.Integer, nullable=False, default=0)
+    # Rows with a check-in; hours_count of them have hours_worked
+    checked_in_count = db.Column(db.Integer, nullable=False, default=0)
+    hours_count = db.Column(db.Integer, nullable=False, default=0)
+    hours_total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    overtime_total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PendingSummaryDay(db.Model):
+    """Attendance days whose summary rows are due for a refresh; append-only, consumed by services.summaries"""
+    __tablename__ = 'pending_summary_days'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Department(db.Model):
     __tablename__ = 'departments'
     
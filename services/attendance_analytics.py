@@ -0,0 +1,173 @@
+"""
+Attendance analytics shared by time_management.index and time_management.reports.
+
+Late arrivals, early departures and overtime are counted in SQL with
+conditional aggregates against the default office hours' grace-period
+thresholds. One statement groups by employee and one groups by day;
+department totals and absences are derived from those groups, so no
+attendance rows are loaded.
+"""
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, false, func, select
+
+from models import Employee, Attendance, db
+from services.policy_cache import OfficeHoursSnapshot, default_office_hours
+
+DEFAULT_WORKING_DAYS = [1, 2, 3, 4, 5]  # Monday to Friday, as OfficeHours defaults
+
+
+@dataclass(frozen=True)
+class AttendanceCounts:
+    records: int = 0
+    attended: int = 0
+    late: int = 0
+    early: int = 0
+    overtime: int = 0
+    overtime_hours: float = 0.0
+    absences: int = 0
+
+    def __add__(self, other):
+        return AttendanceCounts(
+            self.records + other.records,
+            self.attended + other.attended,
+            self.late + other.late,
+            self.early + other.early,
+            self.overtime + other.overtime,
+            self.overtime_hours + other.overtime_hours,
+            self.absences + other.absences
+        )
+
+
+@dataclass(frozen=True)
+class EmployeeAttendance:
+    employee_id: int
+    name: str
+    department: str
+    counts: AttendanceCounts
+
+
+@dataclass(frozen=True)
+class DepartmentAttendance:
+    department: str
+    employees: int
+    counts: AttendanceCounts
+
+
+@dataclass(frozen=True)
+class DayAttendance:
+    date: date
+    is_working_day: bool
+    counts: AttendanceCounts
+
+
+@dataclass(frozen=True)
+class AttendanceAnalytics:
+    date_from: date
+    date_to: date
+    working_days: int
+    office_hours: Optional[OfficeHoursSnapshot] = None
+    totals: AttendanceCounts = field(default_factory=AttendanceCounts)
+    by_employee: List[EmployeeAttendance] = field(default_factory=list)
+    by_department: List[DepartmentAttendance] = field(default_factory=list)
+    by_day: List[DayAttendance] = field(default_factory=list)
+
+
+def _working_dates(date_from, date_to, office_hours):
+    days = office_hours.get_working_days_list() if office_hours else DEFAULT_WORKING_DAYS
+    count = (date_to - date_from).days + 1
+    return [d for d in (date_from + timedelta(days=i) for i in range(max(count, 0))) if d.isoweekday() in days]
+
+
+def _counters(office_hours, day):
+    """Conditional aggregates shared by the per-employee and per-day statements"""
+    if office_hours:
+        late = Attendance.check_in > office_hours.late_threshold(day)
+        early = and_(Attendance.check_out.isnot(None), Attendance.check_out < office_hours.early_threshold(day))
+    else:
+        late = early = false()
+    return [
+        func.count(Attendance.id).label('records'),
+        func.count(Attendance.check_in).label('attended'),
+        func.count(Attendance.id).filter(late).label('late'),
+        func.count(Attendance.id).filter(early).label('early'),
+        func.count(Attendance.id).filter(Attendance.overtime_hours > 0).label('overtime'),
+        func.coalesce(func.sum(Attendance.overtime_hours), 0).label('overtime_hours')
+    ]
+
+
+def _counts(row, absences=0):
+    return AttendanceCounts(
+        row.records, row.attended, row.late, row.early, row.overtime, float(row.overtime_hours), absences
+    )
+
+
+def attendance_analytics(date_from, date_to, office_hours=None, today=None):
+    """Late/early/overtime/absence counts per employee, department and day.
+
+    Absences are working days (per the office hours, up to today and from the
+    employee's hire date) without a clock-in.
+    """
+    office_hours = office_hours or default_office_hours()
+    today = today or date.today()
+    in_range = and_(Attendance.date >= date_from, Attendance.date <= date_to)
+
+    working_dates = _working_dates(date_from, min(date_to, today), office_hours)
+    working_set = set(working_dates)
+
+    employee_rows = db.session.execute(
+        select(Employee.id, Employee.first_name, Employee.last_name, Employee.department, Employee.hire_date,
+               *_counters(office_hours, date_from),
+               func.count(Attendance.check_in).filter(Attendance.date.in_(working_dates)).label('attended_working'))
+        .outerjoin(Attendance, and_(Attendance.employee_id == Employee.id, in_range))
+        .where(Employee.is_active == True)
+        .group_by(Employee.id)
+        .order_by(Employee.first_name, Employee.last_name)
+    ).all()
+
+    by_employee = []
+    for row in employee_rows:
+        expected = len(working_dates) - bisect_left(working_dates, row.hire_date)
+        by_employee.append(EmployeeAttendance(
+            row.id, f"{row.first_name} {row.last_name}", row.department or 'Unassigned',
+            _counts(row, max(expected - row.attended_working, 0))
+        ))
+
+    departments = {}
+    for employee in by_employee:
+        headcount, counts = departments.get(employee.department, (0, AttendanceCounts()))
+        departments[employee.department] = (headcount + 1, counts + employee.counts)
+    by_department = [DepartmentAttendance(name, headcount, counts)
+                     for name, (headcount, counts) in sorted(departments.items())]
+
+    day_rows = {
+        row.date: row for row in db.session.execute(
+            select(Attendance.date, *_counters(office_hours, date_from))
+            .join(Employee, Attendance.employee_id == Employee.id)
+            .where(in_range, Employee.is_active == True)
+            .group_by(Attendance.date)
+        )
+    }
+    hire_dates = sorted(row.hire_date for row in employee_rows)
+    by_day = []
+    for offset in range((date_to - date_from).days + 1):
+        day = date_from + timedelta(days=offset)
+        row = day_rows.get(day)
+        attended = row.attended if row else 0
+        absences = max(bisect_right(hire_dates, day) - attended, 0) if day in working_set else 0
+        counts = _counts(row, absences) if row else AttendanceCounts(absences=absences)
+        by_day.append(DayAttendance(day, day in working_set, counts))
+
+    return AttendanceAnalytics(
+        date_from=date_from,
+        date_to=date_to,
+        working_days=len(working_dates),
+        office_hours=office_hours,
+        totals=sum((employee.counts for employee in by_employee), AttendanceCounts()),
+        by_employee=by_employee,
+        by_department=by_department,
+        by_day=by_day
+    )
@@ -0,0 +1,151 @@
+"""
+Bulk attendance import from CSV or Excel timesheets.
+
+plan_attendance_import() reads the whole sheet into a DataFrame and checks
+it column-wise: employee codes resolve through one lookup query, existing
+(employee, date) rows come back from one query over the sheet's date range,
+and hours, overtime and status are computed on whole columns with the same
+rules as services.clock_events.evaluate_clock. The result is an
+AttendanceImportPlan holding the insertable rows and a per-row error report,
+which is all a dry run needs. apply_attendance_import() writes the rows in
+chunks of IMPORT_CHUNK_SIZE with Core executemany.
+
+Columns: employee_id (the employee code), date, and optionally check_in,
+check_out (HH:MM), status and notes. Rows are numbered as in a spreadsheet,
+the header being row 1.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, time
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from models import Attendance, Employee, db
+from services.clock_events import DEFAULT_THRESHOLDS
+from services.policy_cache import default_office_hours
+from services.spreadsheets import read_sheet
+
+COLUMNS = ('employee_id', 'date', 'check_in', 'check_out', 'status', 'notes')
+STATUSES = ('present', 'absent', 'late', 'half_day')
+IMPORT_CHUNK_SIZE = 1000  # rows per INSERT executemany
+PREVIEW_ROWS = 50
+
+
+@dataclass
+class AttendanceImportPlan:
+    total: int = 0
+    rows: List[dict] = field(default_factory=list)
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    employee_codes: Dict[int, str] = field(default_factory=dict)
+
+    @property
+    def preview(self):
+        return self.rows[:PREVIEW_ROWS]
+
+
+def read_timesheet(stream, filename):
+    """Text DataFrame of a .csv or .xlsx timesheet; raises SpreadsheetError"""
+    return read_sheet(stream, filename, COLUMNS, required=('employee_id', 'date'))
+
+
+def _minutes(column):
+    """Minutes since midnight of HH:MM[:SS] text; NaN where blank or invalid"""
+    parsed = pd.to_datetime(column, format='%H:%M', errors='coerce')
+    parsed = parsed.fillna(pd.to_datetime(column, format='%H:%M:%S', errors='coerce'))
+    return (parsed.dt.hour * 60 + parsed.dt.minute + parsed.dt.second / 60).astype(float)
+
+
+def _existing_days(employee_ids, start, end):
+    if not employee_ids:
+        return set()
+    return {tuple(row) for row in db.session.execute(
+        select(Attendance.employee_id, Attendance.date)
+        .where(Attendance.date.between(start, end), Attendance.employee_id.in_(employee_ids))
+    )}
+
+
+def plan_attendance_import(frame):
+    """Validate a timesheet and compute its attendance rows without writing anything"""
+    plan = AttendanceImportPlan(total=len(frame))
+    if frame.empty:
+        return plan
+    errors = pd.Series('', index=frame.index)
+
+    def reject(mask, message):
+        # Keep the first problem found for each row
+        errors[mask & (errors == '')] = message
+
+    codes = frame['employee_id']
+    lookup = dict(db.session.execute(
+        select(Employee.employee_id, Employee.id).where(Employee.employee_id.in_(set(codes) - {''}))
+    ).all())
+    employee_ids = codes.map(lookup)
+    plan.employee_codes = {employee_id: code for code, employee_id in lookup.items()}
+    reject(codes == '', 'Missing employee_id')
+    reject(employee_ids.isna(), 'Unknown employee')
+
+    dates = pd.to_datetime(frame['date'], format='%Y-%m-%d', errors='coerce')
+    reject(dates.isna(), 'Invalid date (use YYYY-MM-DD)')
+
+    check_in, check_out = _minutes(frame['check_in']), _minutes(frame['check_out'])
+    reject((frame['check_in'] != '') & check_in.isna(), 'Invalid check_in (use HH:MM)')
+    reject((frame['check_out'] != '') & check_out.isna(), 'Invalid check_out (use HH:MM)')
+    reject(check_in.isna() & check_out.notna(), 'check_out without check_in')
+    reject(check_out < check_in, 'check_out before check_in')
+    status = frame['status'].str.lower()
+    reject((status != '') & ~status.isin(STATUSES), f"Invalid status (use {', '.join(STATUSES)})")
+
+    keys = pd.DataFrame({'employee_id': employee_ids, 'date': dates.dt.date})
+    duplicated = keys[errors == ''].duplicated(keep='first')
+    reject(duplicated.reindex(frame.index, fill_value=False), 'Duplicate row in file')
+    valid = errors == ''
+    if valid.any():
+        existing = _existing_days(
+            sorted({int(value) for value in employee_ids[valid]}), dates[valid].min().date(), dates[valid].max().date()
+        )
+        reject(pd.Series([key in existing for key in zip(employee_ids.fillna(0).astype(int), keys['date'])],
+                         index=frame.index), 'Attendance already recorded for this date')
+
+    # Same rules as evaluate_clock, a column at a time
+    office_hours = default_office_hours()
+    official_in, official_out, late_after, _ = office_hours.minute_thresholds if office_hours else DEFAULT_THRESHOLDS
+    worked = (check_out - check_in).clip(lower=0)
+    hours_worked = (worked / 60).round(2).fillna(0.0)
+    overtime = ((worked - (official_out - official_in)).clip(lower=0) / 60).round(2).fillna(0.0)
+    computed = np.where(check_in.isna(), 'absent', np.where(check_in > late_after, 'late', 'present'))
+    status = status.where(status != '', pd.Series(computed, index=frame.index))
+
+    now = datetime.utcnow()
+    for index in np.flatnonzero((errors == '').to_numpy()):
+        plan.rows.append({
+            'employee_id': int(employee_ids[index]),
+            'date': dates[index].date(),
+            'check_in': _as_time(check_in[index]),
+            'check_out': _as_time(check_out[index]),
+            'hours_worked': float(hours_worked[index]),
+            'overtime_hours': float(overtime[index]),
+            'status': status[index],
+            'notes': frame['notes'][index] or None,
+            'is_qr': False,
+            'source': 'import',
+            'created_at': now
+        })
+    plan.errors = [(int(index) + 2, errors[index]) for index in np.flatnonzero((errors != '').to_numpy())]
+    return plan
+
+
+def _as_time(minutes):
+    if np.isnan(minutes):
+        return None
+    seconds = int(round(minutes * 60))
+    return time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def apply_attendance_import(plan, chunk_size=IMPORT_CHUNK_SIZE):
+    """Insert a plan's rows in chunks; returns the number written. Does not commit."""
+    table = Attendance.__table__
+    for start in range(0, len(plan.rows), chunk_size):
+        db.session.execute(table.insert(), plan.rows[start:start + chunk_size])
+    return len(plan.rows)
@@ -0,0 +1,428 @@
+"""
+Clock events shared by the web, QR, admin and import entry points.
+
+evaluate_clock() is the one place that turns a check-in/check-out pair into
+status, hours worked, overtime and late/early minutes, using the cached
+default office hours (09:00-17:00 without grace periods when none are set).
+It works on minutes since midnight against thresholds cached on the office
+hours snapshot, so each call does no date parsing or datetime arithmetic;
+benchmarks/clock_event_benchmark.py times it.
+
+Web and QR clock-ins/outs are appended to the ClockEvent log. fold_day()
+turns a day's events into in/out pairs, collapsing repeated taps, and the
+daily Attendance row is materialized from that fold: in the same transaction
+when CLOCK_ROLLUP_MODE is 'inline', otherwise by the clock_rollup worker
+after commit. Admin entries and imports write day rows directly, and a day
+that has such a row but no events (including rows clocked in before the
+event log existed) is kept on that row: a clock-out fills in its check-out
+and hours, and the rollup never replaces it. None of these functions commit;
+callers own the transaction.
+
+On PostgreSQL the employee row is locked before the day is read, so
+concurrent clock-ins of one employee are decided one at a time. SQLite
+serializes them at the first write instead; taps that race past the check
+still fold to a single pair.
+"""
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import insert, or_, select, tuple_
+from sqlalchemy.exc import IntegrityError
+
+from models import Employee, Attendance, ClockEvent, db
+from services.clock_writes import EVENT_SOURCE, upsert_attendance_rows
+from services.location_registry import get_location
+from services.policy_cache import default_office_hours
+
+SOURCES = ('web', 'qr', 'admin', 'import')
+SOURCE_LABELS = {'qr': 'QR'}
+
+DEFAULT_THRESHOLDS = (9 * 60, 17 * 60, 9 * 60, 17 * 60)  # 09:00-17:00 without grace periods
+KEY_BATCH_SIZE = 500  # (employee_id, date) pairs per existence query
+
+APPENDED_FLAG = 'clock_events_appended'  # session.info key the rollup worker listens for
+
+
+class ClockError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ClockEvaluation:
+    status: str = 'present'
+    hours_worked: float = 0.0
+    overtime_hours: float = 0.0
+    late_minutes: int = 0
+    early_minutes: int = 0
+
+
+@dataclass(frozen=True)
+class DaySummary:
+    """One employee-day folded from its clock events"""
+    employee_id: int
+    date: object
+    pairs: Tuple[Tuple[ClockEvent, Optional[ClockEvent]], ...]
+    evaluation: ClockEvaluation
+    is_qr: bool = False
+    notes: Optional[str] = None
+    last_event: Optional[ClockEvent] = None
+
+    @property
+    def is_open(self):
+        return bool(self.pairs) and self.pairs[-1][1] is None
+
+    @property
+    def check_in(self):
+        return self.pairs[0][0].ts.time() if self.pairs else None
+
+    @property
+    def check_out(self):
+        return None if not self.pairs or self.is_open else self.pairs[-1][1].ts.time()
+
+    @property
+    def hours_worked(self):
+        return self.evaluation.hours_worked
+
+    @property
+    def overtime_hours(self):
+        return self.evaluation.overtime_hours
+
+    @property
+    def status(self):
+        return self.evaluation.status
+
+    def attendance_values(self):
+        return {
+            'employee_id': self.employee_id,
+            'date': self.date,
+            'check_in': self.check_in,
+            'check_out': self.check_out,
+            'hours_worked': self.hours_worked,
+            'overtime_hours': self.overtime_hours,
+            'status': self.status,
+            'notes': self.notes,
+            'is_qr': self.is_qr
+        }
+
+
+@dataclass(frozen=True)
+class ClockResult:
+    kind: str
+    summary: DaySummary
+    duplicate: bool = False
+
+    @property
+    def evaluation(self):
+        return self.summary.evaluation
+
+
+@dataclass(frozen=True)
+class ImportResult:
+    created: int = 0
+    skipped: List[Tuple[int, object]] = field(default_factory=list)
+
+
+def evaluate_clock(check_in, check_out=None, office_hours=None):
+    """Status, hours, overtime and late/early minutes for one day's times"""
+    if check_in is None:
+        return ClockEvaluation(status='absent')
+
+    official_in, official_out, late_after, early_before = (
+        office_hours.minute_thresholds if office_hours else DEFAULT_THRESHOLDS
+    )
+    arrived = check_in.hour * 60 + check_in.minute + check_in.second / 60
+    late_minutes = int(arrived - official_in) if arrived > late_after else 0
+    status = 'late' if late_minutes else 'present'
+    if check_out is None:
+        return ClockEvaluation(status, late_minutes=late_minutes)
+
+    left = check_out.hour * 60 + check_out.minute + check_out.second / 60
+    worked = left - arrived if left > arrived else 0
+    overtime = worked - (official_out - official_in)
+    return ClockEvaluation(
+        status,
+        round(worked / 60, 2),
+        round(overtime / 60, 2) if overtime > 0 else 0.0,
+        late_minutes,
+        int(official_out - left) if left < early_before else 0
+    )
+
+
+def _note(kind, source, location, minutes):
+    """'QR Clock-in at HQ (Late by 5 minutes)'; None for events without a location"""
+    if not location:
+        return None
+    label = SOURCE_LABELS.get(source, source.title())
+    note = f"{label} Clock-{kind} at {location['name']}"
+    if minutes:
+        note += f" ({'Late' if kind == 'in' else 'Early'} by {minutes} minutes)"
+    return note
+
+
+def _event_location(event):
+    if event.location_id is None:
+        return None
+    return get_location(event.location_id) or {'id': str(event.location_id), 'name': f'location {event.location_id}'}
+
+
+def fold_day(employee_id, day, events, office_hours=None):
+    """Pair a day's events in time order; repeated ins and unmatched outs are ignored"""
+    pairs, open_in = [], None
+    for event in sorted(events, key=lambda e: (e.ts, e.id or 0)):
+        if event.kind == 'in' and open_in is None:
+            open_in = event
+        elif event.kind == 'out' and open_in is not None:
+            pairs.append((open_in, event))
+            open_in = None
+    if open_in is not None:
+        pairs.append((open_in, None))
+    if not pairs:
+        return None
+
+    first_in, last_out = pairs[0][0], pairs[-1][1]
+    evaluation = evaluate_clock(first_in.ts.time(), last_out.ts.time() if last_out else None, office_hours)
+    if len(pairs) > 1 and last_out is not None:
+        # Breaks between pairs are not worked time
+        official_in, official_out = (office_hours.minute_thresholds if office_hours else DEFAULT_THRESHOLDS)[:2]
+        worked = sum((out.ts - in_.ts).total_seconds() for in_, out in pairs) / 60
+        overtime = worked - (official_out - official_in)
+        evaluation = replace(
+            evaluation, hours_worked=round(worked / 60, 2),
+            overtime_hours=round(overtime / 60, 2) if overtime > 0 else 0.0
+        )
+
+    notes = []
+    for index, (in_event, out_event) in enumerate(pairs):
+        notes.append(_note('in', in_event.source, _event_location(in_event), evaluation.late_minutes if index == 0 else 0))
+        if out_event is not None:
+            last = index == len(pairs) - 1
+            notes.append(_note('out', out_event.source, _event_location(out_event), evaluation.early_minutes if last else 0))
+    notes = [note for note in notes if note]
+
+    return DaySummary(
+        employee_id=employee_id,
+        date=day,
+        pairs=tuple(pairs),
+        evaluation=evaluation,
+        is_qr=any(event.source == 'qr' for event in events),
+        notes=' | '.join(notes) or None,
+        last_event=max(events, key=lambda e: (e.ts, e.id or 0))
+    )
+
+
+def day_events(employee_id, day):
+    return list(db.session.scalars(
+        select(ClockEvent).where(ClockEvent.employee_id == employee_id, ClockEvent.day == day)
+    ))
+
+
+def day_summary(employee_id, day, office_hours=None):
+    """Live view of a day from its events (None without events); one indexed query"""
+    return fold_day(employee_id, day, day_events(employee_id, day), office_hours or default_office_hours())
+
+
+def _check_source(source):
+    if source not in SOURCES:
+        raise ValueError(f'Unknown clock event source: {source}')
+
+
+def _lock_employee(employee_id):
+    """Serialize clock actions of one employee until the transaction ends (PostgreSQL)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(select(Employee.id).where(Employee.id == employee_id).with_for_update())
+
+
+def _day_state(employee_id, day):
+    """(events, row): the day's events, or with none, an attendance row not rolled up from events"""
+    events = day_events(employee_id, day)
+    if events:
+        return events, None
+    row = db.session.scalars(
+        select(Attendance).where(
+            Attendance.employee_id == employee_id, Attendance.date == day,
+            or_(Attendance.source.is_(None), Attendance.source != EVENT_SOURCE)
+        )
+    ).first()
+    return events, row
+
+
+def _row_summary(row, out_event=None, evaluation=None):
+    """DaySummary of a day kept on its attendance row; the events are stand-ins, not logged"""
+    in_event = ClockEvent(
+        employee_id=row.employee_id, day=row.date, ts=datetime.combine(row.date, row.check_in),
+        kind='in', source=row.source or 'web'
+    )
+    out_event = out_event or (ClockEvent(
+        employee_id=row.employee_id, day=row.date, ts=datetime.combine(row.date, row.check_out),
+        kind='out', source=row.source or 'web'
+    ) if row.check_out else None)
+    return DaySummary(
+        employee_id=row.employee_id,
+        date=row.date,
+        pairs=((in_event, out_event),),
+        evaluation=evaluation or ClockEvaluation(
+            row.status or 'present', float(row.hours_worked or 0), float(row.overtime_hours or 0)
+        ),
+        is_qr=bool(row.is_qr),
+        notes=row.notes,
+        last_event=out_event or in_event
+    )
+
+
+def _row_is_open(row):
+    return row.check_in is not None and row.check_out is None
+
+
+def _close_row(row, timestamp, source, location):
+    """Clock out on a day kept on its attendance row; the row's status is kept"""
+    evaluation = evaluate_clock(row.check_in, timestamp.time(), default_office_hours())
+    row.check_out = timestamp.time()
+    row.hours_worked = evaluation.hours_worked
+    row.overtime_hours = evaluation.overtime_hours
+    note = _note('out', source, location, evaluation.early_minutes)
+    if note:
+        row.notes = f'{row.notes} | {note}' if row.notes else note
+    row.is_qr = bool(row.is_qr) or source == 'qr'
+    out_event = ClockEvent(
+        employee_id=row.employee_id, day=row.date, ts=timestamp, kind='out', source=source,
+        location_id=int(location['id']) if location else None
+    )
+    return _row_summary(row, out_event, replace(evaluation, status=row.status or evaluation.status))
+
+
+def _append(employee_id, timestamp, kind, source, location, events):
+    """Log one event and refold the day; the Attendance row follows per CLOCK_ROLLUP_MODE"""
+    inline = current_app.config.get('CLOCK_ROLLUP_MODE', 'background') == 'inline'
+    event = ClockEvent(
+        employee_id=employee_id, day=timestamp.date(), ts=timestamp, kind=kind, source=source,
+        location_id=int(location['id']) if location else None, rolled_up=inline
+    )
+    db.session.add(event)
+    if not inline:
+        db.session.info[APPENDED_FLAG] = True
+        return fold_day(employee_id, timestamp.date(), events + [event], default_office_hours())
+
+    # Refold from the table: on SQLite the flush is what serializes concurrent scans
+    db.session.flush()
+    summary = fold_day(employee_id, timestamp.date(), day_events(employee_id, timestamp.date()), default_office_hours())
+    upsert_attendance_rows([summary.attendance_values()])
+    return summary
+
+
+def clock_in(employee_id, timestamp, source, location=None):
+    """Log a clock-in at ``timestamp``; raises ClockError while already clocked in"""
+    _check_source(source)
+    _lock_employee(employee_id)
+    events, row = _day_state(employee_id, timestamp.date())
+    if row is not None:
+        raise ClockError('Already clocked in' if _row_is_open(row) else 'Attendance already recorded for this date')
+    summary = fold_day(employee_id, timestamp.date(), events, default_office_hours())
+    if summary and summary.is_open:
+        raise ClockError('Already clocked in')
+    return ClockResult('clock_in', _append(employee_id, timestamp, 'in', source, location, events))
+
+
+def clock_out(employee_id, timestamp, source, location=None):
+    """Log a clock-out at ``timestamp``; raises ClockError without an open clock-in"""
+    _check_source(source)
+    _lock_employee(employee_id)
+    events, row = _day_state(employee_id, timestamp.date())
+    if row is not None:
+        if not _row_is_open(row):
+            raise ClockError('Already clocked out' if row.check_out else 'Attendance already recorded for this date')
+        return ClockResult('clock_out', _close_row(row, timestamp, source, location))
+    summary = fold_day(employee_id, timestamp.date(), events, default_office_hours())
+    if not summary or not summary.is_open:
+        raise ClockError('Already clocked out' if summary else 'Please clock in first')
+    return ClockResult('clock_out', _append(employee_id, timestamp, 'out', source, location, events))
+
+
+def scan(employee_id, timestamp, source, location=None, rescan_window=60):
+    """Clock in or out, whichever is due.
+
+    A scan within ``rescan_window`` seconds of the day's last event (a double
+    tap or a retried request) repeats that event's result instead.
+    """
+    _check_source(source)
+    _lock_employee(employee_id)
+    events, row = _day_state(employee_id, timestamp.date())
+    if row is not None:
+        summary = _row_summary(row) if row.check_in else None
+        if summary and timestamp - summary.last_event.ts < timedelta(seconds=rescan_window):
+            return ClockResult('clock_out' if summary.last_event.kind == 'out' else 'clock_in', summary, duplicate=True)
+        if not _row_is_open(row):
+            raise ClockError('Attendance already recorded for this date')
+        return ClockResult('clock_out', _close_row(row, timestamp, source, location))
+    summary = fold_day(employee_id, timestamp.date(), events, default_office_hours())
+    if summary and timestamp - summary.last_event.ts < timedelta(seconds=rescan_window):
+        return ClockResult('clock_out' if summary.last_event.kind == 'out' else 'clock_in', summary, duplicate=True)
+    kind = 'out' if summary and summary.is_open else 'in'
+    return ClockResult(f'clock_{kind}', _append(employee_id, timestamp, kind, source, location, events))
+
+
+def _attendance_values(employee_id, day, check_in, check_out, status, notes, office_hours, source):
+    evaluation = evaluate_clock(check_in, check_out, office_hours)
+    return {
+        'employee_id': employee_id,
+        'date': day,
+        'check_in': check_in,
+        'check_out': check_out,
+        'hours_worked': evaluation.hours_worked,
+        'overtime_hours': evaluation.overtime_hours,
+        'status': status or evaluation.status,
+        'notes': notes,
+        'source': source,
+        'created_at': datetime.utcnow()
+    }
+
+
+def record_attendance(employee_id, day, check_in=None, check_out=None, status=None, notes=None, source='admin'):
+    """Add a complete day's record; an explicit ``status`` overrides the computed one"""
+    _check_source(source)
+    values = _attendance_values(employee_id, day, check_in, check_out, status, notes, default_office_hours(), source)
+    try:
+        with db.session.begin_nested():
+            return db.session.scalars(insert(Attendance).values(**values).returning(Attendance)).one()
+    except IntegrityError:
+        raise ClockError('Attendance already recorded for this date')
+
+
+def import_attendance(records, source='import'):
+    """Insert many day records at once, skipping days that already have one.
+
+    ``records`` are dicts with employee_id, date and optionally check_in,
+    check_out, status and notes. Existing days are looked up in batches of
+    KEY_BATCH_SIZE and the new rows go in as a single executemany.
+    """
+    _check_source(source)
+    records = list(records)
+    if not records:
+        return ImportResult()
+
+    key_list = list({(record['employee_id'], record['date']) for record in records})
+    existing = set()
+    for start in range(0, len(key_list), KEY_BATCH_SIZE):
+        existing.update(tuple(row) for row in db.session.execute(
+            select(Attendance.employee_id, Attendance.date)
+            .where(tuple_(Attendance.employee_id, Attendance.date).in_(key_list[start:start + KEY_BATCH_SIZE]))
+        ))
+
+    office_hours = default_office_hours()
+    rows, skipped, seen = [], [], set()
+    for record in records:
+        key = (record['employee_id'], record['date'])
+        if key in existing or key in seen:
+            skipped.append(key)
+            continue
+        seen.add(key)
+        rows.append(_attendance_values(
+            record['employee_id'], record['date'], record.get('check_in'), record.get('check_out'),
+            record.get('status'), record.get('notes'), office_hours, source
+        ))
+
+    if rows:
+        # Core insert: the ORM would split rows with missing times into separate batches
+        db.session.execute(Attendance.__table__.insert(), rows)
+    return ImportResult(created=len(rows), skipped=skipped)
@@ -0,0 +1,212 @@
+"""
+Bulk ingest of clock events buffered by offline kiosks and terminals.
+
+ingest_events() takes the raw records of one upload (employee code, ISO
+timestamp, optional kind, location and source), validates them in a single
+pass and appends the accepted ones to the ClockEvent log with one
+executemany. Employees and the touched days' existing events are loaded in
+batches of KEY_BATCH_SIZE, so a day of scans from a whole site costs a
+handful of queries rather than a request per scan.
+
+Events are deduplicated by (employee, ts) against the log and within the
+upload, so a kiosk can resend a buffer it is unsure about; the unique key on
+(employee_id, ts) catches an upload racing another one with the same events. Records without a
+kind are scans: like services.clock_events.scan() they clock in or out,
+whichever is due at that time, and a scan within the rescan window of the
+previous event is a duplicate. Attendance rows follow CLOCK_ROLLUP_MODE;
+inline, the touched days are refolded and written with one upsert.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from flask import current_app
+from sqlalchemy import select, tuple_
+
+from models import ClockEvent, Employee, db
+from services.clock_events import APPENDED_FLAG, KEY_BATCH_SIZE, SOURCES, fold_day
+from services.clock_writes import insert_clock_events, upsert_attendance_rows
+from services.location_registry import get_location
+from services.policy_cache import default_office_hours
+
+KINDS = ('in', 'out')
+DEFAULT_MAX_EVENTS = 10000  # records per upload
+
+
+@dataclass(frozen=True)
+class EventResult:
+    index: int
+    status: str  # accepted, duplicate, rejected
+    kind: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self):
+        result = {'index': self.index, 'status': self.status}
+        if self.kind:
+            result['kind'] = self.kind
+        if self.error:
+            result['error'] = self.error
+        return result
+
+
+@dataclass(frozen=True)
+class IngestResult:
+    results: List[EventResult] = field(default_factory=list)
+
+    def count(self, status):
+        return sum(1 for result in self.results if result.status == status)
+
+    def to_dict(self):
+        return {
+            'accepted': self.count('accepted'),
+            'duplicates': self.count('duplicate'),
+            'rejected': self.count('rejected'),
+            'results': [result.to_dict() for result in self.results]
+        }
+
+
+class _Pending:
+    """A validated record waiting for its kind and duplicate check"""
+    __slots__ = ('index', 'employee_id', 'ts', 'kind', 'source', 'location_id', 'id')
+
+    def __init__(self, index, employee_id, ts, kind, source, location_id):
+        self.index, self.employee_id, self.ts = index, employee_id, ts
+        self.kind, self.source, self.location_id = kind, source, location_id
+        self.id = None
+
+
+def _parse_ts(value):
+    if isinstance(value, datetime):
+        ts = value
+    else:
+        ts = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    # Attendance times are local wall-clock times
+    return ts.astimezone().replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def _validate(index, record, employees, default_source):
+    """A _Pending for a well-formed record, or the reason it is rejected"""
+    code = str(record.get('employee_id') or '').strip()
+    if not code:
+        return 'Missing employee_id'
+    if code not in employees:
+        return f'Unknown employee: {code}'
+    try:
+        ts = _parse_ts(record.get('ts') or '')
+    except ValueError:
+        return 'Invalid timestamp'
+    # JSON uploads can carry any type; anything not spelling a known value is rejected below
+    kind = str(record.get('kind') or '').strip().lower() or None
+    if kind is not None and kind not in KINDS:
+        return f'Invalid kind: {kind}'
+    source = str(record.get('source') or '').strip().lower() or default_source
+    if source not in SOURCES:
+        return f'Unknown source: {source}'
+    location_id = record.get('location_id')
+    if location_id not in (None, ''):
+        if get_location(location_id) is None:
+            return f'Unknown location: {location_id}'
+        location_id = int(location_id)
+    else:
+        location_id = None
+    return _Pending(index, employees[code], ts, kind, source, location_id)
+
+
+def _load_employees(codes):
+    codes = sorted(codes)
+    employees = {}
+    for start in range(0, len(codes), KEY_BATCH_SIZE):
+        employees.update(db.session.execute(
+            select(Employee.employee_id, Employee.id)
+            .where(Employee.employee_id.in_(codes[start:start + KEY_BATCH_SIZE]), Employee.is_active.is_(True))
+        ).all())
+    return employees
+
+
+def _load_day_events(days):
+    grouped = defaultdict(list)
+    days = sorted(days)
+    for start in range(0, len(days), KEY_BATCH_SIZE):
+        for clock_event in db.session.scalars(
+            select(ClockEvent).where(tuple_(ClockEvent.employee_id, ClockEvent.day).in_(days[start:start + KEY_BATCH_SIZE]))
+        ):
+            grouped[(clock_event.employee_id, clock_event.day)].append(clock_event)
+    return grouped
+
+
+def _resolve_day(existing, pending, rescan_window):
+    """Settle kinds and duplicates of one employee-day's new events in time order"""
+    logged = {event.ts: event.kind for event in existing}
+    timeline = sorted(existing + pending, key=lambda e: (e.ts, e.id or 0, getattr(e, 'index', 0)))
+    results, is_open, last = {}, False, None
+    for event in timeline:
+        if isinstance(event, ClockEvent):
+            kind = event.kind
+        elif event.ts in logged:
+            results[event.index] = EventResult(event.index, 'duplicate', logged[event.ts])
+            continue
+        elif event.kind is None and last is not None and event.ts - last.ts < rescan_window:
+            results[event.index] = EventResult(event.index, 'duplicate', last.kind)
+            continue
+        else:
+            kind = event.kind = event.kind or ('out' if is_open else 'in')
+            logged[event.ts] = kind
+            results[event.index] = EventResult(event.index, 'accepted', kind)
+        # Same pairing rules as fold_day: repeated ins and unmatched outs change nothing
+        if kind == 'in':
+            is_open = True
+        elif is_open:
+            is_open = False
+        last = event
+    return results
+
+
+def ingest_events(records, source='qr', rescan_window=60):
+    """Validate, deduplicate and append a batch of clock events; does not commit"""
+    if source not in SOURCES:
+        raise ValueError(f'Unknown clock event source: {source}')
+    records = list(records)
+    employees = _load_employees({str(record.get('employee_id') or '').strip() for record in records} - {''})
+
+    results, by_day = {}, defaultdict(list)
+    for index, record in enumerate(records):
+        pending = _validate(index, record, employees, source)
+        if isinstance(pending, str):
+            results[index] = EventResult(index, 'rejected', error=pending)
+        else:
+            by_day[(pending.employee_id, pending.ts.date())].append(pending)
+
+    existing = _load_day_events(by_day)
+    window = timedelta(seconds=rescan_window)
+    accepted = []
+    for key, pending in by_day.items():
+        day_results = _resolve_day(existing[key], pending, window)
+        results.update(day_results)
+        accepted.extend(event for event in pending if day_results[event.index].status == 'accepted')
+
+    if accepted:
+        now = datetime.utcnow()
+        inline = current_app.config.get('CLOCK_ROLLUP_MODE', 'background') == 'inline'
+        inserted = insert_clock_events([{
+            'employee_id': event.employee_id, 'day': event.ts.date(), 'ts': event.ts, 'kind': event.kind,
+            'source': event.source, 'location_id': event.location_id, 'rolled_up': inline, 'created_at': now
+        } for event in accepted])
+        # Logged by a concurrent upload since the day was read
+        for event in accepted:
+            if (event.employee_id, event.ts) not in inserted:
+                results[event.index] = EventResult(event.index, 'duplicate', event.kind)
+        _apply({(event.employee_id, event.ts.date()) for event in accepted if (event.employee_id, event.ts) in inserted})
+
+    return IngestResult([results[index] for index in range(len(records))])
+
+
+def _apply(days):
+    """Bring the touched days' attendance rows up to date per CLOCK_ROLLUP_MODE"""
+    if current_app.config.get('CLOCK_ROLLUP_MODE', 'background') != 'inline':
+        db.session.info[APPENDED_FLAG] = True
+        return
+    office_hours = default_office_hours()
+    summaries = [fold_day(employee_id, day, events, office_hours)
+                 for (employee_id, day), events in _load_day_events(days).items()]
+    upsert_attendance_rows([summary.attendance_values() for summary in summaries if summary])
@@ -0,0 +1,145 @@
+"""
+Incremental rollup of the clock-event log into daily attendance rows.
+
+rollup_clock_events() reads the events not yet rolled up in id order,
+refolds every employee-day they touch from all of that day's events, upserts
+the resulting Attendance rows and sets ``rolled_up`` on those events in the
+same transaction. Each event carries its own flag rather than the rollup
+keeping a high-water mark of ids: ids are assigned at insert, not at commit,
+so a transaction that commits late can add an event below ids already
+processed, and a watermark would skip it for good. Refolding whole days
+keeps the rollup idempotent, so overlapping runs in several worker processes
+are harmless.
+
+In the default 'background' CLOCK_ROLLUP_MODE, a commit that appended events
+queues a run on a single local worker thread, so the scan path only pays for
+an INSERT. In 'manual' mode nothing is queued and ``flask rollup-clock-events``
+(from cron, say) does the catching up.
+
+The same runs refresh the attendance summary days that commits left queued
+(services.summaries.refresh_pending_days), including the days the rollup's
+own upserts queue; a commit that queued days schedules a run as well.
+"""
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, tuple_, update
+
+from models import ClockEvent, db
+from services.clock_events import APPENDED_FLAG, KEY_BATCH_SIZE, fold_day
+from services.clock_writes import upsert_attendance_rows
+from services.policy_cache import default_office_hours
+from services.session_hooks import CommitHook
+from services.summaries import PENDING_DAYS_FLAG, refresh_pending_days
+
+DEFAULT_BATCH_SIZE = 1000  # events per rollup transaction
+
+_executor = None
+_executor_lock = threading.Lock()
+_queued = False
+
+
+def _day_events(days):
+    """All events of the given (employee_id, day) pairs, grouped by pair"""
+    grouped = defaultdict(list)
+    days = sorted(days)
+    for start in range(0, len(days), KEY_BATCH_SIZE):
+        for clock_event in db.session.scalars(
+            select(ClockEvent).where(tuple_(ClockEvent.employee_id, ClockEvent.day).in_(days[start:start + KEY_BATCH_SIZE]))
+        ):
+            grouped[(clock_event.employee_id, clock_event.day)].append(clock_event)
+    return grouped
+
+
+def rollup_clock_events(batch_size=None):
+    """Materialize attendance rows for events not yet rolled up; returns days rolled up"""
+    batch_size = batch_size or current_app.config.get('CLOCK_ROLLUP_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    office_hours = default_office_hours()
+    rolled = 0
+    while True:
+        pending = db.session.execute(
+            select(ClockEvent.id, ClockEvent.employee_id, ClockEvent.day)
+            .where(ClockEvent.rolled_up.is_(False))
+            .order_by(ClockEvent.id)
+            .limit(batch_size)
+        ).all()
+        if not pending:
+            db.session.commit()
+            return rolled
+
+        days = {(row.employee_id, row.day) for row in pending}
+        summaries = [fold_day(employee_id, day, events, office_hours)
+                     for (employee_id, day), events in _day_events(days).items()]
+        upsert_attendance_rows([summary.attendance_values() for summary in summaries if summary])
+        # Only the events read above: one committed meanwhile is folded again by the next run
+        db.session.execute(
+            update(ClockEvent).where(ClockEvent.id.in_([row.id for row in pending])).values(rolled_up=True),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        rolled += len(days)
+        if len(pending) < batch_size:
+            return rolled
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clock-rollup')
+    return _executor
+
+
+def schedule_rollup(app):
+    """Queue a background rollup unless one is already waiting to start"""
+    global _queued
+    with _executor_lock:
+        if _queued:
+            return None
+        _queued = True
+        return _get_executor().submit(_rollup_in_app_context, app)
+
+
+def _rollup_in_app_context(app):
+    global _queued
+    with _executor_lock:
+        # Events committed from now on queue another run behind this one
+        _queued = False
+    with app.app_context():
+        try:
+            rolled = rollup_clock_events()
+            refresh_pending_days()
+            return rolled
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Clock event rollup failed')
+        finally:
+            db.session.remove()
+
+
+def _schedule(flagged):
+    if current_app.config.get('CLOCK_ROLLUP_MODE', 'background') == 'background':
+        schedule_rollup(current_app._get_current_object())
+
+
+# The scan and ingest paths set APPENDED_FLAG themselves when they leave events to the rollup
+_commit_hook = CommitHook(APPENDED_FLAG, _schedule)
+_summary_hook = CommitHook(PENDING_DAYS_FLAG, _schedule)
+
+
+@click.command('rollup-clock-events')
+@with_appcontext
+def rollup_clock_events_command():
+    """Materialize attendance rows from clock events not yet rolled up, then queued summary days."""
+    click.echo(f'Rolled up {rollup_clock_events()} employee-days')
+    click.echo(f'Refreshed summaries for {refresh_pending_days()} attendance days')
+
+
+def init_clock_rollup(app):
+    """Schedule background rollups after commits that appended clock events or queued summary days"""
+    app.cli.add_command(rollup_clock_events_command)
+    _commit_hook.listen(db.session)
+    _summary_hook.listen(db.session)
@@ -0,0 +1,89 @@
+"""
+Atomic attendance writes keyed on (employee_id, date).
+
+Daily attendance rows are summaries rolled up from the clock-event log, so
+writing one means replacing whatever is there. upsert_attendance_rows() does
+that for a whole batch in one ``INSERT ... ON CONFLICT (employee_id, date)
+DO UPDATE`` executemany on PostgreSQL and SQLite. Concurrent rollups of the
+same day can therefore neither duplicate the row nor fail on the unique key.
+
+Only rows the rollup wrote itself (``source`` EVENT_SOURCE) are replaced.
+Admin entries, imports and rows from before the event log are left as they
+are even when events for the day turn up.
+
+insert_clock_events() appends to the event log the same way, with ``ON
+CONFLICT (employee_id, ts) DO NOTHING``, so two uploads of one kiosk buffer
+racing each other log every event once.
+"""
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import Attendance, ClockEvent, db
+
+_UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert
+}
+
+SUMMARY_COLUMNS = ('check_in', 'check_out', 'hours_worked', 'overtime_hours', 'status', 'notes', 'is_qr')
+EVENT_SOURCE = 'clock'  # Attendance.source of rows materialized from clock events
+
+
+def upsert_attendance_rows(rows):
+    """Insert or replace rolled-up day rows; each row has employee_id, date and SUMMARY_COLUMNS"""
+    if not rows:
+        return
+    table = Attendance.__table__
+    rows = [{**row, 'source': EVENT_SOURCE} for row in rows]
+    dialect_insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if dialect_insert is not None:
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.employee_id, table.c.date],
+            set_={name: statement.excluded[name] for name in SUMMARY_COLUMNS},
+            where=table.c.source == EVENT_SOURCE
+        )
+        now = datetime.utcnow()
+        db.session.execute(statement, [{'created_at': now, **row} for row in rows])
+        return
+
+    # Other backends: update the days that exist, insert the rest
+    for row in rows:
+        attendance = db.session.scalars(
+            select(Attendance).filter_by(employee_id=row['employee_id'], date=row['date'])
+        ).first()
+        if attendance is None:
+            db.session.add(Attendance(**row))
+        elif attendance.source == EVENT_SOURCE:
+            for name in SUMMARY_COLUMNS:
+                setattr(attendance, name, row[name])
+    db.session.flush()
+
+
+def insert_clock_events(rows):
+    """Append event rows, skipping any (employee_id, ts) already logged; returns the keys inserted"""
+    if not rows:
+        return set()
+    table = ClockEvent.__table__
+    dialect_insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if dialect_insert is not None:
+        statement = (
+            dialect_insert(table)
+            .on_conflict_do_nothing(index_elements=[table.c.employee_id, table.c.ts])
+            .returning(table.c.employee_id, table.c.ts)
+        )
+        return {tuple(key) for key in db.session.execute(statement, rows)}
+
+    # Other backends: insert the events not logged yet
+    inserted = set()
+    for row in rows:
+        key = (row['employee_id'], row['ts'])
+        if key in inserted or db.session.scalar(
+            select(ClockEvent.id).filter_by(employee_id=row['employee_id'], ts=row['ts'])
+        ) is not None:
+            continue
+        db.session.execute(table.insert(), [row])
+        inserted.add(key)
+    return inserted
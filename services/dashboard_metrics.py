@@ -0,0 +1,123 @@
+"""
+Dashboard metrics shared by admin.dashboard, admin.api_stats and api.get_stats.
+
+Every counter is computed with conditional aggregation, so each table is read
+by a single statement instead of one COUNT per status. Monthly trends come
+from the payroll_monthly_summaries table (see services.summaries).
+"""
+from dataclasses import dataclass, field, asdict
+from datetime import date, timedelta
+from typing import List, Optional
+
+from sqlalchemy import func, select
+
+from models import User, Employee, Payroll, Attendance, PayrollMonthlySummary, db
+
+TREND_DAYS = 180  # Six-month dashboard trend
+
+
+@dataclass(frozen=True)
+class DepartmentStat:
+    department: str
+    count: int
+    avg_salary: float
+
+
+@dataclass(frozen=True)
+class MonthlyTrend:
+    year: int
+    month: int
+    count: int
+    total_salary: float
+
+    @property
+    def label(self):
+        return f"{self.year}-{self.month:02d}"
+
+
+@dataclass(frozen=True)
+class DashboardMetrics:
+    total_employees: int
+    total_users: int
+    total_payrolls: int
+    processed_payrolls: int
+    pending_payrolls: int
+    total_salary_payout: float
+    today_attendance: int
+    today_present: int
+    today_absent: int
+    dept_stats: List[DepartmentStat] = field(default_factory=list)
+    monthly_trends: List[MonthlyTrend] = field(default_factory=list)
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _payroll_counters():
+    """Payroll counts, processed payout and the user count in one statement"""
+    processed = Payroll.status == 'processed'
+    return db.session.execute(select(
+        func.count(Payroll.id).label('total'),
+        func.count(Payroll.id).filter(processed).label('processed'),
+        func.count(Payroll.id).filter(Payroll.status == 'pending').label('pending'),
+        func.coalesce(func.sum(Payroll.net_salary).filter(processed), 0).label('payout'),
+        select(func.count(User.id)).scalar_subquery().label('users')
+    )).one()
+
+
+def _attendance_counters(today):
+    return db.session.execute(select(
+        func.count(Attendance.id).label('total'),
+        func.count(Attendance.id).filter(Attendance.status == 'present').label('present'),
+        func.count(Attendance.id).filter(Attendance.status == 'absent').label('absent')
+    ).where(Attendance.date == today)).one()
+
+
+def department_stats():
+    rows = db.session.execute(select(
+        Employee.department,
+        func.count(Employee.id).label('count'),
+        func.avg(Employee.salary).label('avg_salary')
+    ).where(Employee.is_active == True).group_by(Employee.department)).all()
+    return [DepartmentStat(row.department, row.count, float(row.avg_salary or 0)) for row in rows]
+
+
+def monthly_payroll_trends(since=None):
+    """Processed payroll count and net total per month, optionally from the month of a start date"""
+    statement = select(
+        PayrollMonthlySummary.month,
+        func.sum(PayrollMonthlySummary.payroll_count).label('count'),
+        func.sum(PayrollMonthlySummary.net_total).label('total_salary')
+    ).where(PayrollMonthlySummary.status == 'processed')
+    if since is not None:
+        statement = statement.where(PayrollMonthlySummary.month >= since.replace(day=1))
+    rows = db.session.execute(
+        statement.group_by(PayrollMonthlySummary.month).order_by(PayrollMonthlySummary.month)
+    ).all()
+    return [MonthlyTrend(row.month.year, row.month.month, int(row.count), float(row.total_salary or 0)) for row in rows]
+
+
+def collect_dashboard_metrics(today=None, include_trends=True, trend_since: Optional[date] = None):
+    """Gather every dashboard counter; trends default to the last six months"""
+    today = today or date.today()
+    payroll = _payroll_counters()
+    attendance = _attendance_counters(today)
+    departments = department_stats()
+
+    trends = []
+    if include_trends:
+        trends = monthly_payroll_trends(trend_since or today - timedelta(days=TREND_DAYS))
+
+    return DashboardMetrics(
+        total_employees=sum(dept.count for dept in departments),
+        total_users=payroll.users,
+        total_payrolls=payroll.total,
+        processed_payrolls=payroll.processed,
+        pending_payrolls=payroll.pending,
+        total_salary_payout=float(payroll.payout),
+        today_attendance=attendance.total,
+        today_present=attendance.present,
+        today_absent=attendance.absent,
+        dept_stats=departments,
+        monthly_trends=trends
+    )
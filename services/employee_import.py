@@ -0,0 +1,162 @@
+"""
+Bulk employee onboarding from CSV or Excel.
+
+plan_employee_import() validates a whole sheet column-wise, as the
+attendance import does: taken emails and employee codes come back from one
+query each, and every row's username is allocated up front against a single
+prefetched set of taken names rather than probing the users table name by
+name. apply_employee_import() then hashes a temporary password per account
+on the services.password_hashing pool and writes users and employees with
+chunked bulk inserts. Nothing is written during a dry run.
+
+Columns: first_name, last_name, email, job_title, department, hire_date
+(YYYY-MM-DD) and salary are required; phone, employee_id (generated when
+blank), tax_id, bank_name, bank_account and address are optional.
+"""
+import secrets
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from models import Employee, User, db
+from services.password_hashing import hash_passwords
+from services.usernames import allocate_usernames
+from services.spreadsheets import read_sheet
+
+REQUIRED = ('first_name', 'last_name', 'email', 'job_title', 'department', 'hire_date', 'salary')
+COLUMNS = REQUIRED + ('phone', 'employee_id', 'tax_id', 'bank_name', 'bank_account', 'address')
+LENGTHS = {  # (min, max) as in EmployeeForm and the column sizes
+    'first_name': (2, 50), 'last_name': (2, 50), 'email': (0, 120), 'job_title': (2, 100),
+    'department': (2, 100), 'phone': (0, 20), 'employee_id': (0, 20), 'tax_id': (0, 20),
+    'bank_name': (0, 100), 'bank_account': (0, 50)
+}
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+LOOKUP_BATCH_SIZE = 500  # values per IN list
+IMPORT_CHUNK_SIZE = 1000  # rows per INSERT executemany
+PREVIEW_ROWS = 50
+
+
+@dataclass
+class EmployeeImportPlan:
+    total: int = 0
+    rows: List[dict] = field(default_factory=list)
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def preview(self):
+        return self.rows[:PREVIEW_ROWS]
+
+
+@dataclass(frozen=True)
+class Credential:
+    name: str
+    employee_id: str
+    username: str
+    password: str
+
+
+def read_employee_sheet(stream, filename):
+    """Text DataFrame of a .csv or .xlsx employee list; raises SpreadsheetError"""
+    return read_sheet(stream, filename, COLUMNS, required=REQUIRED)
+
+
+def _existing(column, values):
+    """Lower-cased ``values`` already present in ``column``"""
+    values = sorted(set(values) - {''})
+    found = set()
+    for start in range(0, len(values), LOOKUP_BATCH_SIZE):
+        found.update(db.session.scalars(
+            select(func.lower(column)).where(func.lower(column).in_(values[start:start + LOOKUP_BATCH_SIZE]))
+        ))
+    return found
+
+
+def plan_employee_import(frame):
+    """Validate an employee sheet and allocate usernames without writing anything"""
+    plan = EmployeeImportPlan(total=len(frame))
+    if frame.empty:
+        return plan
+    errors = pd.Series('', index=frame.index)
+
+    def reject(mask, message):
+        # Keep the first problem found for each row
+        errors[mask & (errors == '')] = message
+
+    for column in REQUIRED:
+        reject(frame[column] == '', f'Missing {column}')
+    for column, (shortest, longest) in LENGTHS.items():
+        lengths = frame[column].str.len()
+        reject((lengths > longest) | ((lengths > 0) & (lengths < shortest)),
+               f'{column} must be {shortest}-{longest} characters' if shortest else f'{column} is longer than {longest} characters')
+
+    emails = frame['email'].str.lower()
+    reject(~emails.str.match(EMAIL_PATTERN), 'Invalid email')
+    hire_dates = pd.to_datetime(frame['hire_date'], format='%Y-%m-%d', errors='coerce')
+    reject(hire_dates.isna(), 'Invalid hire_date (use YYYY-MM-DD)')
+    salaries = pd.to_numeric(frame['salary'].str.replace(',', '', regex=False), errors='coerce')
+    reject(salaries.isna() | (salaries < 0), 'Invalid salary')
+
+    codes = frame['employee_id']
+    reject(emails.duplicated(keep='first'), 'Duplicate email in file')
+    reject((codes != '') & codes.str.lower().duplicated(keep='first'), 'Duplicate employee_id in file')
+    taken_emails = _existing(User.email, emails) | _existing(Employee.email, emails)
+    reject(emails.isin(taken_emails), 'Email already in use')
+    reject(codes.str.lower().isin(_existing(Employee.employee_id, codes.str.lower())), 'employee_id already in use')
+
+    valid = np.flatnonzero((errors == '').to_numpy())
+    usernames = allocate_usernames(zip(frame['first_name'][valid], frame['last_name'][valid]))
+    for index, username in zip(valid, usernames):
+        row = frame.loc[index]
+        plan.rows.append({
+            'username': username,
+            'employee_id': codes[index] or f"EMP{str(uuid.uuid4())[:8].upper()}",
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'email': row['email'],
+            'phone': row['phone'] or None,
+            'job_title': row['job_title'],
+            'department': row['department'],
+            'hire_date': hire_dates[index].date(),
+            'salary': round(float(salaries[index]), 2),
+            'tax_id': row['tax_id'] or None,
+            'bank_name': row['bank_name'] or None,
+            'bank_account': row['bank_account'] or None,
+            'address': row['address'] or None
+        })
+    plan.errors = [(int(index) + 2, errors[index]) for index in np.flatnonzero((errors != '').to_numpy())]
+    return plan
+
+
+def apply_employee_import(plan, chunk_size=IMPORT_CHUNK_SIZE):
+    """Create the plan's accounts and employees; returns their Credentials. Does not commit."""
+    passwords = ['Emp!' + secrets.token_urlsafe(6) for _ in plan.rows]
+    hashes = hash_passwords(passwords, role='employee')
+    now = datetime.utcnow()
+
+    credentials = []
+    for start in range(0, len(plan.rows), chunk_size):
+        rows = plan.rows[start:start + chunk_size]
+        db.session.execute(User.__table__.insert(), [
+            {'username': row['username'], 'email': row['email'], 'password_hash': password_hash,
+             'role': 'employee', 'is_active': True, 'created_at': now}
+            for row, password_hash in zip(rows, hashes[start:start + chunk_size])
+        ])
+        # Read the new ids back by username: ordered RETURNING degrades to a row at a time on SQLite
+        user_ids = dict(db.session.execute(
+            select(User.username, User.id).where(User.username.in_([row['username'] for row in rows]))
+        ).all())
+        db.session.execute(Employee.__table__.insert(), [
+            {**{name: value for name, value in row.items() if name != 'username'},
+             'user_id': user_ids[row['username']], 'is_active': True, 'created_at': now, 'updated_at': now}
+            for row in rows
+        ])
+        credentials.extend(
+            Credential(f"{row['first_name']} {row['last_name']}", row['employee_id'], row['username'], password)
+            for row, password in zip(rows, passwords[start:start + chunk_size])
+        )
+    return credentials
@@ -0,0 +1,180 @@
+"""
+Engine and connection pool settings per deployment profile.
+
+create_app() used to hand SQLAlchemy nothing but the URL, so every gunicorn
+worker got the library's default pool, connections dropped by Postgres or a
+load balancer after an idle spell surfaced as errors on the next request,
+and SQLite writers failed at once with "database is locked". DB_PROFILE
+selects one of:
+
+- 'sqlite' (the default for sqlite:// URLs): WAL journal so readers do not
+  block the writer, a busy timeout so concurrent writers wait for the lock
+  instead of failing, and synchronous=NORMAL, which is durable in WAL mode.
+- 'postgres' (the default for postgresql URLs): a pool of DB_POOL_SIZE
+  connections plus DB_MAX_OVERFLOW, pre-ping on checkout, recycling after
+  DB_POOL_RECYCLE seconds and a server-side DB_STATEMENT_TIMEOUT_MS.
+- 'pgbouncer': for a PgBouncer in transaction pooling mode. Server-side
+  prepared statements are disabled, because consecutive transactions may run
+  on different server connections, and no startup options are sent, so set
+  statement_timeout on the database role instead. PgBouncer does the real
+  pooling; keep DB_POOL_SIZE small.
+
+Each worker process holds up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections,
+so size them with the gunicorn worker count and the server's max_connections
+in mind. Queue pools record how long checkouts waited; pool_stats() reports
+that alongside the pool's checked-out and overflow counts.
+"""
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+PROFILES = ('sqlite', 'postgres', 'pgbouncer')
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+DEFAULT_POOL_TIMEOUT = 30  # seconds to wait for a connection
+DEFAULT_POOL_RECYCLE = 1800  # seconds
+DEFAULT_STATEMENT_TIMEOUT_MS = 30000
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+WAIT_WINDOW = 1000
+
+
+class PoolWaits:
+    """How long checkouts waited for a connection"""
+
+    def __init__(self, window=WAIT_WINDOW):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.count = 0
+        self.timeouts = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            self._recent.append(seconds)
+            self.count += 1
+            self.timeouts += timed_out
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def summary(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            count, timeouts, total, longest = self.count, self.timeouts, self.total, self.max
+        return {
+            'checkouts': count,
+            'timeouts': timeouts,
+            'avg_ms': round(total / count * 1000, 2) if count else 0.0,
+            'p99_ms': round(recent[min(len(recent) - 1, int(len(recent) * 0.99))] * 1000, 2) if recent else 0.0,
+            'max_ms': round(longest * 1000, 2)
+        }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times how long each checkout waits; counters restart when the pool is recreated"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = PoolWaits()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.waits.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.waits.record(time.perf_counter() - started)
+        return connection
+
+
+def normalize_database_url(url):
+    """Use the psycopg 3 driver for postgres:// and postgresql:// URLs"""
+    if url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql+psycopg://', 1)
+    if url.startswith('postgresql://'):
+        return url.replace('postgresql://', 'postgresql+psycopg://', 1)
+    return url
+
+
+def profile_for(url, profile=None):
+    """The named profile, or the one that fits ``url``"""
+    if profile:
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown DB_PROFILE {profile!r}; use one of {', '.join(PROFILES)}")
+        return profile
+    return 'sqlite' if url.startswith('sqlite') else 'postgres'
+
+
+def _is_memory(url):
+    return url in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in url
+
+
+def engine_options(url, profile, config):
+    """SQLALCHEMY_ENGINE_OPTIONS for ``profile``; ``config`` supplies the DB_* settings"""
+    if profile == 'sqlite':
+        if _is_memory(url):
+            return {}
+        # pysqlite's own timeout is the busy timeout, in seconds
+        return {'poolclass': InstrumentedQueuePool,
+                'connect_args': {'timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', DEFAULT_BUSY_TIMEOUT_MS) / 1000}}
+
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', DEFAULT_MAX_OVERFLOW),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', DEFAULT_POOL_RECYCLE),
+        'pool_pre_ping': True
+    }
+    if profile == 'pgbouncer':
+        options['connect_args'] = {'prepare_threshold': None}
+    else:
+        timeout = config.get('DB_STATEMENT_TIMEOUT_MS', DEFAULT_STATEMENT_TIMEOUT_MS)
+        if timeout:
+            options['connect_args'] = {'options': f'-c statement_timeout={int(timeout)}'}
+    return options
+
+
+def _sqlite_pragmas(busy_timeout_ms):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def init_engine_profile(app, db):
+    """Hook per-connection setup into the engines (the primary and any binds); call after db.init_app"""
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if engine.dialect.name == 'sqlite' and not _is_memory(str(engine.url)):
+            event.listen(engine, 'connect',
+                         _sqlite_pragmas(app.config.get('SQLITE_BUSY_TIMEOUT_MS', DEFAULT_BUSY_TIMEOUT_MS)))
+
+
+def pool_stats(engine, profile=None):
+    """Checked-out and overflow connections of ``engine``'s pool, and how long checkouts waited"""
+    pool = engine.pool
+    stats = {'profile': profile, 'pool': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            # Negative while the pool has not yet opened pool_size connections
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout()
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats['wait'] = pool.waits.summary()
+    return stats
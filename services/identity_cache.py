@@ -0,0 +1,239 @@
+"""
+Process-wide cache of logged-in users' identities.
+
+Flask-Login's user_loader ran ``User.query.get`` on every authenticated
+request, and most pages then touched ``current_user.employee`` for a second
+query (base.html greets the user by first name). load_identity() instead
+returns a CachedUser built from an Identity snapshot (user id, username,
+email, role, active flag, employee id, department and display name) kept per
+session user id, so requests that only need who the user is run no identity
+queries at all. Anything else, say ``current_user.last_login`` or
+``current_user.employee.salary``, loads the real row once for the request.
+Assignments such as ``current_user.email = ...`` are written to that row,
+and once it is loaded the user fields are read from it.
+
+Commits that write a User or Employee evict the affected users; bulk
+UPDATE/DELETE statements on either model clear the cache. Other worker
+processes reload an identity after ``IDENTITY_CACHE_TTL`` seconds, so an
+admin or HR snapshot is not trusted on its own: reading ``role`` or
+``is_active`` from one loads the row, and a user demoted, deactivated or
+deleted in another worker loses those rights on the next check.
+"""
+import threading
+import time
+
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import inspect, select
+
+from models import Employee, User, db
+from services.session_hooks import ALL, CommitHook
+
+DEFAULT_TTL = 60  # seconds
+
+TRACKED_MODELS = (User, Employee)
+
+# Roles whose snapshots are confirmed against the row before they grant anything
+PRIVILEGED_ROLES = ('admin', 'hr')
+
+_DIRTY_KEY = 'identity_cache_dirty'
+
+
+class Identity:
+    """What a request needs to know about its user, without the ORM rows"""
+    __slots__ = ('user_id', 'username', 'email', 'role', 'active', 'employee_id', 'department', 'display_name',
+                 'loaded_at')
+
+    def __init__(self, user_id, username, email, role, active, employee_id, department, display_name, loaded_at):
+        self.user_id = user_id
+        self.username = username
+        self.email = email
+        self.role = role
+        self.active = active
+        self.employee_id = employee_id
+        self.department = department
+        self.display_name = display_name
+        self.loaded_at = loaded_at
+
+
+class CachedUser(UserMixin):
+    """current_user backed by an Identity; other attributes come from the User row, loaded on first use"""
+    _OWN_ATTRIBUTES = ('identity', '_user', '_employee')
+    _EMPLOYEE_ATTRIBUTES = ('employee_id', 'department', 'display_name')
+
+    def __init__(self, identity):
+        self.identity = identity
+        self._user = None
+        self._employee = None
+
+    def _field(self, name, snapshot):
+        # A row loaded for this request may have been written to since the snapshot
+        return snapshot if self._user is None else getattr(self._user, name)
+
+    def _checked_field(self, name, snapshot):
+        if self.identity.role not in PRIVILEGED_ROLES:
+            return self._field(name, snapshot)
+        user = self.user
+        return None if user is None else getattr(user, name)
+
+    @property
+    def id(self):
+        return self.identity.user_id
+
+    @property
+    def username(self):
+        return self._field('username', self.identity.username)
+
+    @property
+    def email(self):
+        return self._field('email', self.identity.email)
+
+    @property
+    def role(self):
+        return self._checked_field('role', self.identity.role)
+
+    @property
+    def is_active(self):
+        return bool(self._checked_field('is_active', self.identity.active))
+
+    @property
+    def employee_id(self):
+        return self.identity.employee_id
+
+    @property
+    def department(self):
+        return self.identity.department
+
+    @property
+    def display_name(self):
+        return self.identity.display_name
+
+    @property
+    def user(self):
+        if self._user is None:
+            self._user = db.session.get(User, self.identity.user_id)
+        return self._user
+
+    @property
+    def employee(self):
+        if self.identity.employee_id is None:
+            return None
+        if self._employee is None:
+            self._employee = db.session.get(Employee, self.identity.employee_id)
+        return self._employee
+
+    def __getattr__(self, name):
+        # Only reached for attributes not defined above
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __setattr__(self, name, value):
+        if name in self._OWN_ATTRIBUTES:
+            object.__setattr__(self, name, value)
+        elif name == 'id' or name in self._EMPLOYEE_ATTRIBUTES:
+            raise AttributeError(f'{name} is read-only')
+        else:
+            setattr(self.user, name, value)
+
+    def __repr__(self):
+        return f'<CachedUser {self.identity.username}>'
+
+
+class IdentityCache:
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._identities = {}
+        self._lock = threading.Lock()
+
+    def _load(self, user_id):
+        row = db.session.execute(
+            select(User.id, User.username, User.email, User.role, User.is_active,
+                   Employee.id, Employee.department, Employee.first_name)
+            .outerjoin(Employee, Employee.user_id == User.id)
+            .where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        user_id, username, email, role, active, employee_id, department, first_name = row
+        return Identity(user_id, username, email, role, bool(active), employee_id, department,
+                        first_name or username, time.monotonic())
+
+    def get(self, user_id):
+        identity = self._identities.get(user_id)
+        if identity is not None and time.monotonic() - identity.loaded_at < self.ttl:
+            self.hits += 1
+            return identity
+
+        self.misses += 1
+        identity = self._load(user_id)
+        with self._lock:
+            if identity is None:
+                self._identities.pop(user_id, None)
+            else:
+                self._identities[user_id] = identity
+        return identity
+
+    def evict(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._identities.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._identities.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._identities),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'ttl': self.ttl
+        }
+
+
+def _touched_user_ids(session):
+    user_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            user_ids.add(obj.id)
+        elif isinstance(obj, Employee):
+            # An employee moved to another account changes both users' identities
+            user_ids.add(obj.user_id)
+            user_ids.update(inspect(obj).attrs.user_id.history.deleted or ())
+    return user_ids
+
+
+def _invalidate(user_ids):
+    cache = current_app.extensions.get('identity_cache')
+    if cache is None:
+        return
+    if user_ids is ALL:
+        cache.clear()
+    else:
+        cache.evict(user_ids)
+
+
+# Bulk UPDATE/DELETE statements do not say which users they touched, so they clear the cache
+_commit_hook = CommitHook(_DIRTY_KEY, _invalidate, models=TRACKED_MODELS, collect=_touched_user_ids,
+                          statements=('update', 'delete'))
+
+
+def init_identity_cache(app):
+    """Create the per-process cache and hook invalidation into session commits"""
+    app.extensions['identity_cache'] = IdentityCache(ttl=app.config.get('IDENTITY_CACHE_TTL', DEFAULT_TTL))
+    _commit_hook.listen(db.session)
+
+
+def get_identity_cache():
+    return current_app.extensions['identity_cache']
+
+
+def load_identity(user_id):
+    """user_loader: a CachedUser for ``user_id``, or None if there is no such user"""
+    identity = get_identity_cache().get(user_id)
+    return CachedUser(identity) if identity is not None else None
@@ -0,0 +1,70 @@
+"""
+In-memory registry of active office locations for QR attendance.
+
+Every QR scan validated its location against a fresh
+``OfficeLocation.query.filter_by(active=True).all()``, twice. The registry
+keeps the active locations' brief dicts keyed by id (as strings, the form
+QR payloads carry). manage_locations invalidates it after each commit, and
+other worker processes reload after ``LOCATION_CACHE_TTL`` seconds. Treat the
+returned dicts as read-only.
+"""
+import threading
+import time
+
+from flask import current_app
+
+from models import OfficeLocation
+
+DEFAULT_TTL = 300  # seconds
+
+
+class LocationRegistry:
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self.loads = 0
+        self._locations = None
+        self._loaded_version = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self):
+        return (self._locations is not None and self._loaded_version == self.version
+                and time.monotonic() - self._loaded_at < self.ttl)
+
+    def get(self):
+        if self._is_fresh():
+            return self._locations
+
+        with self._lock:
+            if not self._is_fresh():
+                version = self.version
+                self._locations = {
+                    str(loc.id): loc.to_brief_dict()
+                    for loc in OfficeLocation.query.filter_by(active=True).order_by(OfficeLocation.id).all()
+                }
+                self._loaded_version = version
+                self._loaded_at = time.monotonic()
+                self.loads += 1
+            return self._locations
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+
+
+def init_location_registry(app):
+    app.extensions['location_registry'] = LocationRegistry(ttl=app.config.get('LOCATION_CACHE_TTL', DEFAULT_TTL))
+
+
+def get_locations():
+    """Active locations as {id: brief dict}"""
+    return current_app.extensions['location_registry'].get()
+
+
+def get_location(location_id):
+    return get_locations().get(str(location_id))
+
+
+def invalidate_locations():
+    current_app.extensions['location_registry'].invalidate()
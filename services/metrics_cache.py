@@ -0,0 +1,180 @@
+"""
+TTL cache for dashboard metrics with write-through invalidation.
+
+Sessions that insert, update or delete payroll, attendance, employee or user
+rows are flagged, and the cache is invalidated from the session's
+``after_commit`` event. The in-process backend serves a single worker; the
+Redis backend lets several gunicorn workers share entries and invalidations.
+Values computed while a request reads from the replica are returned but not
+stored, so a lagging replica cannot seed the cache every worker shares.
+"""
+import pickle
+import threading
+import time
+from datetime import date
+
+from flask import current_app
+
+from models import User, Employee, Payroll, Attendance, db
+from services.dashboard_metrics import collect_dashboard_metrics, monthly_payroll_trends, department_stats
+from services.read_replica import reading_from_replica
+from services.session_hooks import CommitHook
+
+DEFAULT_TTL = 60  # seconds
+
+# Writes to these models change at least one dashboard number
+TRACKED_MODELS = (Payroll, Attendance, Employee, User)
+# Updates to users (e.g. last_login) only matter for inserts and deletes
+TRACKED_UPDATES = (Payroll, Attendance, Employee)
+
+_DIRTY_FLAG = 'metrics_cache_dirty'
+
+
+class MemoryBackend:
+    """Per-process dictionary of (expires_at, value) entries"""
+    name = 'memory'
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Shared backend; keys are namespaced by a generation counter so one INCR invalidates every worker"""
+    name = 'redis'
+
+    def __init__(self, url=None, prefix='erp:metrics', client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError('METRICS_CACHE_BACKEND=redis requires the redis package (pip install redis)')
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self._prefix = prefix
+
+    def _key(self, key):
+        generation = int(self._client.get(f'{self._prefix}:generation') or 0)
+        return f'{self._prefix}:{generation}:{key}'
+
+    def get(self, key):
+        value = self._client.get(self._key(key))
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self._key(key), pickle.dumps(value), ex=ttl)
+
+    def invalidate(self):
+        self._client.incr(f'{self._prefix}:generation')
+
+    def size(self):
+        return None
+
+
+class MetricsCache:
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        value = self.backend.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        if not reading_from_replica():
+            self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self):
+        self.backend.invalidate()
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.backend.name,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'entries': self.backend.size()
+        }
+
+
+def _create_backend(app):
+    backend = app.config.get('METRICS_CACHE_BACKEND', 'memory')
+    if backend == 'memory':
+        return MemoryBackend()
+    if backend == 'redis':
+        return RedisBackend(app.config['METRICS_CACHE_URL'])
+    raise ValueError(f'Unknown METRICS_CACHE_BACKEND: {backend}')
+
+
+def _invalidate(flagged):
+    cache = current_app.extensions.get('metrics_cache')
+    if cache is not None:
+        cache.invalidate()
+
+
+_commit_hook = CommitHook(_DIRTY_FLAG, _invalidate, models=TRACKED_MODELS, updated_models=TRACKED_UPDATES)
+
+
+def init_metrics_cache(app):
+    """Configure the cache backend and hook invalidation into session commits"""
+    app.extensions['metrics_cache'] = MetricsCache(
+        _create_backend(app),
+        ttl=app.config.get('METRICS_CACHE_TTL', DEFAULT_TTL)
+    )
+    _commit_hook.listen(db.session)
+
+
+def get_metrics_cache():
+    return current_app.extensions['metrics_cache']
+
+
+def cached_dashboard_metrics(today=None, include_trends=True):
+    today = today or date.today()
+    return get_metrics_cache().get_or_compute(
+        f'dashboard:{today.isoformat()}:{int(include_trends)}',
+        lambda: collect_dashboard_metrics(today=today, include_trends=include_trends)
+    )
+
+
+def cached_monthly_payroll_trends():
+    return get_metrics_cache().get_or_compute('payroll_trends:all', monthly_payroll_trends)
+
+
+def cached_department_stats():
+    return get_metrics_cache().get_or_compute('departments', department_stats)
@@ -0,0 +1,212 @@
+"""
+Keyset (cursor) pagination for large lists.
+
+A page is addressed by the sort key of the row next to it instead of an
+OFFSET, so every page is an index range scan of ``per_page + 1`` rows no
+matter how deep the client has gone. Cursors are opaque URL-safe tokens; the
+total count is left to the caller (exact, estimated or not at all).
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import and_, or_, text
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+NEXT = 'n'
+PREV = 'p'
+
+# Integer keys outside a BIGINT make the driver fail rather than match nothing
+MAX_INTEGER = 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def clamp_page_size(per_page, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    if not per_page or per_page < 1:
+        return default
+    return min(per_page, maximum)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        raise InvalidCursor('Unknown cursor value')
+    return value
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, [_encode_value(v) for v in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (direction, values) for a cursor token; raises InvalidCursor"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in (NEXT, PREV) or not isinstance(values, list):
+            raise InvalidCursor('Malformed cursor')
+        return direction, [_decode_value(v) for v in values]
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError) as e:
+        if isinstance(e, InvalidCursor):
+            raise
+        raise InvalidCursor('Malformed cursor')
+
+
+def _column_value(column, value):
+    """``value`` checked against the Python type of ``column``; raises InvalidCursor.
+
+    Cursors come back from clients, so a tampered one must fail here rather
+    than as a type error in the database.
+    """
+    try:
+        python_type = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        python_type = None
+
+    if value is None or isinstance(value, (list, dict)):
+        raise InvalidCursor('Cursor does not match this list')
+    if python_type is None:
+        return value
+    if python_type is datetime:
+        valid = isinstance(value, datetime)
+    elif python_type is date:
+        valid = isinstance(value, date) and not isinstance(value, datetime)
+    elif python_type is bool:
+        valid = isinstance(value, bool)
+    elif python_type is int:
+        valid = isinstance(value, int) and not isinstance(value, bool) and abs(value) <= MAX_INTEGER
+    elif python_type in (float, Decimal):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise InvalidCursor('Cursor does not match this list')
+        try:
+            value = python_type(value) if python_type is float else Decimal(str(value))
+        except (ValueError, InvalidOperation):
+            raise InvalidCursor('Cursor does not match this list')
+        valid = value == value  # NaN never compares
+    else:
+        valid = isinstance(value, python_type)
+    if not valid:
+        raise InvalidCursor('Cursor does not match this list')
+    return value
+
+
+def _beyond(columns, values, descending):
+    """Rows strictly after ``values`` in sort order.
+
+    (a, b) < (x, y) is spelled out as a < x OR (a = x AND b < y) so every
+    backend can use the composite index.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        compare = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, compare))
+    return or_(*clauses)
+
+
+class KeysetPage:
+    """One page of rows plus the cursors that lead to its neighbours"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def to_dict(self):
+        data = {
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+            'has_next': self.has_next,
+            'has_prev': self.has_prev
+        }
+        if self.total is not None:
+            data['total'] = self.total
+        return data
+
+
+def keyset_paginate(query, columns, key, per_page, cursor=None, descending=True, total=None):
+    """Fetch one page of ``query`` ordered by ``columns``.
+
+    ``columns`` must end in a unique column (normally the primary key) and
+    ``key(item)`` must return the matching values for a row. ``cursor`` is a
+    token from a previous page's ``next_cursor``/``prev_cursor``.
+    """
+    direction, values = decode_cursor(cursor) if cursor else (NEXT, None)
+    if values is not None:
+        if len(values) != len(columns):
+            raise InvalidCursor('Cursor does not match this list')
+        values = [_column_value(column, value) for column, value in zip(columns, values)]
+
+    # Walking backwards reads the index in the opposite order, then flips the rows
+    forward = direction == NEXT
+    order_desc = descending if forward else not descending
+    if values is not None:
+        query = query.filter(_beyond(columns, values, order_desc))
+    ordering = [column.desc() if order_desc else column.asc() for column in columns]
+    rows = query.order_by(None).order_by(*ordering).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if not forward:
+        items.reverse()
+
+    # The page we came from always exists; the far side exists if the extra row was found
+    has_next = has_more if forward else True
+    has_prev = values is not None if forward else has_more
+
+    next_cursor = prev_cursor = None
+    if items:
+        if has_next:
+            next_cursor = encode_cursor(NEXT, key(items[-1]))
+        if has_prev:
+            prev_cursor = encode_cursor(PREV, key(items[0]))
+
+    return KeysetPage(items, per_page, next_cursor, prev_cursor, total)
+
+
+def exact_count(query):
+    return query.order_by(None).enable_eagerloads(False).count()
+
+
+def estimated_count(query):
+    """Planner row estimate on PostgreSQL; exact count on other backends"""
+    query = query.order_by(None).enable_eagerloads(False)
+    bind = query.session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return query.count()
+
+    compiled = query.statement.compile(bind, compile_kwargs={'literal_binds': True})
+    plan = query.session.execute(text(f'EXPLAIN (FORMAT JSON) {compiled}')).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -0,0 +1,189 @@
+"""
+Password hashing and verification off the request thread.
+
+Werkzeug's password hashes are deliberately slow and CPU-bound, and they
+hold the GIL, so a burst of logins at shift start or a bulk import of a few
+thousand accounts would otherwise serialize every request thread of a
+worker behind them. Hashing therefore runs on a process pool of
+PASSWORD_HASH_WORKERS processes, started with 'spawn' because forking a web
+worker that already runs background threads is not safe. Each web worker
+process has its own pool, so size it with the gunicorn worker count in mind.
+
+For logins the pool only pays off when a worker serves several requests at
+once (gunicorn's gthread worker, i.e. --threads N): a sync worker handles one
+request at a time, so the pool would just add a process hop to each check.
+PASSWORD_HASH_WORKERS therefore defaults to 0, which verifies inline; set it
+together with --threads. Batches are another matter: hashing an import's
+accounts in parallel is what keeps it inside the request timeout, so
+hash_passwords() uses the pool whenever PASSWORD_BATCH_WORKERS (default: one
+per CPU) is above 0. The pool is sized for the larger of the two settings.
+
+- verify_password() waits for a pool slot for at most PASSWORD_VERIFY_TIMEOUT
+  seconds, with at most PASSWORD_VERIFY_QUEUE verifications in flight per
+  worker. Past that it raises HashingBusy instead of queueing without bound.
+- The hash method and cost come from PASSWORD_HASH_METHOD, overridable per
+  role through PASSWORD_HASH_ROLE_METHODS. needs_rehash() tells whether a
+  stored hash was made with other parameters, so logins can rehash
+  transparently after a change.
+- Every hash and verification is timed; hashing_stats() reports p50/p99 over
+  the last TIMING_WINDOW operations of each kind.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'  # Werkzeug's default
+DEFAULT_WORKERS = 0  # logins verify inline; see above
+DEFAULT_BATCH_WORKERS = os.cpu_count() or 1
+DEFAULT_VERIFY_QUEUE = 64
+DEFAULT_VERIFY_TIMEOUT = 10
+POOL_MIN_BATCH = 8  # smaller batches are hashed inline
+TIMING_WINDOW = 1000
+
+_pool = None
+_pool_workers = 0
+_verify_slots = None
+_pool_lock = threading.Lock()
+
+
+class HashingBusy(RuntimeError):
+    """No verification slot became free in time"""
+
+
+class _Timings:
+    """Durations of the most recent operations of each kind"""
+
+    def __init__(self, window=TIMING_WINDOW):
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples = {}
+        self._counts = {}
+
+    def record(self, kind, seconds):
+        with self._lock:
+            self._samples.setdefault(kind, deque(maxlen=self._window)).append(seconds)
+            self._counts[kind] = self._counts.get(kind, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            samples = {kind: sorted(values) for kind, values in self._samples.items()}
+            counts = dict(self._counts)
+        return {
+            kind: {
+                'count': counts[kind],
+                'p50_ms': round(values[(len(values) - 1) // 2] * 1000, 1),
+                'p99_ms': round(values[min(len(values) - 1, int(len(values) * 0.99))] * 1000, 1),
+                'max_ms': round(values[-1] * 1000, 1)
+            }
+            for kind, values in samples.items()
+        }
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+_timings = _Timings()
+
+
+def _config(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+
+@lru_cache(maxsize=None)
+def _canonical(method):
+    """The parameter prefix Werkzeug writes for ``method`` ('pbkdf2' -> 'pbkdf2:sha256:600000')"""
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def method_for(role=None):
+    """Hash method and cost for accounts with ``role``"""
+    return _config('PASSWORD_HASH_ROLE_METHODS', {}).get(role) or _config('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+
+
+def needs_rehash(password_hash, role=None):
+    """Whether ``password_hash`` was made with other parameters than ``role`` now gets"""
+    return password_hash.split('$', 1)[0] != _canonical(method_for(role))
+
+
+def get_hash_pool():
+    """Return the process-wide hashing pool, creating it on first use"""
+    global _pool, _pool_workers, _verify_slots
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = max(1, _config('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS),
+                                _config('PASSWORD_BATCH_WORKERS', DEFAULT_BATCH_WORKERS))
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers, mp_context=multiprocessing.get_context('spawn'))
+            _verify_slots = threading.BoundedSemaphore(_config('PASSWORD_VERIFY_QUEUE', DEFAULT_VERIFY_QUEUE))
+        return _pool
+
+
+def _use_pool():
+    return _config('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS) > 0
+
+
+def hash_password(password, role=None):
+    """Hash one password with the parameters for ``role``"""
+    started = time.perf_counter()
+    password_hash = generate_password_hash(password, method_for(role))
+    _timings.record('hash', time.perf_counter() - started)
+    return password_hash
+
+
+def hash_passwords(passwords, role=None):
+    """Hashes of ``passwords`` in order, computed on the pool for large batches"""
+    passwords = list(passwords)
+    if len(passwords) < POOL_MIN_BATCH or _config('PASSWORD_BATCH_WORKERS', DEFAULT_BATCH_WORKERS) <= 0:
+        return [hash_password(password, role) for password in passwords]
+    pool = get_hash_pool()
+    started = time.perf_counter()
+    hashes = list(pool.map(partial(generate_password_hash, method=method_for(role)), passwords,
+                           chunksize=max(1, len(passwords) // (_pool_workers * 4))))
+    _timings.record('hash_batch', time.perf_counter() - started)
+    return hashes
+
+
+def verify_password(password_hash, password):
+    """check_password_hash on the pool; raises HashingBusy when the pool is saturated"""
+    started = time.perf_counter()
+    if not _use_pool():
+        matches = check_password_hash(password_hash, password)
+    else:
+        pool = get_hash_pool()
+        if not _verify_slots.acquire(timeout=_config('PASSWORD_VERIFY_TIMEOUT', DEFAULT_VERIFY_TIMEOUT)):
+            _timings.record('verify_rejected', time.perf_counter() - started)
+            raise HashingBusy('Too many sign-ins in progress')
+        try:
+            matches = pool.submit(check_password_hash, password_hash, password).result()
+        finally:
+            _verify_slots.release()
+    _timings.record('verify', time.perf_counter() - started)
+    return matches
+
+
+def hashing_stats():
+    """Pool size, configured methods and recent hash/verify timings for this worker"""
+    return {
+        'workers': _config('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS),
+        'batch_workers': _config('PASSWORD_BATCH_WORKERS', DEFAULT_BATCH_WORKERS),
+        'pool_started': _pool is not None,
+        'default_method': method_for(None),
+        'role_methods': dict(_config('PASSWORD_HASH_ROLE_METHODS', {})),
+        'timings': _timings.summary()
+    }
+
+
+def shutdown_hash_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
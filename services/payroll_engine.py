@@ -0,0 +1,138 @@
+"""
+Set-based payroll engine used by bulk payroll processing.
+
+Loads every target employee and every existing payroll for the period with
+one query each, computes the whole batch in memory and writes it with a
+single executemany insert.
+"""
+import time
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import insert
+
+from models import Employee, Payroll, db
+
+# Simplified statutory rates applied to the basic salary
+ALLOWANCE_RATE = Decimal('0.10')  # 10% allowance
+TAX_RATE = Decimal('0.15')  # 15% tax on gross
+PENSION_RATE = Decimal('0.05')  # 5% pension on gross
+
+CENTS = Decimal('0.01')
+
+# Skip reasons reported back to the caller
+SKIP_INVALID_ID = 'invalid_id'
+SKIP_NOT_FOUND = 'employee_not_found'
+SKIP_EXISTS = 'payroll_exists'
+
+
+def _money(value):
+    return value.quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def calculate_payroll(basic_salary):
+    """Compute allowances, gross, deductions and net for a basic salary"""
+    basic_salary = Decimal(basic_salary)
+    allowances = _money(basic_salary * ALLOWANCE_RATE)
+    gross_salary = _money(basic_salary + allowances)
+    tax_deduction = _money(gross_salary * TAX_RATE)
+    pension_deduction = _money(gross_salary * PENSION_RATE)
+    total_deductions = tax_deduction + pension_deduction
+    return {
+        'basic_salary': _money(basic_salary),
+        'allowances': allowances,
+        'gross_salary': gross_salary,
+        'tax_deduction': tax_deduction,
+        'pension_deduction': pension_deduction,
+        'total_deductions': total_deductions,
+        'net_salary': gross_salary - total_deductions,
+    }
+
+
+def _normalize_ids(employee_ids, skipped):
+    """Cast ids to int, drop duplicates and record unusable ids"""
+    ids = []
+    seen = set()
+    for raw_id in employee_ids:
+        try:
+            emp_id = int(raw_id)
+        except (TypeError, ValueError):
+            skipped.append({'employee_id': raw_id, 'reason': SKIP_INVALID_ID})
+            continue
+        if emp_id not in seen:
+            seen.add(emp_id)
+            ids.append(emp_id)
+    return ids
+
+
+def build_payroll_rows(employee_ids, pay_period_start, pay_period_end, processed_by):
+    """Return (rows, skipped) for the employees that still need a payroll.
+
+    Issues exactly two SELECTs regardless of the batch size.
+    """
+    skipped = []
+    ids = _normalize_ids(employee_ids, skipped)
+    if not ids:
+        return [], skipped
+
+    salaries = dict(
+        db.session.query(Employee.id, Employee.salary)
+        .filter(Employee.id.in_(ids))
+        .all()
+    )
+    existing = {
+        row.employee_id for row in db.session.query(Payroll.employee_id).filter(
+            Payroll.employee_id.in_(ids),
+            Payroll.pay_period_start == pay_period_start,
+            Payroll.pay_period_end == pay_period_end
+        )
+    }
+
+    processed_at = datetime.utcnow()
+    rows = []
+    for emp_id in ids:
+        if emp_id not in salaries:
+            skipped.append({'employee_id': emp_id, 'reason': SKIP_NOT_FOUND})
+            continue
+        if emp_id in existing:
+            skipped.append({'employee_id': emp_id, 'reason': SKIP_EXISTS})
+            continue
+
+        row = calculate_payroll(salaries[emp_id])
+        row.update(
+            employee_id=emp_id,
+            pay_period_start=pay_period_start,
+            pay_period_end=pay_period_end,
+            processed_by=processed_by,
+            processed_at=processed_at,
+            created_at=processed_at,
+            status='processed'
+        )
+        rows.append(row)
+
+    return rows, skipped
+
+
+def write_payroll_rows(rows):
+    """Insert computed payroll rows with one executemany statement"""
+    if rows:
+        db.session.execute(insert(Payroll), rows)
+
+
+def run_bulk_payroll(employee_ids, pay_period_start, pay_period_end, processed_by):
+    """Process payroll for a batch of employees in one transaction.
+
+    Returns a summary with the processed count, per-employee skip reasons
+    and the elapsed time in milliseconds.
+    """
+    started = time.perf_counter()
+
+    rows, skipped = build_payroll_rows(employee_ids, pay_period_start, pay_period_end, processed_by)
+    write_payroll_rows(rows)
+    db.session.commit()
+
+    return {
+        'processed': len(rows),
+        'skipped': skipped,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
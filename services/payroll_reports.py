@@ -0,0 +1,113 @@
+"""
+Payroll report aggregates for admin.reports.
+
+The database groups the payrolls in range by department, month and status in
+one statement. The department, month, status and grand-total rollups are built
+from those groups, which number at most departments x months x statuses, so
+no payroll rows are loaded. Money stays Decimal throughout.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import List, Tuple
+
+from sqlalchemy import extract, func, select
+
+from models import Employee, Payroll, db
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def _money(value):
+    return Decimal(value or 0).quantize(CENT)
+
+
+@dataclass(frozen=True)
+class ReportTotals:
+    payrolls: int = 0
+    gross: Decimal = ZERO
+    deductions: Decimal = ZERO
+    net: Decimal = ZERO
+
+    def __add__(self, other):
+        return ReportTotals(
+            self.payrolls + other.payrolls,
+            self.gross + other.gross,
+            self.deductions + other.deductions,
+            self.net + other.net
+        )
+
+
+@dataclass(frozen=True)
+class ReportGroup:
+    department: str
+    year: int
+    month: int
+    status: str
+    totals: ReportTotals
+
+    @property
+    def label(self):
+        return f"{self.year}-{self.month:02d}"
+
+
+@dataclass(frozen=True)
+class PayrollReport:
+    totals: ReportTotals = field(default_factory=ReportTotals)
+    by_department: List[Tuple[str, ReportTotals]] = field(default_factory=list)
+    by_month: List[Tuple[str, ReportTotals]] = field(default_factory=list)
+    by_status: List[Tuple[str, ReportTotals]] = field(default_factory=list)
+    groups: List[ReportGroup] = field(default_factory=list)
+
+
+def report_filters(start_date, end_date, department=''):
+    """Filter conditions shared by the report aggregates and its detail table"""
+    conditions = [
+        Payroll.pay_period_start >= start_date,
+        Payroll.pay_period_start <= end_date
+    ]
+    if department:
+        conditions.append(Employee.department == department)
+    return conditions
+
+
+def _rollup(groups, key):
+    rolled = OrderedDict()
+    for group in groups:
+        name = key(group)
+        rolled[name] = rolled.get(name, ReportTotals()) + group.totals
+    return list(rolled.items())
+
+
+def payroll_report(start_date, end_date, department=''):
+    year = extract('year', Payroll.pay_period_start)
+    month = extract('month', Payroll.pay_period_start)
+    statement = select(
+        Employee.department,
+        year.label('year'),
+        month.label('month'),
+        Payroll.status,
+        func.count(Payroll.id).label('payrolls'),
+        func.sum(Payroll.gross_salary).label('gross'),
+        func.sum(Payroll.total_deductions).label('deductions'),
+        func.sum(Payroll.net_salary).label('net')
+    ).join_from(Payroll, Employee, Payroll.employee_id == Employee.id).where(
+        *report_filters(start_date, end_date, department)
+    ).group_by(Employee.department, year, month, Payroll.status).order_by(Employee.department, year, month, Payroll.status)
+
+    groups = [
+        ReportGroup(
+            row.department or 'Unassigned', int(row.year), int(row.month), row.status or 'unknown',
+            ReportTotals(row.payrolls, _money(row.gross), _money(row.deductions), _money(row.net))
+        )
+        for row in db.session.execute(statement)
+    ]
+
+    return PayrollReport(
+        totals=sum((group.totals for group in groups), ReportTotals()),
+        by_department=_rollup(groups, lambda group: group.department),
+        by_month=sorted(_rollup(groups, lambda group: group.label)),
+        by_status=_rollup(sorted(groups, key=lambda group: group.status), lambda group: group.status),
+        groups=groups
+    )
@@ -0,0 +1,192 @@
+"""
+Background payroll runs.
+
+A PayrollRun is processed in fixed-size chunks on a local thread pool. Each
+chunk's payroll rows and the run's progress counters are committed in the
+same transaction, so an interrupted run resumes from the last committed
+chunk instead of starting over.
+
+A worker claims a run before processing it with a conditional UPDATE that
+sets ``claimed_at``, and renews that lease in every chunk's transaction.
+Another process can only take a run over once the lease is older than
+PAYROLL_RUN_LEASE seconds, and a worker whose lease was taken over stops
+at its next chunk without committing it.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, update
+
+from models import PayrollRun, db
+from services.payroll_engine import build_payroll_rows, write_payroll_rows
+
+DEFAULT_WORKERS = 2
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_LEASE = 600
+
+_executor = None
+_executor_lock = threading.Lock()
+_active_runs = set()
+
+
+def get_executor():
+    """Return the process-wide worker pool, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = current_app.config.get('PAYROLL_RUN_WORKERS', DEFAULT_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='payroll-run')
+        return _executor
+
+
+def create_payroll_run(employee_ids, pay_period_start, pay_period_end, created_by, chunk_size=None):
+    """Persist a queued run for the given employees"""
+    chunk_size = chunk_size or current_app.config.get('PAYROLL_RUN_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    run = PayrollRun(
+        pay_period_start=pay_period_start,
+        pay_period_end=pay_period_end,
+        employee_ids=list(employee_ids),
+        chunk_size=chunk_size,
+        total_count=len(employee_ids),
+        status='queued',
+        skipped=[],
+        errors=[],
+        created_by=created_by
+    )
+    db.session.add(run)
+    db.session.commit()
+    return run
+
+
+def submit_payroll_run(run_id):
+    """Queue a run on the worker pool; returns None if it is already running here"""
+    with _executor_lock:
+        if run_id in _active_runs:
+            return None
+        _active_runs.add(run_id)
+    app = current_app._get_current_object()
+    return get_executor().submit(_run_in_app_context, app, run_id)
+
+
+def start_payroll_run(employee_ids, pay_period_start, pay_period_end, created_by, chunk_size=None):
+    """Create a run and hand it to the worker pool"""
+    run = create_payroll_run(employee_ids, pay_period_start, pay_period_end, created_by, chunk_size)
+    submit_payroll_run(run.id)
+    return run
+
+
+def resume_interrupted_runs():
+    """Finish, in the current process, every run left queued or whose worker's lease went stale"""
+    run_ids = db.session.execute(
+        db.select(PayrollRun.id).where(_claimable(PayrollRun.status == 'queued', _stale_before()))
+    ).scalars().all()
+    runs = [execute_payroll_run(run_id) for run_id in run_ids]
+    return [run for run in runs if run is not None]
+
+
+def _stale_before():
+    lease = current_app.config.get('PAYROLL_RUN_LEASE', DEFAULT_LEASE)
+    return datetime.utcnow() - timedelta(seconds=lease)
+
+
+def _claimable(available, stale_before):
+    # Runs left 'running' before leases existed have no claimed_at and count as stale
+    return or_(available, (PayrollRun.status == 'running') & (
+        PayrollRun.claimed_at.is_(None) | (PayrollRun.claimed_at < stale_before)
+    ))
+
+
+def claim_payroll_run(run_id):
+    """Take the lease on a run that is not completed or running elsewhere; returns the lease time or None"""
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(PayrollRun)
+        .where(PayrollRun.id == run_id, _claimable(PayrollRun.status.in_(['queued', 'failed']), _stale_before()))
+        .values(status='running', claimed_at=now, started_at=db.func.coalesce(PayrollRun.started_at, now),
+                finished_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return now if result.rowcount == 1 else None
+
+
+def _run_in_app_context(app, run_id):
+    with app.app_context():
+        try:
+            execute_payroll_run(run_id)
+        finally:
+            db.session.remove()
+            with _executor_lock:
+                _active_runs.discard(run_id)
+
+
+class LeaseLost(Exception):
+    """Another worker took the run over after this one's lease went stale"""
+
+
+def _renew_lease(run_id, claimed_at):
+    renewed = datetime.utcnow()
+    result = db.session.execute(
+        update(PayrollRun)
+        .where(PayrollRun.id == run_id, PayrollRun.status == 'running', PayrollRun.claimed_at == claimed_at)
+        .values(claimed_at=renewed)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise LeaseLost(run_id)
+    return renewed
+
+
+def _process_chunk(run, chunk_index, claimed_at):
+    start = chunk_index * run.chunk_size
+    chunk_ids = run.employee_ids[start:start + run.chunk_size]
+
+    rows, skipped = build_payroll_rows(chunk_ids, run.pay_period_start, run.pay_period_end, run.created_by)
+    write_payroll_rows(rows)
+    renewed = _renew_lease(run.id, claimed_at)
+
+    run.processed_count = (run.processed_count or 0) + len(rows)
+    run.skipped_count = (run.skipped_count or 0) + len(skipped)
+    if skipped:
+        run.skipped = (run.skipped or []) + skipped
+    run.chunks_completed = chunk_index + 1
+    db.session.commit()
+    return renewed
+
+
+def execute_payroll_run(run_id):
+    """Process the remaining chunks of a run in the current app context
+
+    Returns None when the run does not exist or another worker holds it.
+    """
+    claimed_at = claim_payroll_run(run_id)
+    if claimed_at is None:
+        return None
+    run = db.session.get(PayrollRun, run_id)
+
+    try:
+        for chunk_index in range(run.chunks_completed or 0, run.total_chunks):
+            claimed_at = _process_chunk(run, chunk_index, claimed_at)
+    except LeaseLost:
+        db.session.rollback()
+        current_app.logger.warning('Payroll run %s was taken over by another worker', run_id)
+        return None
+    except Exception as e:
+        db.session.rollback()
+        run = db.session.get(PayrollRun, run_id)
+        run.status = 'failed'
+        run.errors = (run.errors or []) + [{
+            'chunk': run.chunks_completed or 0,
+            'message': str(e)
+        }]
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+        current_app.logger.exception('Payroll run %s failed', run_id)
+        return run
+
+    run.status = 'completed'
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    return run
@@ -0,0 +1,191 @@
+"""
+Process-wide cache of office hours and attendance policies.
+
+The clock-in/out path reads the default office hours on every scan. Active
+OfficeHours and AttendancePolicy rows are loaded once per process as frozen
+snapshots, and each request pins the snapshot it first sees in ``g``. Commits
+that write either model bump the version and the next lookup reloads. Other
+worker processes pick up changes when their copy expires after
+``POLICY_CACHE_TTL`` seconds.
+"""
+import threading
+import time as _time
+from dataclasses import dataclass, field
+from functools import cached_property
+from datetime import datetime, time, timedelta
+from typing import Optional, Tuple
+
+from flask import current_app, g, has_request_context
+
+from models import OfficeHours, AttendancePolicy, db
+from services.session_hooks import CommitHook
+
+DEFAULT_TTL = 300  # seconds
+
+TRACKED_MODELS = (OfficeHours, AttendancePolicy)
+
+_DIRTY_FLAG = 'policy_cache_dirty'
+
+
+@dataclass(frozen=True)
+class OfficeHoursSnapshot:
+    id: int
+    name: str
+    description: Optional[str]
+    official_clock_in: time
+    official_clock_out: time
+    clock_in_grace_period: int
+    clock_out_grace_period: int
+    break_duration: int
+    break_start_time: Optional[time]
+    working_days: Tuple[int, ...]
+    allow_early_clock_in: bool
+    allow_late_clock_out: bool
+    is_default: bool
+
+    @classmethod
+    def from_model(cls, hours):
+        return cls(
+            id=hours.id,
+            name=hours.name,
+            description=hours.description,
+            official_clock_in=hours.official_clock_in,
+            official_clock_out=hours.official_clock_out,
+            clock_in_grace_period=hours.clock_in_grace_period or 0,
+            clock_out_grace_period=hours.clock_out_grace_period or 0,
+            break_duration=hours.break_duration or 0,
+            break_start_time=hours.break_start_time,
+            working_days=tuple(hours.get_working_days_list()),
+            allow_early_clock_in=bool(hours.allow_early_clock_in),
+            allow_late_clock_out=bool(hours.allow_late_clock_out),
+            is_default=bool(hours.is_default)
+        )
+
+    def get_working_days_list(self):
+        return list(self.working_days)
+
+    def is_working_day(self, weekday):
+        """Check if given weekday (1=Monday, 7=Sunday) is a working day"""
+        return weekday in self.working_days
+
+    def late_threshold(self, day):
+        """Latest clock-in on ``day`` that is still on time"""
+        return (datetime.combine(day, self.official_clock_in) + timedelta(minutes=self.clock_in_grace_period)).time()
+
+    def early_threshold(self, day):
+        """Earliest clock-out on ``day`` that is not an early departure"""
+        return (datetime.combine(day, self.official_clock_out) - timedelta(minutes=self.clock_out_grace_period)).time()
+
+    @cached_property
+    def minute_thresholds(self):
+        """(official in, official out, late after, early before) in minutes since midnight"""
+        official_in = self.official_clock_in.hour * 60 + self.official_clock_in.minute
+        official_out = self.official_clock_out.hour * 60 + self.official_clock_out.minute
+        return official_in, official_out, official_in + self.clock_in_grace_period, official_out - self.clock_out_grace_period
+
+
+@dataclass(frozen=True)
+class AttendancePolicySnapshot:
+    id: int
+    name: str
+    description: Optional[str]
+    late_penalty_type: str
+    late_penalty_amount: float
+    late_penalty_threshold: int
+    early_departure_penalty_type: str
+    early_departure_penalty_amount: float
+    early_departure_threshold: int
+    absence_penalty_type: str
+    absence_penalty_amount: float
+    overtime_rate: float
+    overtime_threshold: int
+    is_default: bool
+
+    @classmethod
+    def from_model(cls, policy):
+        return cls(**{name: getattr(policy, name) for name in cls.__dataclass_fields__})
+
+
+@dataclass(frozen=True)
+class PolicyConfig:
+    version: int
+    office_hours: Tuple[OfficeHoursSnapshot, ...] = ()
+    policies: Tuple[AttendancePolicySnapshot, ...] = ()
+    loaded_at: float = field(default=0.0, compare=False)
+
+    @property
+    def default_hours(self):
+        return next((hours for hours in self.office_hours if hours.is_default), None)
+
+    @property
+    def default_policy(self):
+        return next((policy for policy in self.policies if policy.is_default), None)
+
+
+class PolicyCache:
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self.loads = 0
+        self._config = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        office_hours = OfficeHours.query.filter_by(is_active=True).order_by(OfficeHours.id).all()
+        policies = AttendancePolicy.query.filter_by(is_active=True).order_by(AttendancePolicy.id).all()
+        return PolicyConfig(
+            version=self.version,
+            office_hours=tuple(OfficeHoursSnapshot.from_model(hours) for hours in office_hours),
+            policies=tuple(AttendancePolicySnapshot.from_model(policy) for policy in policies),
+            loaded_at=_time.monotonic()
+        )
+
+    def get(self):
+        config = self._config
+        if config is not None and config.version == self.version and _time.monotonic() - config.loaded_at < self.ttl:
+            return config
+
+        with self._lock:
+            config = self._config
+            if config is None or config.version != self.version or _time.monotonic() - config.loaded_at >= self.ttl:
+                config = self._config = self._load()
+                self.loads += 1
+        return config
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+
+
+def _invalidate(flagged):
+    cache = current_app.extensions.get('policy_cache')
+    if cache is not None:
+        cache.invalidate()
+
+
+# OfficeHours.query.update({'is_default': False}) is caught as a bulk statement
+_commit_hook = CommitHook(_DIRTY_FLAG, _invalidate, models=TRACKED_MODELS)
+
+
+def init_policy_cache(app):
+    """Create the per-process cache and hook invalidation into session commits"""
+    app.extensions['policy_cache'] = PolicyCache(ttl=app.config.get('POLICY_CACHE_TTL', DEFAULT_TTL))
+    _commit_hook.listen(db.session)
+
+
+def get_policy_config():
+    """Current snapshot; a request keeps the one it saw first"""
+    if has_request_context() and 'policy_config' in g:
+        return g.policy_config
+    config = current_app.extensions['policy_cache'].get()
+    if has_request_context():
+        g.policy_config = config
+    return config
+
+
+def default_office_hours():
+    return get_policy_config().default_hours
+
+
+def default_attendance_policy():
+    return get_policy_config().default_policy
@@ -0,0 +1,167 @@
+"""
+Rotating QR codes for kiosk displays.
+
+Time is split into slots of ``QR_ROTATION_SECONDS``. The token for a location
+and slot is deterministic (issued at the slot start, nonce = slot number), so
+every worker signs the same token and the token signature doubles as the
+image ETag. Each token stays valid for one extra slot so a code scanned just
+before it rotates still clocks in.
+
+Rendered PNG/SVG bytes are kept per (location, slot, format). When a slot is
+served, the next ``QR_PRERENDER_SLOTS`` slots are queued on a small
+background pool, so a rotation normally finds its image ready. Rendering
+costs one encode per location, slot and format however many kiosks poll.
+
+Kiosks are not held open waiting for a rotation: the rotation endpoint
+answers at once with the current slot and the seconds left in it, and the
+kiosk schedules its next fetch for then. A request never occupies a worker
+for longer than it takes to answer.
+"""
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import qrcode
+import qrcode.image.svg
+
+from flask import current_app
+
+from services.qr_tokens import issue_token
+
+DEFAULT_ROTATION = 30  # seconds
+DEFAULT_PRERENDER = 2  # slots rendered ahead
+DEFAULT_WORKERS = 1
+
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+
+@dataclass(frozen=True)
+class RenderedCode:
+    location_id: int
+    slot: int
+    format: str
+    body: bytes
+    etag: str
+
+    @property
+    def mimetype(self):
+        return FORMATS[self.format]
+
+
+def slot_token(location_id, slot, rotation):
+    """Token shown during ``slot``; valid until the end of the next slot"""
+    return issue_token(location_id, issued_at=slot * rotation, ttl=2 * rotation, nonce=slot)
+
+
+def code_etag(token, fmt):
+    return f'{token.token.rpartition(".")[2]}-{fmt}'
+
+
+def render_code(data, fmt):
+    """Encode ``data`` as a PNG or SVG QR image"""
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+        image_factory=qrcode.image.svg.SvgPathImage if fmt == 'svg' else None
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    buffer = io.BytesIO()
+    qr.make_image().save(buffer)
+    return buffer.getvalue()
+
+
+class QRCodeRotator:
+    def __init__(self, rotation=DEFAULT_ROTATION, prerender=DEFAULT_PRERENDER, workers=DEFAULT_WORKERS,
+                 clock=time.time):
+        self.rotation = rotation
+        self.prerender = prerender
+        self.workers = workers
+        self.clock = clock
+        self.renders = 0
+        self._codes = {}
+        self._pending = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def current_slot(self, now=None):
+        return int(now if now is not None else self.clock()) // self.rotation
+
+    def slot_ends_at(self, slot):
+        return (slot + 1) * self.rotation
+
+    def seconds_left(self, slot, now=None):
+        """Seconds until ``slot`` rotates out; 0 once it has"""
+        return max(self.slot_ends_at(slot) - (now if now is not None else self.clock()), 0)
+
+    def is_servable(self, slot, now=None):
+        """The current slot, or the previous one while its token is still valid"""
+        return 0 <= self.current_slot(now) - slot <= 1
+
+    def _render(self, key, token):
+        location_id, slot, fmt = key
+        code = RenderedCode(location_id, slot, fmt, render_code(token.token, fmt), code_etag(token, fmt))
+        with self._lock:
+            self._codes[key] = code
+            self._pending.pop(key, None)
+            self.renders += 1
+        return code
+
+    def _submit(self, key, token):
+        """Queue a background render unless the code is cached or already queued"""
+        with self._lock:
+            if key in self._codes or key in self._pending:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='qr-render')
+            self._pending[key] = self._executor.submit(self._render, key, token)
+
+    def _evict(self, current_slot):
+        with self._lock:
+            for key in [key for key in self._codes if key[1] < current_slot - 1]:
+                del self._codes[key]
+
+    def etag(self, location_id, slot, fmt='png'):
+        """ETag of a slot's image, known without rendering it"""
+        return code_etag(slot_token(location_id, slot, self.rotation), fmt)
+
+    def get(self, location_id, slot, fmt='png'):
+        """Rendered image for a slot, rendering it now if the background pool has not"""
+        location_id = int(location_id)
+        key = (location_id, slot, fmt)
+        with self._lock:
+            code = self._codes.get(key)
+            future = self._pending.get(key)
+        if code is None:
+            code = future.result() if future is not None else self._render(key, slot_token(location_id, slot, self.rotation))
+
+        current = self.current_slot()
+        self._evict(current)
+        for ahead in range(1, self.prerender + 1):
+            upcoming = max(slot, current) + ahead
+            self._submit((location_id, upcoming, fmt), slot_token(location_id, upcoming, self.rotation))
+        return code
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def init_qr_rotation(app):
+    app.extensions['qr_rotator'] = QRCodeRotator(
+        rotation=app.config.get('QR_ROTATION_SECONDS', DEFAULT_ROTATION),
+        prerender=app.config.get('QR_PRERENDER_SLOTS', DEFAULT_PRERENDER),
+        workers=app.config.get('QR_RENDER_WORKERS', DEFAULT_WORKERS)
+    )
+
+
+def get_rotator():
+    return current_app.extensions['qr_rotator']
@@ -0,0 +1,105 @@
+"""
+Signed QR attendance tokens.
+
+A token is a short string such as ``QA1.3.SJ2Y8G.SJ3K0W.1F.CM4V...``:
+location id, issue time, expiry and a rotation nonce in base 36, followed by a
+truncated HMAC-SHA256 over those fields in base 32. The whole string uses
+only upper-case letters, digits and dots, so qrcode encodes it in
+alphanumeric mode and the matrix stays at a low version that scans quickly.
+
+verify_token() recomputes the signature with hmac.compare_digest and never
+touches the database, so any worker can verify a scan on its own.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import current_app
+
+PREFIX = 'QA1'
+SIGNATURE_BYTES = 15  # 120 bits, 24 base 32 characters
+DEFAULT_TTL = 24 * 60 * 60  # seconds
+CLOCK_SKEW = 60  # seconds a token may appear to be issued in the future
+_DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+class InvalidQRToken(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class QRToken:
+    location_id: int
+    issued_at: int
+    expires_at: int
+    nonce: int
+    token: str
+
+    @property
+    def issued_datetime(self):
+        return datetime.fromtimestamp(self.issued_at)
+
+    @property
+    def expires_datetime(self):
+        return datetime.fromtimestamp(self.expires_at)
+
+
+def _base36(number):
+    if number < 0:
+        raise ValueError('Token fields must not be negative')
+    digits = ''
+    while True:
+        number, remainder = divmod(number, 36)
+        digits = _DIGITS[remainder] + digits
+        if not number:
+            return digits
+
+
+def _signing_key():
+    key = current_app.config.get('QR_SIGNING_KEY') or current_app.config['SECRET_KEY']
+    return key.encode() if isinstance(key, str) else key
+
+
+def _sign(body, key):
+    digest = hmac.new(key, body.encode(), hashlib.sha256).digest()[:SIGNATURE_BYTES]
+    return base64.b32encode(digest).decode().rstrip('=')
+
+
+def issue_token(location_id, issued_at=None, ttl=None, nonce=None):
+    """Signed token for a location, valid for ``ttl`` seconds from ``issued_at``"""
+    issued_at = int(issued_at if issued_at is not None else time.time())
+    ttl = int(ttl if ttl is not None else DEFAULT_TTL)
+    nonce = secrets.randbelow(36 ** 4) if nonce is None else nonce
+    body = '.'.join([PREFIX, _base36(int(location_id)), _base36(issued_at), _base36(issued_at + ttl), _base36(nonce)])
+    token = f'{body}.{_sign(body, _signing_key())}'
+    return QRToken(int(location_id), issued_at, issued_at + ttl, nonce, token)
+
+
+def verify_token(token, now=None):
+    """Check signature and lifetime; raises InvalidQRToken"""
+    if not isinstance(token, str):
+        raise InvalidQRToken('Malformed QR code')
+    token = token.strip().upper()
+    body, _, signature = token.rpartition('.')
+    parts = body.split('.')
+    if len(parts) != 5 or parts[0] != PREFIX:
+        raise InvalidQRToken('Malformed QR code')
+
+    if not hmac.compare_digest(_sign(body, _signing_key()), signature):
+        raise InvalidQRToken('Invalid QR code signature')
+
+    try:
+        location_id, issued_at, expires_at, nonce = (int(part, 36) for part in parts[1:])
+    except ValueError:
+        raise InvalidQRToken('Malformed QR code')
+
+    now = int(now if now is not None else time.time())
+    if now >= expires_at:
+        raise InvalidQRToken('QR code has expired')
+    if issued_at > now + CLOCK_SKEW:
+        raise InvalidQRToken('QR code is not valid yet')
+    return QRToken(location_id, issued_at, expires_at, nonce, token)
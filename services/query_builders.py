@@ -0,0 +1,38 @@
+"""
+Query builders with explicit loader strategies for list and report pages.
+
+Every page that renders ``payroll.employee`` or ``attendance.employee`` per
+row starts from one of these, so the employee is loaded with the rows
+instead of lazily, one query per row.
+"""
+from sqlalchemy.orm import contains_eager, joinedload
+
+from models import Employee, Payroll, Attendance
+
+
+def payrolls_with_employee():
+    """Payroll query with the employee loaded through a LEFT OUTER JOIN"""
+    return Payroll.query.options(joinedload(Payroll.employee))
+
+
+def payrolls_joined_employee():
+    """Payroll query inner-joined to Employee; the join also populates payroll.employee.
+
+    Use this when filtering or sorting on employee columns.
+    """
+    return Payroll.query.join(Payroll.employee).options(contains_eager(Payroll.employee))
+
+
+def attendances_with_employee():
+    """Attendance query with the employee loaded through a LEFT OUTER JOIN"""
+    return Attendance.query.options(joinedload(Attendance.employee))
+
+
+def attendances_joined_employee():
+    """Attendance query inner-joined to Employee; the join also populates attendance.employee"""
+    return Attendance.query.join(Attendance.employee).options(contains_eager(Attendance.employee))
+
+
+def employee_payrolls(user_id):
+    """Payrolls belonging to the employee linked to a user account"""
+    return payrolls_joined_employee().filter(Employee.user_id == user_id)
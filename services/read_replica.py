@@ -0,0 +1,171 @@
+"""
+Routing of read-only endpoints to a read replica.
+
+Reports, chart APIs and exports are the heaviest queries the app runs, and
+on a single database they compete with the clock-in path for the primary.
+When REPLICA_DATABASE_URL is set it becomes the 'replica' bind, and views
+wrapped in @replica_reads send their SELECTs there through RoutingSession.
+Flushes and DML still go to the primary, as does everything outside such
+views, including the user loader that runs before the view.
+
+ReplicaRouter decides per request whether the replica may be used:
+
+- Lag guard: replication lag is measured at most every
+  REPLICA_CHECK_INTERVAL seconds; past REPLICA_MAX_LAG seconds the reports
+  read from the primary instead. On Postgres the lag is the age of the last
+  replayed transaction, or 0 while the replica has replayed all it received.
+  Other databases report no lag.
+- Fallback: if the replica cannot be reached, or a replica-routed view fails
+  with an OperationalError, the view is run again on the primary and the
+  replica is left alone for REPLICA_RETRY_AFTER seconds. A streamed export
+  that fails after its first chunk has been sent cannot be rerun.
+
+The routing flag stays set on ``g`` after the view returns, because a
+streamed export keeps reading while the response is sent; it is cleared at
+request teardown, which stream_with_context defers until the stream ends.
+Caches filled by such a view would hold replica data, so they check
+reading_from_replica() before storing anything.
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import exc, text
+
+REPLICA_BIND = 'replica'
+DEFAULT_MAX_LAG = 30  # seconds
+DEFAULT_CHECK_INTERVAL = 5
+DEFAULT_RETRY_AFTER = 30
+
+_ROUTE_FLAG = 'read_from_replica'
+
+PG_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that reads from the replica inside @replica_reads views"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and reading_from_replica()
+                and not self._flushing and not getattr(clause, 'is_dml', False)):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    def __init__(self, max_lag=DEFAULT_MAX_LAG, check_interval=DEFAULT_CHECK_INTERVAL,
+                 retry_after=DEFAULT_RETRY_AFTER):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.retry_after = retry_after
+        self.routed = 0
+        self.lagging = 0
+        self.fallbacks = 0
+        self._lag = None
+        self._checked_at = None
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    def measure_lag(self, engine):
+        """Seconds the replica is behind the primary"""
+        if engine.dialect.name != 'postgresql':
+            return 0.0
+        with engine.connect() as connection:
+            return float(connection.execute(PG_LAG_QUERY).scalar() or 0)
+
+    def lag(self, engine):
+        """Cached replication lag; None while the replica is considered down"""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._down_until:
+                return None
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._lag
+        try:
+            lag = self.measure_lag(engine)
+        except exc.DBAPIError:
+            self.mark_down()
+            return None
+        with self._lock:
+            self._lag, self._checked_at = lag, now
+        return lag
+
+    def usable(self, engine):
+        """Whether reads may go to the replica right now"""
+        lag = self.lag(engine)
+        if lag is None:
+            self.fallbacks += 1
+            return False
+        if lag > self.max_lag:
+            self.lagging += 1
+            return False
+        self.routed += 1
+        return True
+
+    def mark_down(self):
+        with self._lock:
+            self._down_until = time.monotonic() + self.retry_after
+            self._checked_at = None
+
+    def stats(self):
+        return {
+            'routed': self.routed,
+            'lagging': self.lagging,
+            'fallbacks': self.fallbacks,
+            'lag': self._lag,
+            'max_lag': self.max_lag,
+            'down': time.monotonic() < self._down_until
+        }
+
+
+def init_read_replica(app):
+    """Set up routing when a replica bind is configured"""
+    if REPLICA_BIND not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+    app.extensions['replica_router'] = ReplicaRouter(
+        max_lag=app.config.get('REPLICA_MAX_LAG', DEFAULT_MAX_LAG),
+        check_interval=app.config.get('REPLICA_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL),
+        retry_after=app.config.get('REPLICA_RETRY_AFTER', DEFAULT_RETRY_AFTER)
+    )
+    app.teardown_request(_clear_route_flag)
+
+
+def _clear_route_flag(error=None):
+    g.pop(_ROUTE_FLAG, None)
+
+
+def reading_from_replica():
+    """Whether this request's reads are being sent to the replica"""
+    return has_request_context() and bool(g.get(_ROUTE_FLAG))
+
+
+def get_replica_router():
+    """The app's ReplicaRouter, or None without a replica"""
+    return current_app.extensions.get('replica_router')
+
+
+def replica_reads(view):
+    """Run a read-only view against the replica when it is healthy; place below @login_required"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        router = get_replica_router()
+        db = current_app.extensions['sqlalchemy']
+        if router is None or not router.usable(db.engines[REPLICA_BIND]):
+            return view(*args, **kwargs)
+        setattr(g, _ROUTE_FLAG, True)
+        try:
+            return view(*args, **kwargs)
+        except exc.OperationalError:
+            router.mark_down()
+            router.fallbacks += 1
+            db.session.rollback()
+            g.pop(_ROUTE_FLAG, None)
+            return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,42 @@
+"""
+Bringing deployed databases under migration control.
+
+Databases set up before the migrations existed were created with
+``db.create_all()`` and have no ``alembic_version`` table, so ``flask db
+upgrade`` would try to create the baseline tables again. ``flask
+stamp-baseline`` marks such a database as being at the baseline revision;
+it does nothing for empty databases or ones that already have a revision.
+Deployments run it before ``flask db upgrade`` on every start.
+"""
+import click
+import flask_migrate
+from flask.cli import with_appcontext
+from sqlalchemy import inspect
+
+from app import db
+
+BASELINE_REVISION = 'bb13c28cea63'
+
+
+def stamp_baseline(directory=None):
+    """Stamp a create_all() database at the baseline revision; True if it needed it"""
+    inspector = inspect(db.engine)
+    if inspector.has_table('alembic_version') or not inspector.has_table('users'):
+        return False
+    flask_migrate.stamp(directory=directory, revision=BASELINE_REVISION)
+    return True
+
+
+@click.command('stamp-baseline')
+@with_appcontext
+def stamp_baseline_command():
+    """Put a database created with db.create_all() under migration control."""
+    if stamp_baseline():
+        click.echo(f'Stamped database at baseline revision {BASELINE_REVISION}')
+    else:
+        click.echo('Database already under migration control')
+
+
+def init_schema(app):
+    """Register the schema commands"""
+    app.cli.add_command(stamp_baseline_command)
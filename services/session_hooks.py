@@ -0,0 +1,88 @@
+"""
+Run a callback after commits that wrote to some models.
+
+Several process-wide caches are invalidated the same way: a session that
+inserts, updates or deletes rows of the models they are built from is flagged
+in ``session.info`` (from ``after_flush``, and from ``do_orm_execute`` for
+bulk statements that bypass the unit of work), the callback runs from
+``after_commit``, and a rollback clears the flag. CommitHook wires that up
+once per process. Core statements on ``Model.__table__`` (the executemany
+upserts and imports) carry no mapper, so bulk statements are matched by
+their target table as well.
+
+The flag is either True, meaning "anything may have changed", or a set of
+keys gathered by a ``collect`` function (the ids of the users touched, say).
+"""
+from flask import has_app_context
+from sqlalchemy import event
+
+ALL = True
+BULK_STATEMENTS = ('insert', 'update', 'delete')
+
+
+class CommitHook:
+    """Flags sessions that write ``models`` and calls ``on_commit(flag)`` once they commit
+
+    ``updated_models`` narrows which models count when only updated (defaults
+    to ``models``); ``collect(session)`` replaces the model check with a set of
+    keys, or None when the flush touched nothing of interest. Bulk statements
+    of the kinds in ``statements`` flag the session with ALL. With no models
+    the flag is only ever set by hand through ``mark()``.
+    """
+
+    def __init__(self, key, on_commit, models=(), updated_models=None, collect=None, statements=BULK_STATEMENTS):
+        self.key = key
+        self.on_commit = on_commit
+        self.models = tuple(models)
+        self.updated_models = self.models if updated_models is None else tuple(updated_models)
+        self.collect = collect
+        self.statements = tuple(statements)
+
+    def mark(self, session, keys=ALL):
+        """Flag ``session``, merging ``keys`` into what is already flagged"""
+        flagged = session.info.get(self.key)
+        if flagged is ALL or keys is ALL:
+            session.info[self.key] = ALL
+        else:
+            session.info[self.key] = (flagged or set()) | set(keys)
+
+    def _after_flush(self, session, flush_context):
+        if self.collect is not None:
+            keys = self.collect(session)
+            if keys:
+                self.mark(session, keys)
+        elif (any(isinstance(obj, self.models) for obj in session.new)
+                or any(isinstance(obj, self.models) for obj in session.deleted)
+                or any(isinstance(obj, self.updated_models) for obj in session.dirty)):
+            self.mark(session)
+
+    def _writes_models(self, orm_execute_state):
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            return issubclass(mapper.class_, self.models)
+        table = getattr(orm_execute_state.statement, 'table', None)
+        return table is not None and any(table is model.__table__ for model in self.models)
+
+    def _on_bulk_statement(self, orm_execute_state):
+        # insert(Payroll) executemany, Attendance.__table__.insert() and Query.update() bypass the unit of work
+        if (any(getattr(orm_execute_state, f'is_{kind}') for kind in self.statements)
+                and self._writes_models(orm_execute_state)):
+            self.mark(orm_execute_state.session)
+
+    def _after_commit(self, session):
+        flagged = session.info.pop(self.key, None)
+        if flagged and has_app_context():
+            self.on_commit(flagged)
+
+    def _after_rollback(self, session):
+        session.info.pop(self.key, None)
+
+    def listen(self, session):
+        """Register on ``session`` (a scoped session or Session class); repeated calls are ignored"""
+        if event.contains(session, 'after_commit', self._after_commit):
+            return
+        if self.models:
+            event.listen(session, 'after_flush', self._after_flush)
+            event.listen(session, 'do_orm_execute', self._on_bulk_statement)
+        event.listen(session, 'after_commit', self._after_commit)
+        event.listen(session, 'after_rollback', self._after_rollback)
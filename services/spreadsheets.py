@@ -0,0 +1,70 @@
+"""
+CSV and Excel uploads read into all-text DataFrames for the bulk imports.
+
+Cells are kept as stripped text so each import validates and converts its
+columns itself, in bulk. Excel workbooks are read directly through openpyxl
+(pd.read_excel insists on a newer openpyxl than the one pinned); date and
+time cells come out in ISO form.
+"""
+import os
+import zipfile
+from datetime import date, datetime, time
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+EXTENSIONS = ('.csv', '.xlsx')
+
+
+class SpreadsheetError(ValueError):
+    """The file as a whole cannot be read"""
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        # Date cells come back as midnight datetimes
+        return value.date().isoformat() if value.time() == time() else value.isoformat(sep=' ')
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _read_xlsx(stream):
+    """First worksheet as text"""
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [_cell_text(value) for value in next(rows, ())]
+        return pd.DataFrame([[_cell_text(value) for value in row] for row in rows if any(v is not None for v in row)],
+                            columns=header, dtype=str)
+    finally:
+        workbook.close()
+
+
+def read_sheet(stream, filename, columns, required=()):
+    """DataFrame of a .csv or .xlsx upload with exactly ``columns``, every cell as text.
+
+    Headers are matched case-insensitively with spaces as underscores;
+    optional columns the file lacks are blank.
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in EXTENSIONS:
+        raise SpreadsheetError('Upload a .csv or .xlsx file')
+    try:
+        if extension == '.csv':
+            frame = pd.read_csv(stream, dtype=str, keep_default_na=False, skipinitialspace=True)
+        else:
+            frame = _read_xlsx(stream)
+    except (ValueError, OSError, KeyError, zipfile.BadZipFile, pd.errors.ParserError, InvalidFileException) as e:
+        raise SpreadsheetError(f'Could not read {filename}: {e}')
+
+    frame.columns = [str(column).strip().lower().replace(' ', '_') for column in frame.columns]
+    missing = [column for column in required if column not in frame.columns]
+    if missing:
+        raise SpreadsheetError(f"Missing column(s): {', '.join(missing)}")
+    for column in columns:
+        frame[column] = frame[column].astype(str).str.strip() if column in frame.columns else ''
+    return frame[list(columns)].reset_index(drop=True)
@@ -0,0 +1,367 @@
+"""
+Materialized monthly payroll and daily attendance summaries.
+
+The dashboard trend, admin.api_stats and attendance.api_stats used to group
+the whole payrolls and attendances tables by extract(year/month) on every
+request, which no index can serve. PayrollMonthlySummary (month x department
+x status) and AttendanceDailySummary (day x department) hold those
+aggregates instead, and the chart queries read them.
+
+The summaries are kept current on write. Session events note which payroll
+months and attendance days a transaction touches, from the unit of work as
+well as from bulk and Core INSERT, UPDATE and DELETE statements. Recomputing
+a bucket from the source rows instead of applying deltas keeps every write
+path right, including bulk updates whose rows are not known up front. On
+Postgres a transaction-scoped advisory lock per bucket keeps two refreshes
+from replacing the same bucket from different snapshots. Moving an employee
+to another department refreshes every bucket holding their rows.
+
+Payroll months are recomputed just before commit, in the same transaction.
+Attendance days follow CLOCK_ROLLUP_MODE like the attendance rows do: in
+'inline' mode they are recomputed before commit too; otherwise the commit
+only appends the days to pending_summary_days, so the day's clock-ins do
+not queue up behind one bucket lock. refresh_pending_days() then
+recomputes them on the clock rollup worker after commit ('background') or
+from ``flask rollup-clock-events`` ('manual'), and the attendance charts lag
+the rows by that much.
+
+``flask rebuild-summaries`` recomputes everything, for instance after rows
+were loaded with raw SQL.
+"""
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, event, extract, func, insert, inspect, select, text
+
+from models import Attendance, AttendanceDailySummary, Employee, Payroll, PayrollMonthlySummary, PendingSummaryDay, db
+from services.clock_events import KEY_BATCH_SIZE
+
+_TOUCHED_KEY = 'summary_buckets'
+PENDING_DAYS_FLAG = 'summary_days_pending'  # Set on sessions that queued attendance days for refresh
+DEFAULT_REFRESH_BATCH_SIZE = 1000  # queued days per refresh transaction
+
+# Source table -> (key column, bucket kind)
+SOURCES = {
+    'payrolls': ('pay_period_start', 'months'),
+    'attendances': ('date', 'days')
+}
+
+
+@dataclass(frozen=True)
+class MonthlyAttendance:
+    year: int
+    month: int
+    total_days: int
+    avg_hours: float
+    total_overtime: float
+
+    @property
+    def label(self):
+        return f"{self.year}-{self.month:02d}"
+
+
+@dataclass(frozen=True)
+class DepartmentAttendanceStat:
+    department: str
+    total_attendance: int
+    avg_hours: float
+
+
+class _Touched:
+    """Buckets one transaction has to refresh before it commits"""
+    __slots__ = ('months', 'days', 'employees', 'all_months', 'all_days')
+
+    def __init__(self):
+        self.months, self.days, self.employees = set(), set(), set()
+        self.all_months = self.all_days = False
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(month):
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+
+def _touched(session):
+    touched = session.info.get(_TOUCHED_KEY)
+    if touched is None:
+        touched = session.info[_TOUCHED_KEY] = _Touched()
+    return touched
+
+
+def _add_keys(touched, kind, values):
+    values = {value for value in values if value is not None}
+    if kind == 'months':
+        touched.months.update(month_start(value) for value in values)
+    else:
+        touched.days.update(values)
+
+
+def _attribute_values(obj, name):
+    """Current and pre-flush values of ``obj.name``, without loading anything"""
+    history = inspect(obj).attrs[name].history
+    return [*history.added, *history.unchanged, *history.deleted]
+
+
+def _keep_active_history(target, value, oldvalue, initiator):
+    """No-op 'set' listener; registering it with active_history=True makes the ORM load the
+    value being replaced, so the flush sees which bucket a row moves out of"""
+
+
+def _load_deleted_keys(session, flush_context, instances):
+    # History has nothing for an expired attribute, and after the flush the row is gone
+    for obj in session.deleted:
+        if isinstance(obj, (Payroll, Attendance)):
+            getattr(obj, SOURCES[obj.__tablename__][0])
+
+
+def _mark_on_flush(session, flush_context):
+    touched = None
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Payroll, Attendance)):
+            column, kind = SOURCES[obj.__tablename__]
+            touched = touched or _touched(session)
+            _add_keys(touched, kind, _attribute_values(obj, column))
+        elif isinstance(obj, Employee) and obj in session.dirty and inspect(obj).attrs.department.history.has_changes():
+            touched = touched or _touched(session)
+            touched.employees.add(obj.id)
+
+
+def _mark_on_bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    source = SOURCES.get(getattr(table, 'name', None))
+    if source is None:
+        return
+    column, kind = source
+    session, statement = orm_execute_state.session, orm_execute_state.statement
+    touched = _touched(session)
+
+    if orm_execute_state.is_insert:
+        rows = orm_execute_state.parameters
+        rows = [rows] if isinstance(rows, dict) else list(rows or ())
+        if not any(rows):
+            # insert(...).values(...) carries its row in the statement
+            rows = [statement.compile().params]
+        _add_keys(touched, kind, (row.get(column) for row in rows))
+        return
+
+    # UPDATE/DELETE: the buckets of the rows the statement is about to change
+    if statement.whereclause is None:
+        setattr(touched, f'all_{kind}', True)
+        return
+    key = table.c[column]
+    _add_keys(touched, kind, session.scalars(select(key).distinct().where(statement.whereclause)))
+
+
+def _lock_buckets(session, table_name, keys):
+    """Serialize refreshes of the same buckets across transactions on Postgres"""
+    if session.get_bind(mapper=Payroll).dialect.name != 'postgresql':
+        return
+    for key in sorted(keys):
+        session.execute(text('SELECT pg_advisory_xact_lock(:key)'),
+                        {'key': zlib.crc32(f'{table_name}:{key.isoformat()}'.encode())})
+
+
+def refresh_payroll_months(months, session=None):
+    """Recompute the payroll summary rows of the given months (first days)"""
+    session = session or db.session
+    months = sorted(set(months))
+    _lock_buckets(session, PayrollMonthlySummary.__tablename__, months)
+    status = func.coalesce(Payroll.status, 'pending')
+    now = datetime.utcnow()
+    for month in months:
+        rows = session.execute(
+            select(Employee.department, status.label('status'), func.count(Payroll.id).label('payroll_count'),
+                   func.coalesce(func.sum(Payroll.gross_salary), 0).label('gross_total'),
+                   func.coalesce(func.sum(Payroll.net_salary), 0).label('net_total'))
+            .join(Employee, Payroll.employee_id == Employee.id)
+            .where(Payroll.pay_period_start >= month, Payroll.pay_period_start < _next_month(month))
+            .group_by(Employee.department, status)
+        ).all()
+        session.execute(delete(PayrollMonthlySummary).where(PayrollMonthlySummary.month == month))
+        if rows:
+            session.execute(PayrollMonthlySummary.__table__.insert(),
+                            [{'month': month, **row._asdict(), 'updated_at': now} for row in rows])
+
+
+def refresh_attendance_days(days, session=None):
+    """Recompute the attendance summary rows of the given days"""
+    session = session or db.session
+    days = sorted(set(days))
+    _lock_buckets(session, AttendanceDailySummary.__tablename__, days)
+    checked_in = Attendance.check_in.isnot(None)
+    now = datetime.utcnow()
+    for start in range(0, len(days), KEY_BATCH_SIZE):
+        batch = days[start:start + KEY_BATCH_SIZE]
+        rows = session.execute(
+            select(
+                Attendance.date.label('day'),
+                Employee.department,
+                func.count(Attendance.id).label('record_count'),
+                func.count(Attendance.id).filter(Attendance.status == 'present').label('present_count'),
+                func.count(Attendance.id).filter(Attendance.status == 'late').label('late_count'),
+                func.count(Attendance.id).filter(Attendance.status == 'absent').label('absent_count'),
+                func.count(Attendance.id).filter(Attendance.status == 'half_day').label('half_day_count'),
+                func.count(Attendance.id).filter(checked_in).label('checked_in_count'),
+                func.count(Attendance.hours_worked).filter(checked_in).label('hours_count'),
+                func.coalesce(func.sum(Attendance.hours_worked).filter(checked_in), 0).label('hours_total'),
+                func.coalesce(func.sum(Attendance.overtime_hours).filter(checked_in), 0).label('overtime_total')
+            )
+            .join(Employee, Attendance.employee_id == Employee.id)
+            .where(Attendance.date.in_(batch))
+            .group_by(Attendance.date, Employee.department)
+        ).all()
+        session.execute(delete(AttendanceDailySummary).where(AttendanceDailySummary.day.in_(batch)))
+        if rows:
+            session.execute(AttendanceDailySummary.__table__.insert(),
+                            [{**row._asdict(), 'updated_at': now} for row in rows])
+
+
+def _employee_buckets(session, employee_ids, touched):
+    employee_ids = sorted(employee_ids)
+    for start in range(0, len(employee_ids), KEY_BATCH_SIZE):
+        batch = employee_ids[start:start + KEY_BATCH_SIZE]
+        _add_keys(touched, 'months', session.scalars(
+            select(Payroll.pay_period_start).distinct().where(Payroll.employee_id.in_(batch))
+        ))
+        _add_keys(touched, 'days', session.scalars(
+            select(Attendance.date).distinct().where(Attendance.employee_id.in_(batch))
+        ))
+
+
+def rebuild_summaries(session=None):
+    """Recompute both summary tables from scratch; returns (months, days) refreshed. Does not commit."""
+    session = session or db.session
+    months = {month_start(day) for day in session.scalars(select(Payroll.pay_period_start).distinct())}
+    days = set(session.scalars(select(Attendance.date).distinct()))
+    session.execute(delete(PayrollMonthlySummary))
+    session.execute(delete(AttendanceDailySummary))
+    # Queued days are recomputed here as well; ones committed later stay queued
+    session.execute(delete(PendingSummaryDay))
+    refresh_payroll_months(months, session)
+    refresh_attendance_days(days, session)
+    return len(months), len(days)
+
+
+def refresh_pending_days(batch_size=None, session=None):
+    """Recompute the attendance days queued by deferred commits; returns days refreshed. Commits."""
+    session = session or db.session
+    batch_size = batch_size or DEFAULT_REFRESH_BATCH_SIZE
+    refreshed = 0
+    while True:
+        pending = session.execute(
+            select(PendingSummaryDay.id, PendingSummaryDay.day).order_by(PendingSummaryDay.id).limit(batch_size)
+        ).all()
+        if not pending:
+            session.commit()
+            return refreshed
+
+        days = {row.day for row in pending}
+        refresh_attendance_days(days, session)
+        # Only the entries read above: a day queued meanwhile is refreshed again by the next run
+        session.execute(delete(PendingSummaryDay).where(PendingSummaryDay.id.in_([row.id for row in pending])))
+        session.commit()
+        refreshed += len(days)
+        if len(pending) < batch_size:
+            return refreshed
+
+
+def _defer_days():
+    return current_app.config.get('CLOCK_ROLLUP_MODE', 'background') != 'inline'
+
+
+def _queue_days(session, days):
+    """Leave ``days`` to refresh_pending_days(); an append, so concurrent commits never conflict"""
+    session.execute(insert(PendingSummaryDay), [{'day': day, 'created_at': datetime.utcnow()} for day in sorted(days)])
+    session.info[PENDING_DAYS_FLAG] = True
+
+
+def _refresh_before_commit(session):
+    # Flush first so the unit of work's changes are marked and visible to the refresh
+    session.flush()
+    touched = session.info.pop(_TOUCHED_KEY, None)
+    if touched is None:
+        return
+    if touched.employees:
+        _employee_buckets(session, touched.employees, touched)
+    if touched.all_months and touched.all_days:
+        rebuild_summaries(session)
+        return
+    if touched.all_months:
+        touched.months = {month_start(day) for day in session.scalars(select(Payroll.pay_period_start).distinct())}
+        session.execute(delete(PayrollMonthlySummary))
+    if touched.all_days:
+        # Bulk statements over the whole table are rare; days left without rows need clearing now
+        touched.days = set(session.scalars(select(Attendance.date).distinct()))
+        session.execute(delete(AttendanceDailySummary))
+    if touched.months:
+        refresh_payroll_months(touched.months, session)
+    if touched.days and _defer_days() and not touched.all_days:
+        _queue_days(session, touched.days)
+    elif touched.days:
+        refresh_attendance_days(touched.days, session)
+
+
+def _clear_after_rollback(session):
+    session.info.pop(_TOUCHED_KEY, None)
+
+
+def monthly_attendance():
+    """Checked-in days, average hours and overtime per month, all time"""
+    year = extract('year', AttendanceDailySummary.day)
+    month = extract('month', AttendanceDailySummary.day)
+    hours = func.sum(AttendanceDailySummary.hours_count)
+    rows = db.session.execute(
+        select(year.label('year'), month.label('month'),
+               func.sum(AttendanceDailySummary.checked_in_count).label('total_days'),
+               (func.sum(AttendanceDailySummary.hours_total) / func.nullif(hours, 0)).label('avg_hours'),
+               func.sum(AttendanceDailySummary.overtime_total).label('total_overtime'))
+        .where(AttendanceDailySummary.checked_in_count > 0)
+        .group_by(year, month).order_by(year, month)
+    ).all()
+    return [MonthlyAttendance(int(row.year), int(row.month), int(row.total_days), float(row.avg_hours or 0),
+                              float(row.total_overtime or 0)) for row in rows]
+
+
+def department_attendance():
+    """Checked-in days and average hours per department, all time"""
+    hours = func.sum(AttendanceDailySummary.hours_count)
+    rows = db.session.execute(
+        select(AttendanceDailySummary.department,
+               func.sum(AttendanceDailySummary.checked_in_count).label('total_attendance'),
+               (func.sum(AttendanceDailySummary.hours_total) / func.nullif(hours, 0)).label('avg_hours'))
+        .where(AttendanceDailySummary.checked_in_count > 0)
+        .group_by(AttendanceDailySummary.department)
+    ).all()
+    return [DepartmentAttendanceStat(row.department, int(row.total_attendance), float(row.avg_hours or 0))
+            for row in rows]
+
+
+@click.command('rebuild-summaries')
+@with_appcontext
+def rebuild_summaries_command():
+    """Recompute the payroll and attendance summary tables."""
+    months, days = rebuild_summaries()
+    db.session.commit()
+    click.echo(f'Rebuilt summaries for {months} payroll months and {days} attendance days')
+
+
+def init_summaries(app):
+    """Keep the summary tables current on commit"""
+    app.cli.add_command(rebuild_summaries_command)
+    if not event.contains(db.session, 'before_commit', _refresh_before_commit):
+        for attribute in (Payroll.pay_period_start, Attendance.date, Employee.department):
+            event.listen(attribute, 'set', _keep_active_history, active_history=True)
+        event.listen(db.session, 'before_flush', _load_deleted_keys)
+        event.listen(db.session, 'after_flush', _mark_on_flush)
+        event.listen(db.session, 'do_orm_execute', _mark_on_bulk_statement)
+        event.listen(db.session, 'before_commit', _refresh_before_commit)
+        event.listen(db.session, 'after_rollback', _clear_after_rollback)
@@ -0,0 +1,50 @@
+"""
+Username allocation for new accounts.
+
+New employees get first.last, then first.last1, first.last2, ... until a
+free name turns up. allocate_usernames() does that for any number of people
+against one prefetched set of the taken names sharing their prefixes, so a
+batch costs a query per LOOKUP_BATCH_SIZE distinct names instead of one per
+candidate.
+"""
+from sqlalchemy import or_, select
+
+from models import User, db
+
+LOOKUP_BATCH_SIZE = 500  # prefixes per OR list
+
+
+def username_base(first_name, last_name):
+    return f"{(first_name or 'user').strip().lower()}.{(last_name or 'user').strip().lower()}"
+
+
+def taken_usernames(bases):
+    """Every existing username that starts with one of ``bases``"""
+    bases = sorted(set(bases))
+    taken = set()
+    for start in range(0, len(bases), LOOKUP_BATCH_SIZE):
+        taken.update(db.session.scalars(select(User.username).where(or_(
+            *(User.username.startswith(base, autoescape=True) for base in bases[start:start + LOOKUP_BATCH_SIZE])
+        ))))
+    return taken
+
+
+def allocate_usernames(names, taken=None):
+    """A free username per (first_name, last_name): the base, then base1, base2, ...
+
+    ``taken`` is updated with the names handed out, so a batch never
+    allocates the same name twice.
+    """
+    bases = [username_base(first_name, last_name) for first_name, last_name in names]
+    taken = taken_usernames(bases) if taken is None else taken
+    next_suffix = {}
+    usernames = []
+    for base in bases:
+        username, counter = base, next_suffix.get(base, 1)
+        while username in taken:
+            username = f"{base}{counter}"
+            counter += 1
+        next_suffix[base] = counter
+        taken.add(username)
+        usernames.append(username)
+    return usernames
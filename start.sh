@@ -1,17 +1,14 @@
 #!/bin/bash
 # Start script for Render deployment
+set -e
 
 # Install dependencies
 pip install -r requirements.txt
 
-# Initialize database
-python -c "
-from app import create_app, db
-app = create_app()
-with app.app_context():
-    db.create_all()
-    print('Database initialized successfully')
-"
+# Apply migrations; databases from before them are stamped at the baseline first
+export FLASK_APP=app.py
+flask stamp-baseline
+flask db upgrade
 
 # Start the application
 gunicorn app:app --bind 0.0.0.0:$PORT
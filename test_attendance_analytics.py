@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Attendance analytics tests
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, time
+import pytest
+from sqlalchemy import event
+
+from app import db
+
+
+@pytest.fixture
+def app(app):
+    # Summaries refresh within each commit, so no rollup worker runs statements mid-test
+    app.config['CLOCK_ROLLUP_MODE'] = 'inline'
+    return app
+
+
+def test_analytics_respect_grace_periods_and_working_days(app):
+    from models import User, Employee, Attendance, OfficeHours
+    from services.attendance_analytics import attendance_analytics
+    from services.policy_cache import OfficeHoursSnapshot
+    
+    with app.app_context():
+        hours = OfficeHours(
+            name='Standard', official_clock_in=time(9, 0), official_clock_out=time(17, 0),
+            clock_in_grace_period=15, clock_out_grace_period=15, working_days='1,2,3,4,5',
+            is_default=True, is_active=True
+        )
+        db.session.add(hours)
+        
+        employees = []
+        for i, (department, hired) in enumerate([('Finance', date(2020, 1, 1)), ('Finance', date(2020, 1, 1)),
+                                                 ('Sales', date(2024, 3, 6))]):
+            user = User(username=f'analytics{i}', email=f'analytics{i}@test.com', role='employee', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            employee = Employee(
+                user_id=user.id, employee_id=f'ANA{i:03d}', first_name='Analytics', last_name=str(i),
+                email=f'analytics{i}@test.com', job_title='Clerk', department=department,
+                hire_date=hired, salary=1000
+            )
+            db.session.add(employee)
+            employees.append(employee)
+        db.session.flush()
+        
+        # Mon 2024-03-04 .. Sun 2024-03-10: five working days
+        rows = [
+            (0, date(2024, 3, 4), time(9, 10), time(16, 50), 0),   # inside both grace periods
+            (0, date(2024, 3, 5), time(9, 20), time(18, 30), 1.5), # late, overtime
+            (1, date(2024, 3, 4), time(8, 55), time(16, 30), 0),   # early departure
+            (1, date(2024, 3, 9), time(10, 0), None, 0),           # Saturday, late, still clocked in
+            (2, date(2024, 3, 6), time(9, 15), time(17, 0), 0),    # exactly at the grace limit
+        ]
+        for index, day, check_in, check_out, overtime in rows:
+            db.session.add(Attendance(
+                employee_id=employees[index].id, date=day, check_in=check_in, check_out=check_out,
+                overtime_hours=overtime, status='present'
+            ))
+        db.session.commit()
+        hours = OfficeHoursSnapshot.from_model(hours)
+        
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        analytics = attendance_analytics(date(2024, 3, 4), date(2024, 3, 10), office_hours=hours,
+                                         today=date(2024, 3, 31))
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        assert len(statements) == 2
+        assert analytics.working_days == 5
+        totals = analytics.totals
+        assert (totals.records, totals.attended, totals.late, totals.early) == (5, 5, 2, 1)
+        assert (totals.overtime, totals.overtime_hours) == (1, 1.5)
+        
+        # Employee 0 missed 3 of 5 days, employee 1 missed 4 (the Saturday does not count
+        # towards the working days), employee 2 was hired on Wednesday and missed 2 of 3
+        by_employee = {row.employee_id: row.counts for row in analytics.by_employee}
+        assert [by_employee[e.id].absences for e in employees] == [3, 4, 2]
+        assert totals.absences == 9
+        
+        by_department = {row.department: row for row in analytics.by_department}
+        assert by_department['Finance'].employees == 2
+        assert by_department['Finance'].counts.late == 2
+        assert by_department['Sales'].counts.absences == 2
+        
+        by_day = {row.date: row for row in analytics.by_day}
+        assert len(by_day) == 7
+        assert by_day[date(2024, 3, 5)].counts.absences == 1   # Sales was not hired yet
+        assert by_day[date(2024, 3, 6)].counts.absences == 2
+        assert by_day[date(2024, 3, 9)].counts.absences == 0 and not by_day[date(2024, 3, 9)].is_working_day
+        assert sum(row.counts.absences for row in analytics.by_day) == totals.absences
+        
+        # Future days are not absences yet
+        partial = attendance_analytics(date(2024, 3, 4), date(2024, 3, 10), office_hours=hours,
+                                       today=date(2024, 3, 5))
+        assert partial.working_days == 2
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Bulk attendance import tests
+"""
+
+import sys
+import os
+import io
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, time
+from sqlalchemy import event
+
+from app import db
+from services.clock_rollup import _get_executor
+from services.metrics_cache import cached_dashboard_metrics, get_metrics_cache
+
+TIMESHEET = """employee_id,date,check_in,check_out,status,notes
+IMP001,2024-03-04,08:30,17:30,,
+IMP001,2024-03-05,09:20,17:00,,Traffic
+IMP002,2024-03-04,,,,
+IMP002,2024-03-05,09:00,13:00,half_day,
+IMP001,2024-03-04,09:00,17:00,,
+NOPE,2024-03-04,09:00,17:00,,
+IMP002,04/03/2024,09:00,17:00,,
+IMP002,2024-03-06,9am,17:00,,
+IMP002,2024-03-07,17:00,09:00,,
+IMP002,2024-03-08,09:00,17:00,sick,
+IMP002,2024-03-01,09:00,17:00,,
+"""
+
+
+def _upload(client, dry_run, content=TIMESHEET, filename='timesheet.csv'):
+    return client.post('/admin/attendance/import', data={
+        'file': (io.BytesIO(content.encode()), filename), 'dry_run': '1' if dry_run else '0'
+    }, content_type='multipart/form-data')
+
+
+def test_timesheet_import_previews_then_inserts(app, login):
+    from models import User, Employee, Attendance, AttendanceDailySummary, PendingSummaryDay
+    
+    with app.app_context():
+        admin = User(username='hr_import', email='hr@test.com', role='hr', password_hash='x')
+        db.session.add(admin)
+        db.session.flush()
+        employees = [
+            Employee(user_id=admin.id, employee_id=f'IMP00{n}', first_name='Im', last_name=str(n), email=f'imp{n}@test.com',
+                     job_title='Clerk', department='Ops', hire_date=date(2020, 1, 1), salary=1000)
+            for n in (1, 2)
+        ]
+        db.session.add_all(employees)
+        db.session.flush()
+        db.session.add(Attendance(employee_id=employees[1].id, date=date(2024, 3, 1), status='present'))
+        db.session.commit()
+        admin_id, first_id, second_id = admin.id, employees[0].id, employees[1].id
+    
+    client = login(admin_id)
+    response = _upload(client, dry_run=True)
+    page = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert '11 rows' in page and '4 ready to import' in page and '7 with errors' in page
+    for message in ['Duplicate row in file', 'Unknown employee', 'Invalid date (use YYYY-MM-DD)',
+                    'Invalid check_in (use HH:MM)', 'check_out before check_in', 'Invalid status',
+                    'Attendance already recorded for this date']:
+        assert message in page
+    with app.app_context():
+        assert Attendance.query.count() == 1
+    
+    # Fill the dashboard cache: the import's Core insert must invalidate it
+    with app.app_context():
+        cached_dashboard_metrics()
+        invalidations = get_metrics_cache().invalidations
+    
+    # Lookups are one query each and the rows go in as one executemany
+    statements = []
+    caller = threading.get_ident()
+    with app.app_context():
+        # The summary refresh runs on the rollup worker; only count the request's statements
+        listener = lambda *args: threading.get_ident() == caller and statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        assert _upload(client, dry_run=False).status_code == 200
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len([s for s in statements if 'employees.employee_id IN' in s]) == 1
+    assert len([s for s in statements if 'FROM attendances' in s and 'GROUP BY' not in s]) == 1
+    assert len([s for s in statements if s.startswith('INSERT INTO attendances')]) == 1
+    # The touched days are queued in one insert and their summaries refreshed after the commit
+    assert len([s for s in statements if s.startswith('INSERT INTO pending_summary_days')]) == 1
+    assert not [s for s in statements if s.startswith('INSERT INTO attendance_daily_summaries')]
+    _get_executor().submit(lambda: None).result()
+    
+    with app.app_context():
+        rows = {(row.employee_id, row.date): row for row in Attendance.query}
+        overtime = rows[(first_id, date(2024, 3, 4))]
+        assert (overtime.check_in, overtime.check_out, float(overtime.hours_worked), float(overtime.overtime_hours),
+                overtime.status) == (time(8, 30), time(17, 30), 9.0, 1.0, 'present')
+        late = rows[(first_id, date(2024, 3, 5))]
+        assert (late.status, float(late.hours_worked), late.notes) == ('late', 7.67, 'Traffic')
+        assert rows[(second_id, date(2024, 3, 4))].status == 'absent'
+        assert rows[(second_id, date(2024, 3, 5))].status == 'half_day'
+        assert len(rows) == 5
+        assert AttendanceDailySummary.query.filter_by(day=date(2024, 3, 4)).one().record_count == 2
+        assert PendingSummaryDay.query.count() == 0
+        assert get_metrics_cache().invalidations == invalidations + 1
+        assert get_metrics_cache().stats()['entries'] == 0
+    
+    # Re-importing the same sheet finds every day already recorded
+    page = _upload(client, dry_run=True).get_data(as_text=True)
+    assert '0 ready to import' in page
+    
+    response = _upload(client, dry_run=True, content='name,day\nx,y\n')
+    assert response.status_code == 302
+
+
+def test_plan_reads_xlsx(app):
+    from openpyxl import Workbook
+    from models import User, Employee
+    from services.attendance_import import read_timesheet, plan_attendance_import
+    
+    with app.app_context():
+        user = User(username='xls', email='xls@test.com', role='hr', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Employee(user_id=user.id, employee_id='XLS001', first_name='X', last_name='L', email='x@test.com',
+                                job_title='Clerk', department='Ops', hire_date=date(2020, 1, 1), salary=1000))
+        db.session.commit()
+        
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Employee ID', 'Date', 'Check In', 'Check Out'])
+        sheet.append(['XLS001', date(2024, 3, 4), time(9, 0), time(18, 0)])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+        
+        plan = plan_attendance_import(read_timesheet(buffer, 'timesheet.xlsx'))
+        assert plan.errors == []
+        assert [(row['date'], row['check_in'], row['overtime_hours']) for row in plan.rows] == [
+            (date(2024, 3, 4), time(9, 0), 1.0)
+        ]
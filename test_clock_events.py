@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Clock-event service tests
+"""
+
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, datetime, time
+from sqlalchemy import event
+
+from app import db
+from services.clock_events import (
+    evaluate_clock, clock_in, clock_out, record_attendance, import_attendance, ClockError
+)
+
+
+def test_evaluate_clock_uses_office_hours_or_defaults():
+    from services.policy_cache import OfficeHoursSnapshot
+    
+    hours = OfficeHoursSnapshot(
+        id=1, name='Early', description=None, official_clock_in=time(8, 0), official_clock_out=time(16, 0),
+        clock_in_grace_period=10, clock_out_grace_period=10, break_duration=0, break_start_time=None,
+        working_days=(1, 2, 3, 4, 5), allow_early_clock_in=True, allow_late_clock_out=True, is_default=True
+    )
+    assert evaluate_clock(time(8, 10), office_hours=hours).status == 'present'
+    late = evaluate_clock(time(8, 25), time(15, 40), hours)
+    assert (late.status, late.late_minutes, late.early_minutes, late.hours_worked) == ('late', 25, 20, 7.25)
+    assert evaluate_clock(time(7, 30), time(17, 0), hours).overtime_hours == 1.5
+    assert evaluate_clock(None).status == 'absent'
+    
+    # Without office hours: 09:00-17:00, no grace
+    assert evaluate_clock(time(9, 1)).late_minutes == 1
+    assert evaluate_clock(time(8, 0), time(17, 30)).overtime_hours == 1.5
+
+
+def test_entry_points_share_the_service(app):
+    from models import User, Employee, Attendance, OfficeHours, OfficeLocation
+    from services.policy_cache import get_policy_config
+    
+    with app.app_context():
+        db.session.add(OfficeHours(
+            name='Standard', official_clock_in=time(9, 0), official_clock_out=time(17, 0),
+            clock_in_grace_period=15, clock_out_grace_period=15, working_days='1,2,3,4,5',
+            is_default=True, is_active=True
+        ))
+        location = OfficeLocation(name='HQ', address='1 Main St', radius_meters=100)
+        db.session.add(location)
+        employees = []
+        for i in range(3):
+            user = User(username=f'event_user{i}', email=f'event{i}@test.com', role='employee', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            employee = Employee(
+                user_id=user.id, employee_id=f'EVT{i:03d}', first_name='Event', last_name=str(i),
+                email=f'event{i}@test.com', job_title='Clerk', department='Ops', hire_date=date(2020, 1, 1), salary=1000
+            )
+            db.session.add(employee)
+            employees.append(employee)
+        db.session.commit()
+        ids = [employee.id for employee in employees]
+        hq = location.to_brief_dict()
+        get_policy_config()
+        
+        day = date(2024, 3, 4)
+        result = clock_in(ids[0], datetime(2024, 3, 4, 9, 20), 'qr', hq)
+        assert (result.evaluation.status, result.summary.notes) == ('late', 'QR Clock-in at HQ (Late by 20 minutes)')
+        try:
+            clock_in(ids[0], datetime(2024, 3, 4, 9, 21), 'web')
+            assert False, 'second clock-in accepted'
+        except ClockError as e:
+            assert str(e) == 'Already clocked in'
+        result = clock_out(ids[0], datetime(2024, 3, 4, 18, 20), 'qr', hq)
+        db.session.commit()
+        assert (result.evaluation.hours_worked, result.evaluation.overtime_hours) == (9.0, 1.0)
+        assert result.summary.notes == 'QR Clock-in at HQ (Late by 20 minutes) | QR Clock-out at HQ'
+        
+        admin_row = record_attendance(ids[1], day, time(8, 0), time(18, 0), status='present', notes='Manual')
+        db.session.commit()
+        assert (float(admin_row.hours_worked), float(admin_row.overtime_hours)) == (10.0, 2.0)
+        try:
+            record_attendance(ids[1], day, time(8, 0), time(18, 0))
+            assert False, 'duplicate admin record accepted'
+        except ClockError as e:
+            assert str(e) == 'Attendance already recorded for this date'
+        
+        # Batch import: one lookup, one executemany; existing and repeated days are skipped
+        # (counting this thread only, as the commit above queued a summary refresh on the rollup worker)
+        statements = []
+        caller = threading.get_ident()
+        listener = lambda *args: threading.get_ident() == caller and statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        imported = import_attendance([
+            {'employee_id': ids[1], 'date': day, 'check_in': time(9, 0), 'check_out': time(17, 0)},
+            {'employee_id': ids[2], 'date': day, 'check_in': time(9, 30), 'check_out': time(17, 0)},
+            {'employee_id': ids[2], 'date': day, 'check_in': time(9, 0)},
+            {'employee_id': ids[2], 'date': date(2024, 3, 5)}
+        ])
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        db.session.commit()
+        assert imported.created == 2
+        assert imported.skipped == [(ids[1], day), (ids[2], day)]
+        assert len(statements) == 2
+        rows = {row.date: row for row in Attendance.query.filter_by(employee_id=ids[2])}
+        assert (rows[day].status, float(rows[day].hours_worked)) == ('late', 7.5)
+        assert rows[date(2024, 3, 5)].status == 'absent'
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Bulk clock-event ingest tests
+"""
+
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, datetime, time
+import pytest
+from sqlalchemy import event
+
+from app import db
+from services.clock_events import clock_in
+
+
+@pytest.fixture
+def app(app):
+    app.config['CLOCK_ROLLUP_MODE'] = 'inline'
+    return app
+
+
+def test_kiosk_upload_is_validated_deduplicated_and_rolled_up(app, login):
+    from models import User, Employee, Attendance, ClockEvent, OfficeLocation
+    
+    with app.app_context():
+        admin = User(username='kiosk', email='kiosk@test.com', role='hr', password_hash='x')
+        staff = User(username='staff', email='staff@test.com', role='employee', password_hash='x')
+        db.session.add_all([admin, staff])
+        db.session.flush()
+        employees = [
+            Employee(user_id=staff.id, employee_id=f'ING00{n}', first_name='In', last_name=str(n),
+                     email=f'ing{n}@test.com', job_title='Clerk', department='Ops',
+                     hire_date=date(2020, 1, 1), salary=1000)
+            for n in (1, 2)
+        ]
+        location = OfficeLocation(name='HQ', address='1 Main St', radius_meters=100)
+        db.session.add_all(employees + [location])
+        db.session.commit()
+        admin_id, staff_id, first_id, second_id, hq_id = admin.id, staff.id, employees[0].id, employees[1].id, location.id
+        clock_in(first_id, datetime(2024, 3, 4, 8, 0), 'web')
+        db.session.commit()
+    
+    events = [
+        {'employee_id': 'ING001', 'ts': '2024-03-04T08:00:00', 'kind': 'in'},    # already logged
+        {'employee_id': 'ING001', 'ts': '2024-03-04T12:00:00', 'location_id': hq_id},
+        {'employee_id': 'ING001', 'ts': '2024-03-04T12:00:00', 'location_id': hq_id},  # resent
+        {'employee_id': 'ING001', 'ts': '2024-03-04T13:00:00'},
+        {'employee_id': 'ING001', 'ts': '2024-03-04T13:00:20'},                  # double tap
+        {'employee_id': 'ING001', 'ts': '2024-03-04T17:30:00', 'location_id': hq_id},
+        {'employee_id': 'ING002', 'ts': '2024-03-04T09:10:00', 'kind': 'in', 'source': 'web'},
+        {'employee_id': 'NOPE', 'ts': '2024-03-04T09:00:00'},
+        {'employee_id': 'ING002', 'ts': 'yesterday'},
+        {'employee_id': 'ING002', 'ts': '2024-03-04T18:00:00', 'kind': 'lunch'},
+        {'employee_id': 'ING002', 'ts': '2024-03-04T18:00:00', 'location_id': 999},
+    ]
+    body = '\n'.join(json.dumps(e) for e in events)
+    
+    assert login(staff_id).post('/api/attendance/events', data=body).status_code == 403
+    
+    client = login(admin_id)
+    statements = []
+    with app.app_context():
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        response = client.post('/api/attendance/events', data=body, content_type='application/x-ndjson')
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['accepted'], data['duplicates'], data['rejected']) == (4, 3, 4)
+    assert [(r['status'], r.get('kind')) for r in data['results'][:7]] == [
+        ('duplicate', 'in'), ('accepted', 'out'), ('duplicate', 'out'), ('accepted', 'in'),
+        ('duplicate', 'in'), ('accepted', 'out'), ('accepted', 'in')
+    ]
+    assert [r['error'] for r in data['results'][7:]] == [
+        'Unknown employee: NOPE', 'Invalid timestamp', 'Invalid kind: lunch', 'Unknown location: 999'
+    ]
+    # One batched insert for the log and one upsert for the day rows
+    assert len([s for s in statements if s.startswith('INSERT INTO clock_events')]) == 1
+    assert len([s for s in statements if s.startswith('INSERT INTO attendances')]) == 1
+    
+    with app.app_context():
+        assert ClockEvent.query.count() == 5
+        first = Attendance.query.filter_by(employee_id=first_id).one()
+        assert (first.check_in, first.check_out, float(first.hours_worked), first.is_qr) == (time(8, 0), time(17, 30), 8.5, True)
+        assert first.notes == 'QR Clock-out at HQ | QR Clock-out at HQ'
+        second = Attendance.query.filter_by(employee_id=second_id).one()
+        assert (second.check_in, second.check_out, second.status, second.is_qr) == (time(9, 10), None, 'late', False)
+    
+    # Resending the whole buffer as CSV changes nothing
+    rows = ['employee_id,ts,kind,location_id'] + [
+        f"{e['employee_id']},{e['ts']},{e.get('kind', '')},{e.get('location_id', '')}" for e in events[:7]
+    ]
+    data = client.post('/api/attendance/events', data='\n'.join(rows), content_type='text/csv').get_json()
+    assert (data['accepted'], data['duplicates']) == (0, 7)
+    
+    assert client.post('/api/attendance/events', data='{"a": 1}', content_type='application/json').status_code == 400
+    app.config['CLOCK_INGEST_MAX_EVENTS'] = 5
+    assert client.post('/api/attendance/events', data=body, content_type='application/x-ndjson').status_code == 413
+
+
+def test_odd_types_are_rejected_and_logged_events_are_skipped_on_insert(app):
+    from models import User, Employee, ClockEvent
+    from services.clock_ingest import ingest_events
+    from services.clock_writes import insert_clock_events
+    
+    with app.app_context():
+        user = User(username='odd', email='odd@test.com', role='employee', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        employee = Employee(user_id=user.id, employee_id='ODD001', first_name='Odd', last_name='Types',
+                            email='odd@test.com', job_title='Clerk', department='Ops',
+                            hire_date=date(2020, 1, 1), salary=1000)
+        db.session.add(employee)
+        db.session.commit()
+        
+        # JSON values of the wrong type are rejected like any other bad value
+        result = ingest_events([
+            {'employee_id': 'ODD001', 'ts': '2024-03-04T08:00:00', 'kind': 1},
+            {'employee_id': 'ODD001', 'ts': '2024-03-04T08:00:00', 'kind': ['in']},
+            {'employee_id': 'ODD001', 'ts': '2024-03-04T08:00:00', 'source': {'name': 'qr'}},
+            {'employee_id': 'ODD001', 'ts': ['2024-03-04T08:00:00']},
+            {'employee_id': 'ODD001', 'ts': '2024-03-04T08:00:00', 'kind': 'IN '},
+        ])
+        db.session.commit()
+        assert [r.status for r in result.results] == ['rejected'] * 4 + ['accepted']
+        assert [r.error for r in result.results[:4]] == [
+            'Invalid kind: 1', "Invalid kind: ['in']", "Unknown source: {'name': 'qr'}", 'Invalid timestamp'
+        ]
+        
+        # An event another upload logged after the day was read is skipped, not duplicated
+        row = {'employee_id': employee.id, 'day': date(2024, 3, 4), 'ts': datetime(2024, 3, 4, 8, 0),
+               'kind': 'in', 'source': 'qr', 'location_id': None, 'rolled_up': True, 'created_at': datetime.utcnow()}
+        later = {**row, 'ts': datetime(2024, 3, 4, 17, 0), 'kind': 'out'}
+        assert insert_clock_events([row, later]) == {(employee.id, later['ts'])}
+        db.session.commit()
+        assert ClockEvent.query.filter_by(employee_id=employee.id).count() == 2
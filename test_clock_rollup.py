@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Clock-event log and incremental rollup tests
+"""
+
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, datetime, time
+from sqlalchemy import event
+
+from app import db
+from services.clock_events import clock_in, clock_out, scan, day_summary
+from services.clock_rollup import _get_executor, rollup_clock_events
+from services.location_registry import get_location
+from services.policy_cache import default_office_hours
+
+
+def _wait_for_rollup():
+    # The single rollup worker runs queued jobs in order
+    _get_executor().submit(lambda: None).result()
+
+
+def test_events_roll_up_into_daily_attendance(app, login):
+    from models import User, Employee, Attendance, ClockEvent, OfficeLocation
+    
+    assert app.config['CLOCK_ROLLUP_MODE'] == 'background'
+    with app.app_context():
+        user = User(username='rollup_user', email='rollup@test.com', role='employee', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        employee = Employee(
+            user_id=user.id, employee_id='ROL001', first_name='Roll', last_name='Up',
+            email='rollup@test.com', job_title='Clerk', department='Ops', hire_date=date(2020, 1, 1), salary=1000
+        )
+        location = OfficeLocation(name='HQ', address='1 Main St', radius_meters=100)
+        db.session.add_all([employee, location])
+        db.session.commit()
+        user_id, employee_id, hq = user.id, employee.id, location.to_brief_dict()
+        day = date(2024, 3, 4)
+        
+        # With warm caches the scan path reads the day and inserts an event; the
+        # attendance row is only looked up while the day has no events yet
+        default_office_hours()
+        get_location(hq['id'])
+        statements = []
+        caller = threading.get_ident()
+        # The background rollup shares the engine; only count this thread's statements
+        listener = lambda *args: threading.get_ident() == caller and statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        clock_in(employee_id, datetime(2024, 3, 4, 8, 55), 'qr', hq)
+        db.session.commit()
+        assert [s.split()[0] for s in statements] == ['SELECT', 'SELECT', 'INSERT']
+        assert 'INSERT INTO clock_events' in statements[2]
+        
+        # A double tap is absorbed; a second pair after lunch is allowed
+        assert scan(employee_id, datetime(2024, 3, 4, 8, 55, 20), 'qr', hq).duplicate
+        del statements[:]
+        clock_out(employee_id, datetime(2024, 3, 4, 12, 0), 'web')
+        db.session.commit()
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        assert not [s for s in statements if 'attendances' in s]
+        assert [s.split()[0] for s in statements] == ['SELECT', 'INSERT']
+        clock_in(employee_id, datetime(2024, 3, 4, 13, 0), 'web')
+        clock_out(employee_id, datetime(2024, 3, 4, 17, 30), 'qr', hq)
+        clock_in(employee_id, datetime(2024, 3, 5, 9, 0), 'web')
+        db.session.commit()
+        
+        _wait_for_rollup()
+        db.session.expire_all()
+        rows = {row.date: row for row in Attendance.query.filter_by(employee_id=employee_id)}
+        first = rows[day]
+        assert (first.check_in, first.check_out, first.status) == (time(8, 55), time(17, 30), 'present')
+        assert (float(first.hours_worked), float(first.overtime_hours)) == (7.58, 0)
+        assert first.is_qr is True
+        assert first.notes == 'QR Clock-in at HQ | QR Clock-out at HQ'
+        assert (rows[date(2024, 3, 5)].check_out, rows[date(2024, 3, 5)].is_qr) == (None, False)
+        
+        assert ClockEvent.query.filter_by(rolled_up=False).count() == 0
+        assert rollup_clock_events() == 0
+        
+        # Only days with new events are refolded
+        app.config['CLOCK_ROLLUP_MODE'] = 'manual'
+        clock_out(employee_id, datetime(2024, 3, 5, 17, 0), 'web')
+        db.session.commit()
+        assert rollup_clock_events(batch_size=1) == 1
+        assert float(Attendance.query.filter_by(employee_id=employee_id, date=date(2024, 3, 5)).one().hours_worked) == 8.0
+        assert day_summary(employee_id, day).pairs[1][0].ts == datetime(2024, 3, 4, 13, 0)
+        
+        # An event that commits after a higher id has been rolled up is still picked up
+        late_day = date(2024, 3, 6)
+        db.session.add(ClockEvent(id=1000, employee_id=employee_id, day=late_day, ts=datetime(2024, 3, 6, 9, 0),
+                                  kind='in', source='web'))
+        db.session.commit()
+        assert rollup_clock_events() == 1
+        db.session.add(ClockEvent(id=999, employee_id=employee_id, day=late_day, ts=datetime(2024, 3, 6, 17, 0),
+                                  kind='out', source='web'))
+        db.session.commit()
+        assert rollup_clock_events() == 1
+        assert Attendance.query.filter_by(employee_id=employee_id, date=late_day).one().check_out == time(17, 0)
+    
+    # The QR flag is a column now, not a search of the notes
+    history = login(user_id).get('/qr-attendance/attendance-history').get_json()['attendance_history']
+    assert [entry['is_qr_attendance'] for entry in history] == [False, False, True]
+
+
+def test_manual_and_pre_event_rows_stay_on_the_row(app):
+    from models import User, Employee, Attendance, ClockEvent
+    from services.clock_events import ClockError, evaluate_clock, record_attendance
+    
+    app.config['CLOCK_ROLLUP_MODE'] = 'manual'
+    with app.app_context():
+        user = User(username='row_user', email='row@test.com', role='employee', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        employee = Employee(
+            user_id=user.id, employee_id='ROW001', first_name='Row', last_name='Kept',
+            email='row@test.com', job_title='Clerk', department='Ops', hire_date=date(2020, 1, 1), salary=1000
+        )
+        db.session.add(employee)
+        db.session.flush()
+        employee_id = employee.id
+        
+        # Clocked in before the event log existed: a row with no events and no source
+        open_day, admin_day = date(2024, 3, 4), date(2024, 3, 5)
+        db.session.add(Attendance(employee_id=employee_id, date=open_day, check_in=time(9, 20), status='late',
+                                  notes='Clock-in'))
+        db.session.commit()
+        
+        try:
+            clock_in(employee_id, datetime(2024, 3, 4, 9, 30), 'web')
+        except ClockError as error:
+            assert str(error) == 'Already clocked in'
+        else:
+            raise AssertionError('clocked in twice on a pre-event row')
+        
+        result = scan(employee_id, datetime(2024, 3, 4, 17, 30), 'web')
+        assert result.kind == 'clock_out' and not result.duplicate
+        db.session.commit()
+        assert scan(employee_id, datetime(2024, 3, 4, 17, 30, 20), 'web').duplicate
+        try:
+            clock_out(employee_id, datetime(2024, 3, 4, 17, 45), 'web')
+        except ClockError as error:
+            assert str(error) == 'Already clocked out'
+        else:
+            raise AssertionError('clocked out twice on a pre-event row')
+        
+        row = Attendance.query.filter_by(employee_id=employee_id, date=open_day).one()
+        expected = evaluate_clock(time(9, 20), time(17, 30), default_office_hours())
+        assert (row.check_out, row.status, row.source) == (time(17, 30), 'late', None)
+        assert float(row.hours_worked) == expected.hours_worked
+        assert row.notes == 'Clock-in'
+        assert ClockEvent.query.filter_by(employee_id=employee_id).count() == 0
+        
+        # An admin entry blocks clocking, and events that reach the rollup anyway leave it alone
+        record_attendance(employee_id, admin_day, time(8, 0), time(16, 0), status='present', notes='Entered by HR')
+        db.session.commit()
+        try:
+            clock_in(employee_id, datetime(2024, 3, 5, 9, 0), 'web')
+        except ClockError as error:
+            assert str(error) == 'Attendance already recorded for this date'
+        else:
+            raise AssertionError('clocked in over an admin entry')
+        db.session.add(ClockEvent(employee_id=employee_id, day=admin_day, ts=datetime(2024, 3, 5, 9, 0),
+                                  kind='in', source='web'))
+        db.session.commit()
+        assert rollup_clock_events() == 1
+        db.session.expire_all()
+        row = Attendance.query.filter_by(employee_id=employee_id, date=admin_day).one()
+        assert (row.check_in, row.check_out, row.notes, row.source) == (time(8, 0), time(16, 0), 'Entered by HR', 'admin')
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Attendance upsert and concurrent scan tests
+"""
+
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, time
+
+from app import db
+from services.clock_writes import upsert_attendance_rows
+from services.qr_tokens import issue_token
+
+
+def _in_parallel(count, target):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+    
+    def run(index):
+        barrier.wait()
+        results[index] = target(index)
+    
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _setup(app):
+    from models import User, Employee, OfficeLocation
+    
+    with app.app_context():
+        user = User(username='clock_worker', email='clock_worker@test.com', role='employee', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        employee = Employee(
+            user_id=user.id, employee_id='CLK001', first_name='Clock', last_name='Worker',
+            email='clock_worker@test.com', job_title='Clerk', department='Ops', hire_date=date(2020, 1, 1), salary=1000
+        )
+        location = OfficeLocation(name='HQ', address='1 Main St', radius_meters=100)
+        db.session.add_all([employee, location])
+        db.session.commit()
+        return user.id, employee.id, location.id
+
+
+def test_upsert_attendance_rows_replaces_day_summaries(app):
+    from models import Attendance
+    
+    _, employee_id, _ = _setup(app)
+    day = date(2024, 3, 4)
+    manual_day = date(2024, 3, 6)
+    with app.app_context():
+        # A row entered by hand (here marked absent) is never replaced by the rollup
+        db.session.add(Attendance(employee_id=employee_id, date=manual_day, status='absent', notes='Marked absent',
+                                  source='admin'))
+        db.session.commit()
+        
+        summary = {'check_in': time(9, 5), 'check_out': None, 'hours_worked': 0, 'overtime_hours': 0,
+                   'status': 'late', 'notes': 'Scan', 'is_qr': True}
+        upsert_attendance_rows([
+            {'employee_id': employee_id, 'date': day, **summary},
+            {'employee_id': employee_id, 'date': date(2024, 3, 5), **summary, 'status': 'present'},
+            {'employee_id': employee_id, 'date': manual_day, **summary}
+        ])
+        db.session.commit()
+        rows = {row.date: row for row in Attendance.query.filter_by(employee_id=employee_id)}
+        assert len(rows) == 3
+        assert (rows[day].check_in, rows[day].status, rows[day].notes, rows[day].is_qr) == (time(9, 5), 'late', 'Scan', True)
+        assert rows[day].source == 'clock'
+        assert (rows[manual_day].check_in, rows[manual_day].status, rows[manual_day].source) == (None, 'absent', 'admin')
+        
+        upsert_attendance_rows([{'employee_id': employee_id, 'date': day, **summary, 'check_out': time(17, 0), 'hours_worked': 7.92}])
+        db.session.commit()
+        db.session.expire_all()
+        row = Attendance.query.filter_by(employee_id=employee_id, date=day).one()
+        assert (row.check_out, float(row.hours_worked)) == (time(17, 0), 7.92)
+
+
+def test_parallel_scans_record_one_clock_in(app, login):
+    from models import Attendance, ClockEvent
+    from services.clock_events import day_summary
+    
+    app.config['CLOCK_ROLLUP_MODE'] = 'inline'
+    user_id, employee_id, location_id = _setup(app)
+    with app.app_context():
+        qr_data = issue_token(location_id).token
+    clients = [login(user_id) for _ in range(8)]
+    
+    responses = _in_parallel(len(clients), lambda i: clients[i].post('/qr-attendance/scan', json={'qr_data': qr_data}))
+    payloads = [response.get_json() for response in responses]
+    assert all(p['success'] and p['action'] == 'clock_in' for p in payloads), payloads
+    
+    with app.app_context():
+        # Racing taps may each log an event, but the day folds to one open pair and one row
+        assert 1 <= ClockEvent.query.filter_by(employee_id=employee_id).count() <= len(clients)
+        summary = day_summary(employee_id, date.today())
+        assert len(summary.pairs) == 1 and summary.is_open
+        row = Attendance.query.filter_by(employee_id=employee_id).one()
+        assert (row.check_in, row.is_qr) == (summary.check_in, True)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Streamed CSV exports
+
+The attendance, employee and payroll exports must produce a header line and
+one line per matching row, honour the same filters as their list pages, and
+write the body in batches rather than as one string.
+"""
+
+import sys
+import os
+import csv
+import io
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, time, timedelta
+
+from app import db
+from services.csv_export import iter_csv, stream_csv
+
+
+def _seed():
+    """An admin and three employees in two departments, each with one attendance day and one payroll"""
+    from models import User, Employee, Attendance, Payroll
+    admin = User(username='export_admin', email='export_admin@test.com', role='admin', password_hash='x')
+    db.session.add(admin)
+    today = date.today()
+    employees = []
+    for i, department in enumerate(['Sales', 'Sales', 'Finance']):
+        user = User(username=f'export{i}', email=f'export{i}@test.com', role='employee', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        employee = Employee(
+            user_id=user.id, employee_id=f'EXP{i:03d}', first_name='Export', last_name=str(i),
+            email=f'export{i}@test.com', job_title='Clerk', department=department,
+            hire_date=date(2020, 1, 1), salary=1000 + i
+        )
+        db.session.add(employee)
+        db.session.flush()
+        employees.append(employee)
+        db.session.add(Attendance(
+            employee_id=employee.id, date=today - timedelta(days=i), check_in=time(9, 0),
+            check_out=time(17, 30), hours_worked=8.5, status='present', notes=f'note, {i}'
+        ))
+        db.session.add(Payroll(
+            employee_id=employee.id, pay_period_start=date(2024, 1 + i, 1), pay_period_end=date(2024, 1 + i, 28),
+            basic_salary=1000, allowances=0, overtime_pay=0, gross_salary=1000,
+            total_deductions=0, net_salary=1000, status='paid' if i == 2 else 'processed'
+        ))
+    db.session.commit()
+    return admin.id, [e.id for e in employees]
+
+
+def _export(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, (url, response.status_code)
+    assert response.mimetype == 'text/csv'
+    assert response.is_streamed
+    return list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+
+
+def test_exports_stream_header_and_filtered_rows(app, login):
+    with app.app_context():
+        admin_id, employee_ids = _seed()
+
+    client = login(admin_id)
+
+    rows = _export(client, '/attendance/export')
+    assert rows[0] == ['Employee ID', 'Employee Name', 'Date', 'Check In', 'Check Out',
+                       'Hours Worked', 'Overtime Hours', 'Status', 'Notes']
+    # Newest day first; quoting survives the round trip
+    assert [row[0] for row in rows[1:]] == ['EXP000', 'EXP001', 'EXP002']
+    assert rows[1][1:] == ['Export 0', date.today().isoformat(), '09:00:00', '17:30:00',
+                           '8.5', '0', 'present', 'note, 0']
+    rows = _export(client, f'/attendance/export?employee_id={employee_ids[1]}')
+    assert [row[0] for row in rows[1:]] == ['EXP001']
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    rows = _export(client, f'/attendance/export?date_from={yesterday}')
+    assert [row[0] for row in rows[1:]] == ['EXP000', 'EXP001']
+
+    rows = _export(client, '/employees/export')
+    assert rows[0] == ['Employee ID', 'Name', 'Email', 'Department', 'Job Title', 'Salary', 'Hire Date']
+    assert rows[1] == ['EXP000', 'Export 0', 'export0@test.com', 'Sales', 'Clerk', '1000.00', '2020-01-01']
+    assert len(rows) == 4
+    rows = _export(client, '/employees/export?department=Finance')
+    assert [row[0] for row in rows[1:]] == ['EXP002']
+
+    rows = _export(client, '/payroll/export')
+    assert rows[0] == ['Employee ID', 'Name', 'Pay Period', 'Basic Salary', 'Allowances', 'Gross Salary',
+                       'Total Deductions', 'Net Salary', 'Status']
+    assert sorted(row[0] for row in rows[1:]) == ['EXP000', 'EXP001', 'EXP002']
+    rows = _export(client, '/payroll/export?status=paid')
+    assert rows[1:] == [['EXP002', 'Export 2', '2024-03-01 to 2024-03-28', '1000.00', '0.00',
+                         '1000.00', '0.00', '1000.00', 'paid']]
+    rows = _export(client, '/payroll/export?month=2')
+    assert [row[0] for row in rows[1:]] == ['EXP001']
+
+
+def test_exports_require_admin_or_hr(app, login):
+    from models import User
+
+    with app.app_context():
+        user = User(username='export_employee', email='export_employee@test.com', role='employee', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client = login(user_id)
+    for url in ('/attendance/export', '/employees/export', '/payroll/export'):
+        assert client.get(url).status_code == 302
+
+
+def test_body_is_written_in_batches(app):
+    chunks = list(iter_csv(['n'], range(5), lambda n: [n], batch_size=2))
+    assert chunks == ['n\r\n', '0\r\n1\r\n', '2\r\n3\r\n', '4\r\n']
+
+    from models import Employee
+
+    with app.app_context():
+        _seed()
+    with app.test_request_context():
+        response = stream_csv(
+            db.select(Employee.employee_id).order_by(Employee.id), ['Employee ID'],
+            lambda row: [row.employee_id], 'employees.csv', batch_size=2
+        )
+        assert response.headers['Content-Disposition'] == 'attachment; filename=employees.csv'
+        assert list(response.response) == ['Employee ID\r\n', 'EXP000\r\nEXP001\r\n', 'EXP002\r\n']
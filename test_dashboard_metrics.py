@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared dashboard metrics service
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, datetime, time, timedelta
+import pytest
+from sqlalchemy import event
+
+from app import db
+
+
+@pytest.fixture
+def app(app):
+    # Summaries refresh within each commit, so no rollup worker runs statements mid-test
+    app.config['CLOCK_ROLLUP_MODE'] = 'inline'
+    return app
+
+
+def _seed():
+    from models import User, Employee, Payroll, Attendance
+    today = date.today()
+    period = today - timedelta(days=30)
+    for i, (department, status, attendance_status) in enumerate([
+        ('Engineering', 'processed', 'present'),
+        ('Engineering', 'pending', 'absent'),
+        ('Finance', 'processed', 'present'),
+    ]):
+        user = User(username=f'metrics{i}', email=f'metrics{i}@test.com', role='employee', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        employee = Employee(
+            user_id=user.id, employee_id=f'MET{i:03d}', first_name='Metrics', last_name=str(i),
+            email=f'metrics{i}@test.com', job_title='Tester', department=department,
+            hire_date=today, salary=1000 * (i + 1)
+        )
+        db.session.add(employee)
+        db.session.flush()
+        db.session.add(Payroll(
+            employee_id=employee.id, pay_period_start=period, pay_period_end=period + timedelta(days=27),
+            basic_salary=1000, gross_salary=1100, net_salary=880, status=status
+        ))
+        db.session.add(Attendance(employee_id=employee.id, date=today, check_in=time(9, 0), status=attendance_status))
+    db.session.commit()
+
+
+def test_dashboard_metrics_values_and_statement_count(app):
+    from services.dashboard_metrics import collect_dashboard_metrics
+    
+    with app.app_context():
+        _seed()
+        
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            metrics = collect_dashboard_metrics()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        # Payroll (+users), attendance, departments and trends
+        assert len(statements) == 4
+        
+        assert metrics.total_employees == 3
+        assert metrics.total_users == 3
+        assert metrics.total_payrolls == 3
+        assert metrics.processed_payrolls == 2
+        assert metrics.pending_payrolls == 1
+        assert metrics.total_salary_payout == 1760.0
+        assert (metrics.today_attendance, metrics.today_present, metrics.today_absent) == (3, 2, 1)
+        assert {d.department: d.count for d in metrics.dept_stats} == {'Engineering': 2, 'Finance': 1}
+        assert sum(t.count for t in metrics.monthly_trends) == 2
+        
+        stats = metrics.to_dict()
+        assert stats['dept_stats'][0]['department'] in ('Engineering', 'Finance')
+
+
+def test_metrics_cache_invalidated_by_tracked_commits(app):
+    from models import User, Payroll, Employee
+    from sqlalchemy import insert
+    from services.metrics_cache import cached_dashboard_metrics, get_metrics_cache
+    
+    with app.app_context():
+        _seed()
+        cache = get_metrics_cache()
+        invalidations = cache.invalidations
+        
+        first = cached_dashboard_metrics()
+        assert cached_dashboard_metrics() is first
+        assert (cache.hits, cache.misses) == (1, 1)
+        
+        # Commits that do not change dashboard numbers keep the entry
+        user = User.query.first()
+        user.last_login = date.today()
+        db.session.commit()
+        assert cached_dashboard_metrics() is first
+        
+        # A bulk insert bypassing the unit of work still invalidates
+        employee = Employee.query.first()
+        db.session.execute(insert(Payroll), [{
+            'employee_id': employee.id, 'pay_period_start': date(2020, 1, 1),
+            'pay_period_end': date(2020, 1, 31), 'basic_salary': 1, 'gross_salary': 1,
+            'net_salary': 1, 'status': 'pending'
+        }])
+        db.session.commit()
+        refreshed = cached_dashboard_metrics()
+        assert refreshed is not first
+        assert refreshed.pending_payrolls == first.pending_payrolls + 1
+        assert cache.invalidations == invalidations + 1
+        
+        # Rolled back writes do not invalidate
+        db.session.add(Payroll(
+            employee_id=employee.id, pay_period_start=date(2020, 2, 1), pay_period_end=date(2020, 2, 28),
+            basic_salary=1, gross_salary=1, net_salary=1
+        ))
+        db.session.flush()
+        db.session.rollback()
+        assert cached_dashboard_metrics() is refreshed
+        
+        stats = cache.stats()
+        assert stats['backend'] == 'memory'
+        assert stats['hits'] == 3 and stats['misses'] == 2
+
+
+def test_clock_ins_invalidate_the_metrics_cache(app):
+    from models import User, Employee
+    from services.clock_events import clock_in
+    from services.clock_rollup import _get_executor
+    from services.metrics_cache import cached_dashboard_metrics
+    
+    with app.app_context():
+        _seed()
+        employee_ids = []
+        for code in ('MET100', 'MET101'):
+            user = User(username=code, email=f'{code}@test.com', role='employee', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            employee = Employee(user_id=user.id, employee_id=code, first_name='Clock', last_name=code,
+                                email=f'{code}@test.com', job_title='Tester', department='Finance',
+                                hire_date=date.today(), salary=1000)
+            db.session.add(employee)
+            db.session.flush()
+            employee_ids.append(employee.id)
+        db.session.commit()
+        assert cached_dashboard_metrics().today_attendance == 3
+        
+        # Inline, the day row is a Core upsert in the clock-in's own transaction
+        clock_in(employee_ids[0], datetime.now(), 'web')
+        db.session.commit()
+        assert cached_dashboard_metrics().today_attendance == 4
+        
+        # In the background the rollup's upsert commit invalidates
+        app.config['CLOCK_ROLLUP_MODE'] = 'background'
+        clock_in(employee_ids[1], datetime.now(), 'web')
+        db.session.commit()
+        _get_executor().submit(lambda: None).result()
+        assert cached_dashboard_metrics().today_attendance == 5
+
+
+class _FakeRedis:
+    """The few Redis commands RedisBackend uses, over a dict"""
+    
+    def __init__(self):
+        self.values = {}
+        self.expiries = {}
+    
+    def get(self, key):
+        value = self.values.get(key)
+        return value.encode() if isinstance(value, str) else value
+    
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        self.expiries[key] = ex
+    
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key) or 0) + 1)
+        return int(self.values[key])
+
+
+def test_redis_backend_shares_entries_and_invalidations():
+    from services.metrics_cache import MetricsCache, RedisBackend
+    
+    client = _FakeRedis()
+    # Two workers, one Redis
+    first = MetricsCache(RedisBackend(client=client), ttl=30)
+    second = MetricsCache(RedisBackend(client=client), ttl=30)
+    
+    assert first.get_or_compute('departments', lambda: {'Sales': 2}) == {'Sales': 2}
+    assert client.expiries['erp:metrics:0:departments'] == 30
+    assert second.get_or_compute('departments', lambda: {'Sales': 3}) == {'Sales': 2}
+    assert (second.hits, second.misses) == (1, 0)
+    
+    # One worker's invalidation bumps the generation the other reads under
+    first.invalidate()
+    assert second.get_or_compute('departments', lambda: {'Sales': 3}) == {'Sales': 3}
+    assert first.get_or_compute('departments', lambda: {'Sales': 4}) == {'Sales': 3}
+    assert 'erp:metrics:1:departments' in client.values
+    assert second.stats()['backend'] == 'redis' and second.stats()['entries'] is None
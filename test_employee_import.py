@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Bulk employee import tests
+"""
+
+import sys
+import os
+import io
+import re
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date
+from sqlalchemy import event
+
+from app import db
+from services.metrics_cache import cached_dashboard_metrics
+
+HEADER = 'first_name,last_name,email,job_title,department,hire_date,salary,employee_id\n'
+VALID = ''.join(
+    f'Ada,Lovelace,ada{n}@test.com,Analyst,Research,2024-01-{n + 1:02d},"1,200.50",\n' for n in range(8)
+) + 'Alan,Turing,alan@test.com,Engineer,Research,2024-02-01,3000,CUSTOM01\n'
+INVALID = (
+    'Grace,Hopper,taken@test.com,Admiral,Navy,2024-02-01,3000,\n'
+    'Grace,Hopper,ada0@test.com,Admiral,Navy,2024-02-01,3000,\n'
+    'Grace,Hopper,grace@test,Admiral,Navy,2024-02-01,3000,\n'
+    'Grace,Hopper,grace1@test.com,Admiral,Navy,01/02/2024,3000,\n'
+    'Grace,Hopper,grace2@test.com,Admiral,Navy,2024-02-01,lots,\n'
+    'G,Hopper,grace3@test.com,Admiral,Navy,2024-02-01,3000,\n'
+    'Grace,Hopper,grace4@test.com,,Navy,2024-02-01,3000,\n'
+    'Grace,Hopper,grace5@test.com,Admiral,Navy,2024-02-01,3000,custom01\n'
+    'Grace,Hopper,grace6@test.com,Admiral,Navy,2024-02-01,3000,EXIST01\n'
+)
+
+
+def _upload(client, dry_run, content):
+    return client.post('/employees/import', data={
+        'file': (io.BytesIO(content.encode()), 'employees.csv'), 'dry_run': '1' if dry_run else '0'
+    }, content_type='multipart/form-data')
+
+
+def test_usernames_are_allocated_for_the_batch_at_once(app):
+    from models import User
+    from services.usernames import allocate_usernames
+    
+    with app.app_context():
+        for username in ['ada.lovelace', 'ada.lovelace1', 'ada.lovelace3', 'ada.lovelacex']:
+            db.session.add(User(username=username, email=f'{username}@test.com', password_hash='x'))
+        db.session.commit()
+        
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        usernames = allocate_usernames([('Ada', 'Lovelace')] * 3 + [('Alan', 'Turing'), (' Ada ', 'LOVELACE')])
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        assert usernames == ['ada.lovelace2', 'ada.lovelace4', 'ada.lovelace5', 'alan.turing', 'ada.lovelace6']
+        assert len(statements) == 1
+
+
+def test_employee_sheet_previews_then_provisions_accounts(app, login):
+    from models import User, Employee
+    
+    with app.app_context():
+        admin = User(username='ada.lovelace', email='taken@test.com', role='admin', password_hash='x')
+        db.session.add(admin)
+        db.session.flush()
+        db.session.add(Employee(user_id=admin.id, employee_id='EXIST01', first_name='Ad', last_name='Min',
+                                email='taken@test.com', job_title='Admin', department='Ops',
+                                hire_date=date(2020, 1, 1), salary=1000))
+        db.session.commit()
+        admin_id = admin.id
+    
+    client = login(admin_id)
+    page = _upload(client, True, HEADER + VALID + INVALID).get_data(as_text=True)
+    assert '18 rows' in page and '9 ready to import' in page and '9 with errors' in page
+    for message in ['Email already in use', 'Duplicate email in file', 'Invalid email',
+                    'Invalid hire_date (use YYYY-MM-DD)', 'Invalid salary', 'first_name must be 2-50 characters',
+                    'Missing job_title', 'Duplicate employee_id in file', 'employee_id already in use']:
+        assert message in page
+    assert 'ada.lovelace1' in page and 'ada.lovelace8' in page
+    with app.app_context():
+        assert User.query.count() == 1
+        cached = cached_dashboard_metrics()
+        assert (cached.total_employees, cached.total_users) == (1, 1)
+    
+    # One username prefetch; users and employees go in as one executemany each
+    statements = []
+    with app.app_context():
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        response = _upload(client, False, HEADER + VALID + INVALID)
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 200
+    assert len([s for s in statements if 'users.username LIKE' in s]) == 1
+    assert len([s for s in statements if s.startswith('INSERT INTO users')]) == 1
+    assert len([s for s in statements if s.startswith('INSERT INTO employees')]) == 1
+    
+    credentials = dict(re.findall(r'>([a-z.]+\d*)</td>\s*<td[^>]*><code>([^<]+)</code>', response.get_data(as_text=True)))
+    assert len(credentials) == 9
+    with app.app_context():
+        alan = User.query.filter_by(username='alan.turing').one()
+        assert alan.check_password(credentials['alan.turing'])
+        assert alan.employee.employee_id == 'CUSTOM01'
+        ada = User.query.filter_by(username='ada.lovelace8').one()
+        assert ada.check_password(credentials['ada.lovelace8'])
+        assert (ada.role, float(ada.employee.salary), ada.employee.hire_date) == ('employee', 1200.5, date(2024, 1, 8))
+        assert ada.employee.employee_id.startswith('EMP')
+        assert Employee.query.count() == 10
+        # The Core inserts invalidated the dashboard numbers
+        metrics = cached_dashboard_metrics()
+        assert (metrics.total_employees, metrics.total_users) == (10, 10)
+        assert {d.department: d.count for d in metrics.dept_stats} == {'Ops': 1, 'Research': 9}
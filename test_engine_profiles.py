@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Engine profile and pool metrics tests
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app import db
+from services.engine_profiles import InstrumentedQueuePool, engine_options, pool_stats, profile_for
+
+
+def test_profiles_from_url_and_environment():
+    postgres_url = 'postgresql+psycopg://erp@db/erp'
+    config = {'DB_POOL_SIZE': 3, 'DB_STATEMENT_TIMEOUT_MS': 15000}
+    assert profile_for('sqlite:///payroll_system.db') == 'sqlite'
+    assert profile_for(postgres_url) == 'postgres'
+    assert profile_for(postgres_url, 'pgbouncer') == 'pgbouncer'
+    with pytest.raises(ValueError):
+        profile_for(postgres_url, 'mysql')
+    
+    postgres = engine_options(postgres_url, 'postgres', config)
+    assert (postgres['pool_size'], postgres['pool_pre_ping']) == (3, True)
+    assert postgres['connect_args'] == {'options': '-c statement_timeout=15000'}
+    # Behind PgBouncer: no prepared statements and no startup options
+    assert engine_options(postgres_url, 'pgbouncer', config)['connect_args'] == {'prepare_threshold': None}
+    assert engine_options('sqlite://', 'sqlite', config) == {}
+
+
+def test_sqlite_profile_and_pool_endpoint(app, login):
+    from models import User
+    
+    with app.app_context():
+        assert app.config['DB_PROFILE'] == 'sqlite'
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert db.session.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+        admin = User(username='pool_admin', email='pool_admin@test.com', role='admin', password_hash='x')
+        staff = User(username='pool_staff', email='pool_staff@test.com', role='employee', password_hash='x')
+        db.session.add_all([admin, staff])
+        db.session.commit()
+        admin_id, staff_id = admin.id, staff.id
+        db.session.remove()
+    
+    assert login(staff_id).get('/admin/api/db-pool').status_code == 403
+    
+    stats = login(admin_id).get('/admin/api/db-pool').get_json()
+    assert (stats['profile'], stats['pool']) == ('sqlite', 'InstrumentedQueuePool')
+    # The request's own connection is checked out while it reports
+    assert stats['checked_out'] == 1
+    assert stats['wait']['checkouts'] >= 1 and stats['wait']['timeouts'] == 0
+
+
+def test_pool_records_waits_and_timeouts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool_waits_test.db'}", poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    held = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    stats = pool_stats(engine)
+    assert (stats['checked_out'], stats['overflow']) == (1, 0)
+    assert stats['wait']['checkouts'] == 2 and stats['wait']['timeouts'] == 1
+    assert stats['wait']['max_ms'] >= 50
+    held.close()
+    engine.dispose()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Identity cache tests
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date
+from sqlalchemy import event
+
+from app import db
+from services.identity_cache import CachedUser, get_identity_cache, load_identity
+
+
+def _identity_statements(app, client, url):
+    """Status code and the statements that read users or employees while serving ``url``"""
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(url)
+        response.get_data()
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    return response.status_code, [s for s in statements if 'FROM users' in s or 'FROM employees' in s]
+
+
+def test_identity_is_cached_until_the_user_or_employee_changes(app, login):
+    from models import User, Employee
+    
+    with app.app_context():
+        user = User(username='ident', email='ident@test.com', role='employee', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        employee = Employee(user_id=user.id, employee_id='IDN001', first_name='Ida', last_name='Dent',
+                            email='ident@test.com', job_title='Clerk', department='Ops',
+                            hire_date=date(2020, 1, 1), salary=1000)
+        db.session.add(employee)
+        db.session.commit()
+        user_id, employee_id = user.id, employee.id
+    
+    client = login(user_id)
+    
+    # The first request loads the snapshot in one query; later ones issue none
+    status, statements = _identity_statements(app, client, '/attendance/status')
+    assert (status, len(statements)) == (200, 1)
+    status, statements = _identity_statements(app, client, '/attendance/status')
+    assert (status, statements) == (200, [])
+    status, statements = _identity_statements(app, client, '/attendance/')
+    assert (status, statements) == (200, [])
+    assert 'Welcome, Ida' in client.get('/attendance/').get_data(as_text=True)
+    
+    with app.app_context():
+        identity = load_identity(user_id)
+        assert isinstance(identity, CachedUser)
+        assert (identity.role, identity.employee_id, identity.department, identity.is_active) == (
+            'employee', employee_id, 'Ops', True
+        )
+        assert not hasattr(identity.identity, '__dict__')
+        # Anything outside the snapshot comes from the row
+        assert identity.last_login is None
+        assert identity.employee.employee_id == 'IDN001'
+        
+        # Commits touching the user or their employee evict the snapshot
+        db.session.get(Employee, employee_id).first_name = 'Idabel'
+        db.session.commit()
+        assert load_identity(user_id).display_name == 'Idabel'
+        db.session.get(User, user_id).role = 'hr'
+        db.session.commit()
+        assert load_identity(user_id).role == 'hr'
+        
+        # A bulk update clears the whole cache
+        load_identity(user_id)
+        assert get_identity_cache().stats()['entries'] == 1
+        User.query.filter_by(id=user_id).update({'is_active': False})
+        db.session.commit()
+        assert get_identity_cache().stats()['entries'] == 0
+        assert load_identity(user_id).is_active is False
+        
+        db.session.delete(db.session.get(Employee, employee_id))
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+        assert load_identity(user_id) is None
+
+
+def test_admin_rights_are_confirmed_against_the_row(app, login):
+    from models import User
+    
+    with app.app_context():
+        admin = User(username='boss', email='boss@test.com', role='admin', password_hash='x')
+        staff = User(username='staff', email='staff@test.com', role='employee', password_hash='x')
+        db.session.add_all([admin, staff])
+        db.session.commit()
+        admin_id, staff_id = admin.id, staff.id
+    
+    admin_client, staff_client = login(admin_id), login(staff_id)
+    assert admin_client.get('/admin/users').status_code == 200
+    staff_client.get('/attendance/status')
+    
+    # Another worker demotes the admin: no commit hook runs here, so the snapshot stays cached
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(User.__table__.update().where(User.id == admin_id).values(role='employee'))
+        assert get_identity_cache().get(admin_id).role == 'admin'
+    assert admin_client.get('/admin/users').status_code == 302
+    
+    # Employee snapshots are used as they are
+    assert _identity_statements(app, staff_client, '/attendance/status')[1] == []
+    
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(User.__table__.delete().where(User.id == admin_id))
+        identity = CachedUser(get_identity_cache().get(admin_id))
+        assert (identity.role, identity.is_active) == (None, False)
+
+
+def test_profile_update_writes_through_the_cached_user(app, login):
+    from models import User, Employee
+    
+    with app.app_context():
+        user = User(username='profile', email='profile@test.com', role='employee', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Employee(user_id=user.id, employee_id='PRF001', first_name='Pro', last_name='File',
+                                email='profile@test.com', job_title='Clerk', department='Ops',
+                                hire_date=date(2020, 1, 1), salary=1000))
+        db.session.commit()
+        user_id = user.id
+    
+    client = login(user_id)
+    client.get('/attendance/status')
+    
+    response = client.post('/auth/update_profile', json={'email': 'new@test.com', 'first_name': 'Proto'})
+    assert response.get_json() == {'success': True, 'message': 'Profile updated successfully'}
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert (user.email, user.employee.first_name) == ('new@test.com', 'Proto')
+        # The commit evicted the old snapshot
+        identity = load_identity(user_id)
+        assert (identity.email, identity.display_name) == ('new@test.com', 'Proto')
+        
+        # Reads follow writes within a request; snapshot-only fields stay read-only
+        identity.email = 'newer@test.com'
+        assert identity.email == 'newer@test.com'
+        try:
+            identity.department = 'Sales'
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError('department was set on the cached user')
+        db.session.rollback()
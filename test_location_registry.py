@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Office location registry tests
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date
+from sqlalchemy import event
+
+from app import db
+from services.qr_tokens import issue_token
+
+
+def test_scan_uses_registry_and_manage_locations_invalidates(app, login):
+    from models import User, Employee, OfficeLocation
+    
+    with app.app_context():
+        admin = User(username='loc_admin', email='loc_admin@test.com', role='admin', password_hash='x')
+        worker = User(username='loc_worker', email='loc_worker@test.com', role='employee', password_hash='x')
+        db.session.add_all([admin, worker])
+        db.session.flush()
+        db.session.add(Employee(
+            user_id=worker.id, employee_id='LOC001', first_name='Loc', last_name='Worker',
+            email='loc_worker@test.com', job_title='Clerk', department='Ops', hire_date=date(2020, 1, 1), salary=1000
+        ))
+        location = OfficeLocation(name='HQ', address='1 Main St', radius_meters=100)
+        db.session.add(location)
+        db.session.commit()
+        admin_id, worker_id, location_id = admin.id, worker.id, str(location.id)
+        engine = db.engine
+    
+    registry = app.extensions['location_registry']
+    admin_client = login(admin_id)
+    worker_client = login(worker_id)
+    
+    assert admin_client.get('/qr-attendance/locations').get_json()['locations'][location_id]['name'] == 'HQ'
+    loads = registry.loads
+    
+    with app.app_context():
+        qr_data = issue_token(location_id).token
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    response = worker_client.post('/qr-attendance/scan', json={'qr_data': qr_data})
+    event.remove(engine, 'before_cursor_execute', listener)
+    
+    assert response.get_json()['success'] is True, response.get_json()
+    assert not [s for s in statements if 'office_locations' in s]
+    assert registry.loads == loads
+    
+    # Creating and deactivating locations refreshes the registry
+    admin_client.post('/qr-attendance/locations/manage', data={'action': 'create', 'name': 'Annex', 'address': '2 Side St'})
+    names = {loc['name'] for loc in admin_client.get('/qr-attendance/locations').get_json()['locations'].values()}
+    assert names == {'HQ', 'Annex'}
+    
+    admin_client.post('/qr-attendance/locations/manage', data={'action': 'deactivate', 'id': location_id})
+    locations = admin_client.get('/qr-attendance/locations').get_json()['locations']
+    assert location_id not in locations
+    
+    response = worker_client.post('/qr-attendance/scan', json={'qr_data': qr_data})
+    assert response.status_code == 400
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Migrations for the hot path indexes and natural-key unique constraints
+
+Upgrading an empty database must produce the indexes and constraints the
+models declare. Duplicate attendance rows are removed, keeping the first,
+and each removal is logged; duplicate payroll rows stop the upgrade. Clock
+events logged twice for one timestamp are removed the same way. Databases
+created with db.create_all() are stamped at the baseline, then upgraded.
+"""
+
+import sys
+import os
+import logging
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import flask_migrate
+import pytest
+from sqlalchemy import exc, inspect, text
+
+from app import db
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+BEFORE_INDEXES = '5f0c2a9d7e41'
+INDEXES = '9a3e6b1c2d57'
+BEFORE_EVENT_KEY = 'b2d6f8a1c3e5'
+EVENT_KEY = 'd3f9a2b7e6c1'
+TABLES = ('attendances', 'payrolls', 'employees', 'clock_events')
+
+
+class _Records(logging.Filter):
+    """Collects a logger's messages; a filter, since env.py's fileConfig replaces the handlers"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def filter(self, record):
+        self.messages.append(record.getMessage())
+        return True
+
+
+@pytest.fixture
+def app(app):
+    # The migrations build the schema themselves
+    with app.app_context():
+        db.drop_all()
+    return app
+
+
+def _schema(engine):
+    inspector = inspect(engine)
+    return {
+        table: (
+            {index['name'] for index in inspector.get_indexes(table)},
+            {constraint['name'] for constraint in inspector.get_unique_constraints(table)}
+        )
+        for table in TABLES if inspector.has_table(table)
+    }
+
+
+def _seed(connection, attendance_rows, payroll_rows):
+    connection.execute(text(
+        "INSERT INTO users (id, username, email, password_hash, role) VALUES (1, 'mig', 'mig@test.com', 'x', 'employee')"
+    ))
+    connection.execute(text(
+        "INSERT INTO employees (id, user_id, employee_id, first_name, last_name, email, job_title, department, "
+        "hire_date, salary) VALUES (1, 1, 'MIG001', 'Mig', 'Ration', 'mig@test.com', 'Clerk', 'Ops', '2024-01-01', 1000)"
+    ))
+    for row_id, day, status in attendance_rows:
+        connection.execute(text(
+            "INSERT INTO attendances (id, employee_id, date, status) VALUES (:id, 1, :day, :status)"
+        ), {'id': row_id, 'day': day, 'status': status})
+    for row_id in payroll_rows:
+        connection.execute(text(
+            "INSERT INTO payrolls (id, employee_id, pay_period_start, pay_period_end, basic_salary, gross_salary, "
+            "net_salary) VALUES (:id, 1, '2024-01-01', '2024-01-31', 1000, 1000, 1000)"
+        ), {'id': row_id})
+
+
+def test_upgrade_creates_the_model_indexes_and_constraints(app):
+    with app.app_context():
+        flask_migrate.upgrade(directory=MIGRATIONS)
+        migrated = _schema(db.engine)
+        expected = {}
+        for table in TABLES:
+            model_table = db.metadata.tables[table]
+            expected[table] = (
+                {index.name for index in model_table.indexes},
+                {constraint.name for constraint in model_table.constraints
+                 if constraint.name and constraint.name.startswith('uq_')}
+            )
+        for table in TABLES:
+            assert expected[table][0] <= migrated[table][0], (table, expected[table][0] - migrated[table][0])
+            assert expected[table][1] <= migrated[table][1], (table, expected[table][1] - migrated[table][1])
+        assert 'uq_attendances_employee_date' in migrated['attendances'][1]
+        assert 'uq_payrolls_employee_period' in migrated['payrolls'][1]
+
+        flask_migrate.downgrade(directory=MIGRATIONS, revision=BEFORE_INDEXES)
+        indexes, constraints = _schema(db.engine)['attendances']
+        assert 'ix_attendances_date_status' not in indexes
+        assert 'uq_attendances_employee_date' not in constraints
+
+
+def test_duplicate_attendance_rows_are_logged_and_removed(app):
+    with app.app_context():
+        flask_migrate.upgrade(directory=MIGRATIONS, revision=BEFORE_INDEXES)
+        with db.engine.begin() as connection:
+            _seed(connection, [(1, '2024-01-02', 'present'), (2, '2024-01-02', 'late'),
+                               (3, '2024-01-02', 'late'), (4, '2024-01-03', 'present')], [1])
+
+        records = _Records()
+        logger = logging.getLogger('alembic.runtime.migration')
+        logger.addFilter(records)
+        try:
+            flask_migrate.upgrade(directory=MIGRATIONS, revision=INDEXES)
+        finally:
+            logger.removeFilter(records)
+
+        with db.engine.connect() as connection:
+            assert connection.execute(text('SELECT id FROM attendances ORDER BY id')).scalars().all() == [1, 4]
+        removed = [message for message in records.messages if message.startswith('Removing duplicate attendance')]
+        assert len(removed) == 2
+        assert 'id=2 ' in removed[0] and 'id=3 ' in removed[1]
+        assert 'Removed 2 duplicate attendance rows before adding uq_attendances_employee_date' in records.messages
+
+        # The constraint now holds
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(text(
+                    "INSERT INTO attendances (employee_id, date, status) VALUES (1, '2024-01-03', 'late')"
+                ))
+        except exc.IntegrityError:
+            pass
+        else:
+            raise AssertionError('duplicate attendance row was accepted')
+
+
+def test_duplicate_payroll_rows_stop_the_upgrade(app):
+    with app.app_context():
+        flask_migrate.upgrade(directory=MIGRATIONS, revision=BEFORE_INDEXES)
+        with db.engine.begin() as connection:
+            _seed(connection, [(1, '2024-01-02', 'present'), (2, '2024-01-02', 'late')], [1, 2])
+
+        # Flask-Migrate logs the migration's RuntimeError and exits
+        records = _Records()
+        logger = logging.getLogger('flask_migrate')
+        logger.addFilter(records)
+        try:
+            flask_migrate.upgrade(directory=MIGRATIONS, revision=INDEXES)
+        except SystemExit:
+            pass
+        else:
+            raise AssertionError('upgrade accepted duplicate payroll rows')
+        finally:
+            logger.removeFilter(records)
+        assert any('1 employee pay periods have more than one payroll row' in message for message in records.messages)
+
+        # Nothing was removed or altered
+        with db.engine.connect() as connection:
+            assert connection.execute(text('SELECT COUNT(*) FROM attendances')).scalar() == 2
+            assert connection.execute(text('SELECT version_num FROM alembic_version')).scalar() == BEFORE_INDEXES
+
+
+def test_duplicate_clock_events_are_logged_and_removed(app):
+    with app.app_context():
+        flask_migrate.upgrade(directory=MIGRATIONS, revision=BEFORE_EVENT_KEY)
+        with db.engine.begin() as connection:
+            _seed(connection, [], [])
+            for row_id, ts in [(1, '2024-01-02 09:00:00'), (2, '2024-01-02 09:00:00'), (3, '2024-01-02 17:00:00')]:
+                connection.execute(text(
+                    "INSERT INTO clock_events (id, employee_id, day, ts, kind, source) "
+                    "VALUES (:id, 1, '2024-01-02', :ts, 'in', 'qr')"
+                ), {'id': row_id, 'ts': ts})
+
+        records = _Records()
+        logger = logging.getLogger('alembic.runtime.migration')
+        logger.addFilter(records)
+        try:
+            flask_migrate.upgrade(directory=MIGRATIONS, revision=EVENT_KEY)
+        finally:
+            logger.removeFilter(records)
+
+        with db.engine.connect() as connection:
+            assert connection.execute(text('SELECT id FROM clock_events ORDER BY id')).scalars().all() == [1, 3]
+        removed = [message for message in records.messages if message.startswith('Removing duplicate clock event')]
+        assert len(removed) == 1 and 'id=2 ' in removed[0]
+        assert 'Removed 1 duplicate clock events before adding uq_clock_events_employee_ts' in records.messages
+
+
+def test_create_all_databases_are_stamped_then_upgraded(app):
+    from services.schema import BASELINE_REVISION, stamp_baseline
+
+    with app.app_context():
+        assert not stamp_baseline(directory=MIGRATIONS)
+        # What db.create_all() left behind before the migrations: the baseline tables, no version
+        flask_migrate.upgrade(directory=MIGRATIONS, revision=BASELINE_REVISION)
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP TABLE alembic_version'))
+            _seed(connection, [(1, '2024-01-02', 'present')], [])
+
+        assert stamp_baseline(directory=MIGRATIONS)
+        assert not stamp_baseline(directory=MIGRATIONS)
+        flask_migrate.upgrade(directory=MIGRATIONS)
+        with db.engine.connect() as connection:
+            assert connection.execute(text('SELECT source FROM attendances')).scalars().all() == [None]
+        assert 'pending_summary_days' in inspect(db.engine).get_table_names()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Keyset pagination tests
+"""
+
+import sys
+import os
+import base64
+import json
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, datetime, time, timedelta
+
+from app import db
+from services.pagination import encode_cursor, decode_cursor, InvalidCursor, MAX_PAGE_SIZE
+
+
+def _seed(payroll_count, attendance_days):
+    from models import User, Employee, Payroll, Attendance
+    admin = User(username='pager_admin', email='pager_admin@test.com', role='admin', password_hash='x')
+    worker = User(username='pager_worker', email='page@test.com', role='employee', password_hash='x')
+    db.session.add_all([admin, worker])
+    db.session.flush()
+    employee = Employee(
+        user_id=worker.id, employee_id='PAGE001', first_name='Page', last_name='Walker', email='page@test.com',
+        job_title='Tester', department='Testing', hire_date=date(2020, 1, 1), salary=1000
+    )
+    db.session.add(employee)
+    db.session.flush()
+    
+    # Pairs of rows share a created_at so the id tie-breaker is exercised
+    stamp = datetime(2024, 1, 1, 12, 0)
+    for i in range(payroll_count):
+        start = date(2020, 1, 1) + timedelta(days=7 * i)
+        db.session.add(Payroll(
+            employee_id=employee.id, pay_period_start=start, pay_period_end=start + timedelta(days=6),
+            basic_salary=1000, allowances=0, overtime_pay=0, gross_salary=1000,
+            total_deductions=0, net_salary=1000, status='processed',
+            created_at=stamp + timedelta(minutes=i // 2)
+        ))
+    for day in range(attendance_days):
+        db.session.add(Attendance(
+            employee_id=employee.id, date=date(2024, 1, 1) + timedelta(days=day),
+            check_in=time(9, 0), status='present'
+        ))
+    db.session.commit()
+    return admin.id
+
+
+def test_cursor_round_trip():
+    values = [datetime(2024, 5, 1, 8, 30, 15), date(2024, 5, 1), 42, 'Ada']
+    assert decode_cursor(encode_cursor('n', values)) == ('n', values)
+    for token in ['', 'not-a-cursor', encode_cursor('x', [1])]:
+        try:
+            decode_cursor(token)
+            assert False, f'{token!r} should be rejected'
+        except InvalidCursor:
+            pass
+
+
+def test_api_payrolls_walk_forward_and_back(app, login):
+    from models import Payroll
+    
+    with app.app_context():
+        admin_id = _seed(payroll_count=11, attendance_days=0)
+        expected = [p.id for p in Payroll.query.order_by(Payroll.created_at.desc(), Payroll.id.desc())]
+    client = login(admin_id)
+    
+    pages = []
+    cursor = ''
+    while True:
+        data = client.get(f'/api/payrolls?per_page=4&cursor={cursor}').get_json()
+        pages.append([p['id'] for p in data['payrolls']])
+        assert 'total' not in data
+        assert data['has_prev'] == (len(pages) > 1)
+        if not data['has_next']:
+            break
+        cursor = data['next_cursor']
+    
+    assert [len(page) for page in pages] == [4, 4, 3]
+    assert sum(pages, []) == expected
+    
+    # Walk back from the last page
+    cursor = data['prev_cursor']
+    for page in reversed(pages[:-1]):
+        data = client.get(f'/api/payrolls?per_page=4&cursor={cursor}').get_json()
+        assert [p['id'] for p in data['payrolls']] == page
+        cursor = data['prev_cursor']
+    assert data['has_prev'] is False and cursor is None
+    
+    data = client.get('/api/payrolls?per_page=1000000&count=exact').get_json()
+    assert data['per_page'] == MAX_PAGE_SIZE
+    assert data['total'] == 11
+    assert client.get('/api/payrolls?cursor=bogus').status_code == 400
+    
+    # Well-formed cursors whose values do not fit the key columns are rejected before the query
+    for values in (['2024-01-01', 1], [{'d': '2024-01-01'}, 1], [{'dt': '2024-01-01T12:00:00'}, '1'],
+                   [{'dt': '2024-01-01T12:00:00'}, True], [{'dt': '2024-01-01T12:00:00'}, 2 ** 70],
+                   [{'dt': '2024-01-01T12:00:00'}, None], [{'dt': '2024-01-01T12:00:00'}, [1]]):
+        token = base64.urlsafe_b64encode(json.dumps(['n', values]).encode()).decode().rstrip('=')
+        response = client.get(f'/api/payrolls?cursor={token}')
+        assert response.status_code == 400, values
+        assert response.get_json() == {'error': 'Invalid cursor'}
+
+
+def test_attendance_list_pages_by_cursor(app, login):
+    with app.app_context():
+        admin_id = _seed(payroll_count=0, attendance_days=45)
+    client = login(admin_id)
+    
+    first = client.get('/attendance/')
+    assert first.status_code == 200
+    assert b'Jan 26, 2024' in first.data and b'Jan 25, 2024' not in first.data
+    
+    with app.test_request_context():
+        from models import Attendance
+        last_on_first_page = Attendance.query.filter_by(date=date(2024, 1, 26)).one()
+        cursor = encode_cursor('n', [date(2024, 1, 26), last_on_first_page.id])
+    second = client.get(f'/attendance/?cursor={cursor}')
+    assert b'Jan 25, 2024' in second.data and b'Jan 26, 2024' not in second.data
+    
+    assert client.get('/attendance/?cursor=bogus').status_code == 302
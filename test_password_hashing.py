@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Password hashing service tests
+"""
+
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from app import db
+from services import password_hashing
+
+
+@pytest.fixture
+def app(app):
+    app.config['PASSWORD_HASH_WORKERS'] = 1
+    app.config['PASSWORD_HASH_ROLE_METHODS'] = {'employee': 'pbkdf2:sha256:1000'}
+    return app
+
+
+def _sign_in(client, email, password):
+    return client.post('/auth/login', data={'email': email, 'password': password})
+
+
+def test_role_costs_rehash_on_login_and_timings(app, client):
+    from models import User
+    
+    with app.app_context():
+        admin = User(username='hash_admin', email='admin@test.com', role='admin')
+        admin.set_password('admin-pass')
+        staff = User(username='hash_staff', email='staff@test.com', role='employee')
+        staff.set_password('staff-pass')
+        db.session.add_all([admin, staff])
+        db.session.commit()
+        assert admin.password_hash.startswith('scrypt:32768:8:1$')
+        assert staff.password_hash.startswith('pbkdf2:sha256:1000$')
+        assert not staff.password_needs_rehash()
+        password_hashing._timings.clear()
+    
+    assert _sign_in(client, 'staff@test.com', 'wrong').status_code == 200
+    assert _sign_in(client, 'staff@test.com', 'staff-pass').status_code == 302
+    client.get('/auth/logout')
+    
+    # Raising the employee cost rehashes on the next successful login
+    app.config['PASSWORD_HASH_ROLE_METHODS'] = {'employee': 'pbkdf2:sha256:2000'}
+    with app.app_context():
+        assert User.query.filter_by(username='hash_staff').one().password_needs_rehash()
+    assert _sign_in(client, 'staff@test.com', 'staff-pass').status_code == 302
+    client.get('/auth/logout')
+    with app.app_context():
+        staff = User.query.filter_by(username='hash_staff').one()
+        assert staff.password_hash.startswith('pbkdf2:sha256:2000$')
+        assert staff.check_password('staff-pass')
+        assert staff.last_login is not None
+    
+    # The pool is bounded: with no free slot a login is turned away, not queued
+    with app.app_context():
+        password_hashing.get_hash_pool()
+    slots = password_hashing._verify_slots
+    password_hashing._verify_slots = threading.BoundedSemaphore(1)
+    password_hashing._verify_slots.acquire()
+    app.config['PASSWORD_VERIFY_TIMEOUT'] = 0.01
+    try:
+        response = _sign_in(client, 'admin@test.com', 'admin-pass')
+        assert response.status_code == 503
+        assert 'Too many sign-ins' in response.get_data(as_text=True)
+    finally:
+        password_hashing._verify_slots = slots
+    
+    assert _sign_in(client, 'admin@test.com', 'admin-pass').status_code == 302
+    stats = client.get('/admin/api/password-hashing').get_json()
+    assert stats['role_methods'] == {'employee': 'pbkdf2:sha256:2000'}
+    assert stats['timings']['verify']['count'] == 5
+    assert stats['timings']['verify_rejected']['count'] == 1
+    assert 0 < stats['timings']['verify']['p50_ms'] <= stats['timings']['verify']['p99_ms']
+    assert stats['timings']['hash']['count'] == 1
+    
+    # Changing the password checks the current one on the same bounded pool
+    password_hashing._verify_slots = threading.BoundedSemaphore(1)
+    password_hashing._verify_slots.acquire()
+    try:
+        response = client.post('/auth/change_password', json={
+            'current_password': 'admin-pass', 'new_password': 'admin-pass-2', 'confirm_password': 'admin-pass-2'
+        })
+        assert response.status_code == 503
+        assert response.get_json()['success'] is False
+    finally:
+        password_hashing._verify_slots = slots
+
+
+def test_batch_hashing_uses_role_method(app):
+    from werkzeug.security import check_password_hash
+    
+    # Logins verify inline, batches still go to the pool
+    app.config['PASSWORD_HASH_WORKERS'] = 0
+    app.config['PASSWORD_BATCH_WORKERS'] = 2
+    password_hashing._timings.clear()
+    with app.app_context():
+        hashes = password_hashing.hash_passwords([f'pass{n}' for n in range(10)], role='employee')
+        stats = password_hashing.hashing_stats()
+    assert all(h.startswith('pbkdf2:sha256:1000$') for h in hashes)
+    assert all(check_password_hash(h, f'pass{n}') for n, h in enumerate(hashes))
+    assert stats['pool_started'] and stats['batch_workers'] == 2
+    assert stats['timings']['hash_batch']['count'] == 1 and 'hash' not in stats['timings']
+    
+    app.config['PASSWORD_BATCH_WORKERS'] = 0
+    with app.app_context():
+        password_hashing.hash_passwords([f'pass{n}' for n in range(10)], role='employee')
+        assert password_hashing.hashing_stats()['timings']['hash']['count'] == 10
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests for the set-based bulk payroll engine
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import event
+
+from app import db
+
+
+def _add_employee(code, salary):
+    from models import User, Employee
+    user = User(username=code.lower(), email=f'{code.lower()}@test.com', role='employee')
+    user.password_hash = 'x'
+    db.session.add(user)
+    db.session.flush()
+    employee = Employee(
+        user_id=user.id,
+        employee_id=code,
+        first_name='Bulk',
+        last_name=code,
+        email=f'{code.lower()}@test.com',
+        job_title='Tester',
+        department='Testing',
+        hire_date=date.today(),
+        salary=salary
+    )
+    db.session.add(employee)
+    db.session.flush()
+    return employee
+
+
+def test_calculate_payroll():
+    from services.payroll_engine import calculate_payroll
+    
+    result = calculate_payroll(Decimal('1000.00'))
+    assert result['allowances'] == Decimal('100.00')
+    assert result['gross_salary'] == Decimal('1100.00')
+    assert result['tax_deduction'] == Decimal('165.00')
+    assert result['pension_deduction'] == Decimal('55.00')
+    assert result['net_salary'] == Decimal('880.00')
+
+
+def test_bulk_payroll_skips_and_query_count(app):
+    from models import Payroll
+    from services.payroll_engine import run_bulk_payroll, SKIP_EXISTS, SKIP_NOT_FOUND, SKIP_INVALID_ID
+    
+    with app.app_context():
+        employees = [_add_employee(f'BULK{i:03d}', 1000 + i) for i in range(25)]
+        start, end = date(2024, 1, 1), date(2024, 1, 31)
+        db.session.add(Payroll(
+            employee_id=employees[0].id, pay_period_start=start, pay_period_end=end,
+            basic_salary=1000, gross_salary=1100, net_salary=880
+        ))
+        db.session.commit()
+        
+        employee_ids = [e.id for e in employees]
+        ids = employee_ids + [99999, 'abc', employee_ids[1]]
+        
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            result = run_bulk_payroll(ids, start, end, processed_by=None)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        assert result['processed'] == 24
+        reasons = {s['employee_id']: s['reason'] for s in result['skipped']}
+        assert reasons == {employee_ids[0]: SKIP_EXISTS, 99999: SKIP_NOT_FOUND, 'abc': SKIP_INVALID_ID}
+        assert 'elapsed_ms' in result
+        
+        # Two lookups plus one batched insert, independent of batch size, and one recompute of the month's summary
+        assert len([s for s in statements if s.lstrip().upper().startswith('SELECT')]) == 3
+        assert len([s for s in statements if s.lstrip().upper().startswith('INSERT INTO PAYROLLS')]) <= 1
+        assert len([s for s in statements if s.lstrip().upper().startswith('INSERT INTO PAYROLL_MONTHLY_SUMMARIES')]) == 1
+        
+        assert Payroll.query.filter_by(pay_period_start=start).count() == 25
+
+
+def test_payroll_run_resumes_from_last_chunk(app):
+    from models import Payroll, PayrollRun
+    from services import payroll_runs
+    
+    with app.app_context():
+        employee_ids = [_add_employee(f'RUN{i:03d}', 2000 + i).id for i in range(10)]
+        db.session.commit()
+        start, end = date(2024, 2, 1), date(2024, 2, 29)
+        
+        run = payroll_runs.create_payroll_run(employee_ids, start, end, created_by=None, chunk_size=3)
+        assert run.total_chunks == 4
+        
+        # Fail on the third chunk, as if the worker crashed mid-run
+        original = payroll_runs._process_chunk
+        def crashing_chunk(run, chunk_index, claimed_at):
+            if chunk_index == 2:
+                raise RuntimeError('worker crashed')
+            return original(run, chunk_index, claimed_at)
+        payroll_runs._process_chunk = crashing_chunk
+        try:
+            run = payroll_runs.execute_payroll_run(run.id)
+        finally:
+            payroll_runs._process_chunk = original
+        
+        assert run.status == 'failed'
+        assert run.chunks_completed == 2
+        assert run.processed_count == 6
+        assert Payroll.query.filter_by(pay_period_start=start).count() == 6
+        
+        # Resuming through the worker pool picks up at chunk 2
+        future = payroll_runs.submit_payroll_run(run.id)
+        future.result(timeout=30)
+        
+        db.session.expire_all()
+        run = db.session.get(PayrollRun, run.id)
+        assert run.status == 'completed'
+        assert run.chunks_completed == 4
+        assert run.processed_count == 10
+        assert run.skipped_count == 0
+        assert len(run.errors) == 1
+        assert Payroll.query.filter_by(pay_period_start=start).count() == 10
+
+
+def test_running_runs_are_only_taken_over_once_their_lease_is_stale(app):
+    from models import Payroll, PayrollRun
+    from services import payroll_runs
+    
+    with app.app_context():
+        employee_ids = [_add_employee(f'LSE{i:03d}', 2000 + i).id for i in range(6)]
+        db.session.commit()
+        start, end = date(2024, 3, 1), date(2024, 3, 31)
+        run = payroll_runs.create_payroll_run(employee_ids, start, end, created_by=None, chunk_size=2)
+        run_id = run.id
+        
+        # A worker holds the run: nobody else can claim or resume it
+        claimed_at = payroll_runs.claim_payroll_run(run_id)
+        assert claimed_at is not None
+        assert payroll_runs.claim_payroll_run(run_id) is None
+        assert payroll_runs.execute_payroll_run(run_id) is None
+        assert payroll_runs.resume_interrupted_runs() == []
+        
+        # Once the lease is older than PAYROLL_RUN_LEASE the run is resumed here
+        stale = datetime.utcnow() - timedelta(seconds=app.config['PAYROLL_RUN_LEASE'] + 1)
+        db.session.get(PayrollRun, run_id).claimed_at = stale
+        db.session.commit()
+        
+        # The old worker wakes up mid-run after the takeover: its chunk is rolled back
+        original = payroll_runs._process_chunk
+        def overtaken_chunk(run, chunk_index, claimed_at):
+            if chunk_index == 1:
+                db.session.get(PayrollRun, run_id).claimed_at = datetime.utcnow()
+                db.session.commit()
+            return original(run, chunk_index, claimed_at)
+        payroll_runs._process_chunk = overtaken_chunk
+        try:
+            assert [r.id for r in payroll_runs.resume_interrupted_runs()] == []
+        finally:
+            payroll_runs._process_chunk = original
+        
+        run = db.session.get(PayrollRun, run_id)
+        assert (run.status, run.chunks_completed) == ('running', 1)
+        assert Payroll.query.filter_by(pay_period_start=start).count() == 2
+        
+        run.claimed_at = stale
+        db.session.commit()
+        resumed = payroll_runs.resume_interrupted_runs()
+        assert [(r.id, r.status, r.chunks_completed) for r in resumed] == [(run_id, 'completed', 3)]
+        assert Payroll.query.filter_by(pay_period_start=start).count() == 6
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Payroll report aggregate tests
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import event
+
+from app import db
+
+
+def test_payroll_report_rollups_are_exact(app):
+    from models import User, Employee, Payroll
+    from services.payroll_reports import payroll_report
+    
+    with app.app_context():
+        employees = []
+        for i, department in enumerate(['Finance', 'Finance', 'Sales']):
+            user = User(username=f'report{i}', email=f'report{i}@test.com', role='employee', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            employee = Employee(
+                user_id=user.id, employee_id=f'REP{i:03d}', first_name='Report', last_name=str(i),
+                email=f'report{i}@test.com', job_title='Clerk', department=department,
+                hire_date=date(2020, 1, 1), salary=1000
+            )
+            db.session.add(employee)
+            employees.append(employee)
+        db.session.flush()
+        
+        # Cent amounts that do not add up exactly in binary floating point
+        periods = [(date(2024, 1, 1), date(2024, 1, 31)), (date(2024, 2, 1), date(2024, 2, 29))]
+        for start, end in periods:
+            for i, employee in enumerate(employees):
+                db.session.add(Payroll(
+                    employee_id=employee.id, pay_period_start=start, pay_period_end=end,
+                    basic_salary=Decimal('1000.10'), allowances=0, overtime_pay=0,
+                    gross_salary=Decimal('1000.10'), total_deductions=Decimal('100.20'),
+                    net_salary=Decimal('899.90'), status='pending' if i == 2 else 'processed'
+                ))
+        # Outside the report range
+        db.session.add(Payroll(
+            employee_id=employees[0].id, pay_period_start=date(2023, 12, 1), pay_period_end=date(2023, 12, 31),
+            basic_salary=5000, allowances=0, overtime_pay=0, gross_salary=5000,
+            total_deductions=0, net_salary=5000, status='processed'
+        ))
+        db.session.commit()
+        
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        report = payroll_report(date(2024, 1, 1), date(2024, 2, 29))
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        
+        assert len(statements) == 1
+        assert report.totals.payrolls == 6
+        assert report.totals.gross == Decimal('6000.60')
+        assert report.totals.deductions == Decimal('601.20')
+        assert report.totals.net == Decimal('5399.40')
+        
+        by_department = dict(report.by_department)
+        assert by_department['Finance'].payrolls == 4
+        assert by_department['Finance'].net == Decimal('3599.60')
+        assert by_department['Sales'].net == Decimal('1799.80')
+        assert [label for label, _ in report.by_month] == ['2024-01', '2024-02']
+        assert dict(report.by_status)['pending'].payrolls == 2
+        
+        finance_only = payroll_report(date(2024, 1, 1), date(2024, 2, 29), 'Finance')
+        assert finance_only.totals.gross == Decimal('4000.40')
+        assert [name for name, _ in finance_only.by_department] == ['Finance']
+        
+        empty = payroll_report(date(2030, 1, 1), date(2030, 12, 31))
+        assert empty.totals.payrolls == 0 and empty.totals.net == Decimal('0.00')
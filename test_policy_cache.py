@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Office hours / attendance policy cache tests
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, datetime, time
+from sqlalchemy import event
+
+from app import db
+
+
+def test_policy_snapshots_reload_only_after_tracked_commits(app):
+    from models import User, Employee, OfficeHours, AttendancePolicy
+    from services.policy_cache import get_policy_config
+    from services.clock_events import scan
+    
+    with app.app_context():
+        db.session.add(OfficeHours(
+            name='Standard', official_clock_in=time(9, 0), official_clock_out=time(17, 0),
+            clock_in_grace_period=15, clock_out_grace_period=15, working_days='1,2,3,4,5',
+            is_default=True, is_active=True
+        ))
+        db.session.add(AttendancePolicy(name='Default', is_default=True, is_active=True))
+        user = User(username='policy_user', email='policy@test.com', role='employee', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Employee(
+            user_id=user.id, employee_id='POL001', first_name='Policy', last_name='Reader',
+            email='policy@test.com', job_title='Clerk', department='Ops', hire_date=date(2020, 1, 1), salary=1000
+        ))
+        db.session.commit()
+        
+        cache = app.extensions['policy_cache']
+        config = get_policy_config()
+        assert config.default_hours.name == 'Standard'
+        assert config.default_hours.get_working_days_list() == [1, 2, 3, 4, 5]
+        assert config.default_hours.late_threshold(date(2024, 1, 1)) == time(9, 15)
+        assert config.default_policy.name == 'Default'
+        loads = cache.loads
+        
+        # Clock-ins read the cached default office hours without touching office_hours
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        employee = Employee.query.filter_by(employee_id='POL001').one()
+        with app.test_request_context():
+            result = scan(employee.id, datetime.now(), 'qr')
+            db.session.commit()
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        assert result.kind == 'clock_in'
+        assert not [s for s in statements if 'office_hours' in s]
+        assert cache.loads == loads
+        
+        # Unrelated commits keep the snapshot; office hours edits replace it
+        assert get_policy_config() is config
+        hours = OfficeHours.query.filter_by(name='Standard').one()
+        hours.clock_in_grace_period = 5
+        db.session.rollback()
+        assert get_policy_config() is config
+        
+        hours = OfficeHours.query.filter_by(name='Standard').one()
+        hours.clock_in_grace_period = 5
+        db.session.commit()
+        assert get_policy_config().default_hours.clock_in_grace_period == 5
+        
+        # Bulk updates, as the add/edit routes use to move the default, also invalidate
+        OfficeHours.query.update({'is_default': False})
+        db.session.commit()
+        assert get_policy_config().default_hours is None
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Rotating kiosk QR code tests
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from services.qr_tokens import verify_token
+
+
+def test_rotating_codes_are_rendered_once_per_slot(app, login):
+    from models import User, OfficeLocation
+    
+    rotator = app.extensions['qr_rotator']
+    # Ten seconds into a slot, and only moving when the test says so
+    now = [rotator.rotation * 56666667 + 10.0]
+    rotator.clock = lambda: now[0]
+    with app.app_context():
+        admin = User(username='kiosk_admin', email='kiosk_admin@test.com', role='admin', password_hash='x')
+        location = OfficeLocation(name='HQ', address='1 Main St', radius_meters=100)
+        db.session.add_all([admin, location])
+        db.session.commit()
+        admin_id, location_id = admin.id, str(location.id)
+    
+    kiosks = [login(admin_id) for _ in range(3)]
+    page = kiosks[0].get(f'/qr-attendance/generate-qr/{location_id}')
+    assert page.status_code == 200
+    
+    state = kiosks[0].get(f'/qr-attendance/rotation/{location_id}').get_json()
+    slot = state['slot']
+    assert slot == 56666667
+    assert state['next_in'] == rotator.rotation - 10
+    assert state['image_url'].endswith(f'/{location_id}/{slot}.png')
+    
+    # Every kiosk gets the same bytes; revalidation returns 304 without rendering
+    responses = [kiosk.get(state['image_url']) for kiosk in kiosks]
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.data for r in responses}) == 1
+    assert responses[0].mimetype == 'image/png' and responses[0].data.startswith(b'\x89PNG')
+    etag = responses[0].headers['ETag']
+    revalidated = kiosks[1].get(state['image_url'], headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    
+    svg = kiosks[2].get(state['svg_url'])
+    assert svg.mimetype == 'image/svg+xml' and b'<svg' in svg.data
+    
+    # The next slots were rendered in the background
+    rotator.shutdown()
+    assert (int(location_id), slot + 1, 'png') in rotator._codes
+    assert (int(location_id), slot + 2, 'png') in rotator._codes
+    assert rotator.renders == len(rotator._codes)
+    
+    # Slot tokens are deterministic and verify while current
+    with app.app_context():
+        from services.qr_rotation import slot_token
+        token = slot_token(location_id, slot, rotator.rotation)
+        assert verify_token(token.token, now=slot * rotator.rotation + 1).nonce == slot
+    
+    # Future and stale slots are not served
+    assert kiosks[0].get(f'/qr-attendance/code/{location_id}/{slot + 1}.png').status_code == 404
+    assert kiosks[0].get(f'/qr-attendance/code/{location_id}/{slot - 2}.png').status_code == 404
+    assert kiosks[0].get(f'/qr-attendance/code/{location_id}/{slot}.gif').status_code == 404
+    
+    # Polls answer at once and say when the code rotates
+    rotated = kiosks[0].get(f'/qr-attendance/rotation/{location_id}?after={slot - 1}').get_json()
+    assert rotated['rotated'] is True and rotated['slot'] == slot
+    unchanged = kiosks[0].get(f'/qr-attendance/rotation/{location_id}?after={slot}').get_json()
+    assert unchanged['rotated'] is False and unchanged['next_in'] == rotator.rotation - 10
+    
+    # Once the slot rotates the next code is served and the old one stays valid for a slot
+    now[0] += unchanged['next_in']
+    rotated = kiosks[0].get(f'/qr-attendance/rotation/{location_id}?after={slot}').get_json()
+    assert rotated['rotated'] is True and rotated['slot'] == slot + 1
+    assert rotated['next_in'] == rotator.rotation
+    assert kiosks[0].get(f'/qr-attendance/code/{location_id}/{slot + 1}.png').status_code == 200
+    assert kiosks[0].get(f'/qr-attendance/code/{location_id}/{slot}.png').status_code == 200
+    assert kiosks[0].get(f'/qr-attendance/code/{location_id}/{slot - 1}.png').status_code == 404
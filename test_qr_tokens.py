@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Signed QR token tests
+"""
+
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+import qrcode
+from sqlalchemy import event
+
+from app import db
+from services.qr_tokens import issue_token, verify_token, InvalidQRToken
+
+
+@pytest.fixture
+def app(app):
+    app.config['QR_SIGNING_KEY'] = 'test-signing-key'
+    return app
+
+
+def _rejects(token, now=None):
+    try:
+        verify_token(token, now=now)
+    except InvalidQRToken as e:
+        return str(e)
+    return None
+
+
+def test_tokens_verify_offline_and_reject_tampering(app):
+    with app.app_context():
+        issued = issue_token(42, issued_at=1700000000, ttl=60, nonce=7)
+        assert len(issued.token) < 64
+        assert set(issued.token) <= set('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ.')
+        
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        verified = verify_token(issued.token, now=1700000030)
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        assert statements == []
+        assert (verified.location_id, verified.issued_at, verified.expires_at, verified.nonce) == (42, 1700000000, 1700000060, 7)
+        assert verify_token(issued.token.lower(), now=1700000030) == verified
+        
+        assert _rejects(issued.token, now=1700000060) == 'QR code has expired'
+        assert _rejects(issued.token, now=1699999000) == 'QR code is not valid yet'
+        
+        body, _, signature = issued.token.rpartition('.')
+        other_location = body.replace('QA1.16.', 'QA1.17.', 1)
+        assert _rejects(f'{other_location}.{signature}', now=1700000030) == 'Invalid QR code signature'
+        flipped = signature[:-1] + ('A' if signature[-1] != 'A' else 'B')
+        assert _rejects(f'{body}.{flipped}', now=1700000030) == 'Invalid QR code signature'
+        assert _rejects('{"location_id": "42"}') == 'Malformed QR code'
+        assert _rejects(None) == 'Malformed QR code'
+        
+        app.config['QR_SIGNING_KEY'] = 'another-key'
+        assert _rejects(issued.token, now=1700000030) == 'Invalid QR code signature'
+        
+        # The token needs a much smaller QR matrix than the old JSON payload
+        legacy = json.dumps({
+            'location_id': '42', 'location_name': 'Head Office', 'timestamp': '2024-01-01T08:00:00.000000',
+            'expires_at': '2024-01-02T08:00:00.000000', 'token': 'x' * 43
+        })
+        versions = []
+        for data in (issued.token, legacy):
+            qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L)
+            qr.add_data(data)
+            qr.make(fit=True)
+            versions.append(qr.version)
+        assert versions[0] <= 3 < versions[1]
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Statement budgets for list and report pages
+
+Each page is rendered with a small and a larger data set; the number of SQL
+statements must stay under a fixed budget and must not grow with the rows.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, time, timedelta
+import pytest
+from sqlalchemy import event
+
+from app import db
+from services.policy_cache import get_policy_config
+from services.location_registry import get_locations
+from services.identity_cache import load_identity
+
+# Maximum statements per page, independent of the number of rows; identity comes from the cache,
+# plus one read of the user row that confirms the admin's role
+PAGE_BUDGETS = {
+    '/payroll/': 4,
+    '/api/payrolls?per_page=50': 2,
+    '/admin/reports': 4,
+    '/admin/attendance': 4,
+    '/attendance/': 4,
+    '/attendance/export': 2,
+    '/admin/dashboard': 6,
+    '/time-management/reports': 3,
+}
+
+
+class QueryCounter:
+    """Count the SQL statements an engine executes inside the block"""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+    
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+    
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+    
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+    
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def app(app):
+    # Summaries refresh within each commit, so no rollup worker runs statements mid-test
+    app.config['CLOCK_ROLLUP_MODE'] = 'inline'
+    return app
+
+
+def _add_employees(start, count):
+    from models import User, Employee, Payroll, Attendance
+    today = date.today()
+    for i in range(start, start + count):
+        user = User(username=f'count{i}', email=f'count{i}@test.com', role='employee', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        employee = Employee(
+            user_id=user.id, employee_id=f'CNT{i:04d}', first_name='Count', last_name=str(i),
+            email=f'count{i}@test.com', job_title='Tester', department='Testing',
+            hire_date=today, salary=1000
+        )
+        db.session.add(employee)
+        db.session.flush()
+        db.session.add(Payroll(
+            employee_id=employee.id, pay_period_start=today - timedelta(days=5),
+            pay_period_end=today, basic_salary=1000, allowances=0, overtime_pay=0,
+            gross_salary=1000, total_deductions=0, net_salary=1000, status='processed'
+        ))
+        db.session.add(Attendance(employee_id=employee.id, date=today, check_in=time(9, 0), status='present'))
+    db.session.commit()
+
+
+def _statement_count(app, client, url):
+    with app.app_context():
+        engine = db.engine
+    with QueryCounter(engine) as counter:
+        response = client.get(url)
+        response.get_data()
+    assert response.status_code == 200, (url, response.status_code)
+    return counter.count
+
+
+def test_list_pages_stay_within_statement_budget(app, login):
+    from models import User
+    
+    with app.app_context():
+        admin = User(username='counter_admin', email='counter_admin@test.com', role='admin', password_hash='x')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+        _add_employees(0, 3)
+        # Office hours, policies and locations are loaded once per process, not per page
+        get_policy_config()
+        get_locations()
+        # As is the logged-in user's identity
+        load_identity(admin_id)
+    
+    client = login(admin_id)
+    
+    small = {url: _statement_count(app, client, url) for url in PAGE_BUDGETS}
+    
+    with app.app_context():
+        _add_employees(3, 15)
+    
+    large = {url: _statement_count(app, client, url) for url in PAGE_BUDGETS}
+    
+    for url, budget in PAGE_BUDGETS.items():
+        assert large[url] <= budget, f'{url} issued {large[url]} statements (budget {budget})'
+        assert large[url] == small[url], f'{url} grew from {small[url]} to {large[url]} statements'
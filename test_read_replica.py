@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Read replica routing tests
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, time
+import pytest
+from flask import g
+from sqlalchemy import func, select
+
+from app import db
+from services.read_replica import REPLICA_BIND, get_replica_router
+
+
+@pytest.fixture
+def app_env(app_env, tmp_path):
+    return {**app_env, 'REPLICA_DATABASE_URL': f"sqlite:///{tmp_path / 'replica.db'}"}
+
+
+@pytest.fixture
+def app(app):
+    # The chart reads summaries, which then refresh within each commit
+    app.config['CLOCK_ROLLUP_MODE'] = 'inline'
+    with app.app_context():
+        db.metadata.create_all(db.engines[REPLICA_BIND])
+    yield app
+    with app.app_context():
+        db.metadata.drop_all(db.engines[REPLICA_BIND])
+    # The replica bind's (empty) metadata would outlive this app on the shared db object
+    db.metadatas.pop(REPLICA_BIND, None)
+
+
+def _monthly_attendance(client):
+    response = client.get('/attendance/api/stats')
+    assert response.status_code == 200
+    return response.get_json()['monthly_attendance']
+
+
+def test_read_only_views_use_the_replica_until_it_lags_or_fails(app, login):
+    from models import User, Employee, Attendance, AttendanceDailySummary
+    
+    with app.app_context():
+        replica = db.engines[REPLICA_BIND]
+        user = {'id': 1, 'username': 'replica_admin', 'email': 'replica@test.com', 'role': 'admin',
+                'password_hash': 'x', 'is_active': True}
+        employee = {'id': 1, 'user_id': 1, 'employee_id': 'REP001', 'first_name': 'Rhea', 'last_name': 'Plica',
+                    'email': 'replica@test.com', 'job_title': 'Analyst', 'department': 'Ops',
+                    'hire_date': date(2020, 1, 1), 'salary': 1000, 'is_active': True}
+        for engine in (db.engine, replica):
+            with engine.begin() as connection:
+                connection.execute(User.__table__.insert(), user)
+                connection.execute(Employee.__table__.insert(), employee)
+        # The replica has not caught up with this one yet
+        db.session.add(Attendance(employee_id=1, date=date(2024, 3, 4), check_in=time(9, 0), check_out=time(17, 0),
+                                  hours_worked=8, status='present'))
+        db.session.commit()
+        router = get_replica_router()
+    
+    client = login(1)
+    
+    assert _monthly_attendance(client) == []
+    assert router.stats()['routed'] == 1
+    # Pages that are not marked read-only stay on the primary
+    assert client.get('/attendance/status').status_code == 200
+    assert router.stats()['routed'] == 1
+    
+    # Too far behind: the primary answers
+    router.measure_lag = lambda engine: 120.0
+    router._checked_at = None
+    assert len(_monthly_attendance(client)) == 1
+    assert router.stats()['lagging'] == 1
+    
+    # A failing replica falls back to the primary and is left alone for a while
+    router.measure_lag = lambda engine: 0.0
+    router._checked_at = None
+    with replica.begin() as connection:
+        AttendanceDailySummary.__table__.drop(connection)
+    assert len(_monthly_attendance(client)) == 1
+    assert router.stats()['down'] and router.stats()['fallbacks'] == 1
+    assert len(_monthly_attendance(client)) == 1
+    assert router.stats()['fallbacks'] == 2
+    
+    stats = client.get('/admin/api/db-pool').get_json()
+    assert stats['replica']['routing']['routed'] == 2
+
+
+def test_writes_in_a_replica_routed_request_go_to_the_primary(app):
+    from models import Department
+    
+    with app.test_request_context():
+        g.read_from_replica = True
+        db.session.add(Department(name='Finance'))
+        db.session.commit()
+        assert db.session.scalar(select(func.count(Department.id))) == 0
+        g.read_from_replica = False
+        assert db.session.scalar(select(func.count(Department.id))) == 1
+        db.session.remove()
+
+
+def test_replica_reads_do_not_fill_the_metrics_cache(app):
+    from services.metrics_cache import get_metrics_cache
+    from services.read_replica import reading_from_replica
+    
+    with app.app_context():
+        cache = get_metrics_cache()
+    
+    with app.test_request_context():
+        g.read_from_replica = True
+        assert reading_from_replica()
+        assert cache.get_or_compute('replica_only', lambda: 'stale') == 'stale'
+        assert cache.stats()['entries'] == 0
+        # Request teardown clears the flag; the view leaves it for streamed responses
+        app.do_teardown_request()
+        assert not reading_from_replica()
+        assert cache.get_or_compute('replica_only', lambda: 'fresh') == 'fresh'
+        assert cache.stats()['entries'] == 1
+        db.session.remove()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Materialized payroll and attendance summary tests
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import date, time
+from decimal import Decimal
+import pytest
+from sqlalchemy import select, text
+
+from app import db
+
+
+@pytest.fixture
+def app(app):
+    app.config['CLOCK_ROLLUP_MODE'] = 'inline'
+    return app
+
+
+def _add_employee(code, department):
+    from models import User, Employee
+    user = User(username=code.lower(), email=f'{code.lower()}@test.com', role='admin', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    employee = Employee(user_id=user.id, employee_id=code, first_name='Sum', last_name=code,
+                        email=f'{code.lower()}@test.com', job_title='Tester', department=department,
+                        hire_date=date(2020, 1, 1), salary=1000)
+    db.session.add(employee)
+    db.session.flush()
+    return employee
+
+
+def _payroll_summary():
+    from models import PayrollMonthlySummary as S
+    return {(row.month, row.department, row.status): (row.payroll_count, row.net_total)
+            for row in db.session.scalars(select(S))}
+
+
+def _attendance_summary():
+    from models import AttendanceDailySummary as S
+    return {(row.day, row.department): (row.record_count, row.present_count, row.late_count, row.checked_in_count,
+                                        row.hours_count, row.hours_total)
+            for row in db.session.scalars(select(S))}
+
+
+def test_payroll_summary_follows_every_write_path(app):
+    from models import Payroll
+    from services.payroll_engine import run_bulk_payroll
+    
+    with app.app_context():
+        ops, sales = _add_employee('SUM001', 'Ops'), _add_employee('SUM002', 'Sales')
+        march = date(2024, 3, 1)
+        payroll = Payroll(employee_id=ops.id, pay_period_start=date(2024, 3, 1), pay_period_end=date(2024, 3, 31),
+                          basic_salary=1000, gross_salary=1100, net_salary=880, status='pending')
+        db.session.add(payroll)
+        db.session.commit()
+        assert _payroll_summary() == {(march, 'Ops', 'pending'): (1, Decimal('880.00'))}
+        
+        # Bulk insert through the payroll engine
+        run_bulk_payroll([sales.id], date(2024, 3, 1), date(2024, 3, 31), processed_by=None)
+        assert _payroll_summary()[(march, 'Sales', 'processed')][0] == 1
+        
+        # Bulk UPDATE: the buckets come from the statement's WHERE clause
+        Payroll.query.filter_by(employee_id=ops.id).update({'status': 'processed'})
+        db.session.commit()
+        assert set(_payroll_summary()) == {(march, 'Ops', 'processed'), (march, 'Sales', 'processed')}
+        
+        # Moving the period to another month refreshes both months
+        payroll.pay_period_start, payroll.pay_period_end = date(2024, 4, 1), date(2024, 4, 30)
+        db.session.commit()
+        assert set(_payroll_summary()) == {(date(2024, 4, 1), 'Ops', 'processed'), (march, 'Sales', 'processed')}
+        
+        # A department change moves the employee's rows
+        ops.department = 'Finance'
+        db.session.commit()
+        assert (date(2024, 4, 1), 'Finance', 'processed') in _payroll_summary()
+        
+        db.session.delete(payroll)
+        db.session.commit()
+        assert set(_payroll_summary()) == {(march, 'Sales', 'processed')}
+        
+        # Rolled-back writes leave the summaries alone
+        db.session.add(Payroll(employee_id=ops.id, pay_period_start=date(2024, 5, 1), pay_period_end=date(2024, 5, 31),
+                               basic_salary=1000, gross_salary=1100, net_salary=880))
+        db.session.flush()
+        db.session.rollback()
+        assert set(_payroll_summary()) == {(march, 'Sales', 'processed')}
+        
+        from services.dashboard_metrics import monthly_payroll_trends
+        assert [(t.label, t.count) for t in monthly_payroll_trends()] == [('2024-03', 1)]
+        assert monthly_payroll_trends(since=date(2024, 3, 20)) == monthly_payroll_trends()
+
+
+def test_attendance_summary_chart_api_and_rebuild(app, login):
+    from models import Attendance
+    from services.clock_writes import upsert_attendance_rows
+    
+    with app.app_context():
+        ops, sales = _add_employee('SUM101', 'Ops'), _add_employee('SUM102', 'Sales')
+        admin_id = ops.user_id
+        day = date(2024, 3, 4)
+        db.session.add(Attendance(employee_id=ops.id, date=day, check_in=time(9, 0), check_out=time(17, 0),
+                                  hours_worked=8, overtime_hours=0, status='present'))
+        # Core upsert, as the clock rollup writes days
+        upsert_attendance_rows([{'employee_id': sales.id, 'date': day, 'check_in': time(9, 30), 'check_out': None,
+                                 'hours_worked': None, 'overtime_hours': 0, 'status': 'late', 'notes': None,
+                                 'is_qr': False}])
+        db.session.add(Attendance(employee_id=sales.id, date=date(2024, 4, 1), status='absent'))
+        db.session.commit()
+        assert _attendance_summary() == {
+            (day, 'Ops'): (1, 1, 0, 1, 1, Decimal('8.00')),
+            (day, 'Sales'): (1, 0, 1, 1, 0, Decimal('0.00')),
+            (date(2024, 4, 1), 'Sales'): (1, 0, 0, 0, 0, Decimal('0.00'))
+        }
+        
+        # Raw SQL bypasses the session; the CLI rebuild catches up
+        db.session.execute(text(
+            "INSERT INTO attendances (employee_id, date, check_in, check_out, hours_worked, overtime_hours, status, is_qr) "
+            "VALUES (:employee_id, '2024-03-05', '08:00:00.000000', '18:00:00.000000', 10, 1, 'present', 0)"
+        ), {'employee_id': ops.id})
+        db.session.commit()
+        assert (date(2024, 3, 5), 'Ops') not in _attendance_summary()
+        incremental = _attendance_summary()
+    
+    result = app.test_cli_runner().invoke(args=['rebuild-summaries'])
+    assert 'Rebuilt summaries for 0 payroll months and 3 attendance days' in result.output
+    with app.app_context():
+        rebuilt = _attendance_summary()
+        assert rebuilt[(date(2024, 3, 5), 'Ops')] == (1, 1, 0, 1, 1, Decimal('10.00'))
+        assert {key: value for key, value in rebuilt.items() if key in incremental} == incremental
+    
+    client = login(admin_id)
+    stats = client.get('/attendance/api/stats').get_json()
+    # Same figures the raw attendance rows give: absent days without a check-in are left out
+    assert stats['monthly_attendance'] == [
+        {'month': '2024-03', 'total_days': 3, 'avg_hours': 9.0, 'total_overtime': 1.0}
+    ]
+    assert {d['department']: (d['total_attendance'], d['avg_hours']) for d in stats['department_stats']} == {
+        'Ops': (2, 9.0), 'Sales': (1, 0.0)
+    }
+
+
+def test_attendance_days_are_queued_outside_inline_mode(app):
+    from models import Attendance, PendingSummaryDay
+    from sqlalchemy import event
+    
+    app.config['CLOCK_ROLLUP_MODE'] = 'manual'
+    with app.app_context():
+        employee_id = _add_employee('SUM201', 'Ops').id
+        db.session.add(Attendance(employee_id=employee_id, date=date(2024, 3, 4), check_in=time(9, 0),
+                                  check_out=time(17, 0), hours_worked=8, overtime_hours=0, status='present'))
+        db.session.commit()
+        
+        # The commit only appends the day; no summary rows are read, locked or written
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        db.session.add(Attendance(employee_id=employee_id, date=date(2024, 3, 5), status='absent'))
+        db.session.commit()
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        assert not [s for s in statements if 'summaries' in s or 'advisory' in s]
+        assert [s.split()[0] for s in statements] == ['INSERT', 'INSERT']
+        assert _attendance_summary() == {}
+        assert [row.day for row in PendingSummaryDay.query.order_by(PendingSummaryDay.id)] == [
+            date(2024, 3, 4), date(2024, 3, 5)
+        ]
+    
+    result = app.test_cli_runner().invoke(args=['rollup-clock-events'])
+    assert 'Refreshed summaries for 2 attendance days' in result.output
+    with app.app_context():
+        assert _attendance_summary() == {
+            (date(2024, 3, 4), 'Ops'): (1, 1, 0, 1, 1, Decimal('8.00')),
+            (date(2024, 3, 5), 'Ops'): (1, 0, 0, 0, 0, Decimal('0.00'))
+        }
+        assert PendingSummaryDay.query.count() == 0